@@ -1,44 +1,412 @@
 import sys
 import os
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+import warnings
 import yaml
-import torch 
+import torch
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
 from tqdm.auto import tqdm
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
 from models.peptideBert.network import create_model
+from .fasta_index import iter_fasta_chunks
+from .feature_cache import FeatureCache, sequence_hashes
+from .peptidebert_tokens import batch_indices, pad_token_ids, sequences_to_bytes, token_ids_from_bytes
 
+DEFAULT_BATCH_SIZE = 64
+ENCODING_CACHE_SIZE = 4
+# Optimizaciones de inferencia en CPU (combinables con '+', p. ej. 'int8+compile')
+CPU_OPTIMIZATIONS = ('int8', 'compile')
 
-def load_bert_model(model_directory_path, feature, device):
+
+def _parse_optimize(optimize: Optional[str]) -> str:
+    """Normaliza el modo de optimización ('' = modelo fp32 sin cambios)."""
+    if not optimize:
+        return ''
+    modes = {mode.strip() for mode in str(optimize).split('+') if mode.strip()}
+    unknown = modes.difference(CPU_OPTIMIZATIONS)
+    if unknown:
+        raise ValueError(f"Optimización desconocida: {', '.join(sorted(unknown))}. "
+                         f"Opciones: {', '.join(CPU_OPTIMIZATIONS)} (combinables con '+').")
+    return '+'.join(mode for mode in CPU_OPTIMIZATIONS if mode in modes)
+
+
+def _quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Cuantización dinámica int8 de las capas lineales. Usa torchao (`quantize_` con
+    `Int8DynamicActivationInt8WeightConfig`) si está instalado; si no, la API anterior
+    `torch.ao.quantization.quantize_dynamic`.
+    """
+    try:
+        from torchao.quantization import Int8DynamicActivationInt8WeightConfig, quantize_
+    except ImportError:
+        # torch.ao.quantization está obsoleta (reemplazo: torchao.quantization.quantize_); se
+        # silencian sus avisos mientras siga disponible en la versión de torch instalada
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message=r'torch\.ao\.quantization is deprecated')
+            warnings.filterwarnings('ignore', message=r'torch\.quantize_per_tensor, torch\.quantize_per_channel')
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    # quantize_ modifica el modelo en su sitio (por defecto, solo las capas lineales)
+    quantize_(model, Int8DynamicActivationInt8WeightConfig())
+    return model
+
+
+def optimize_for_cpu(model: torch.nn.Module, optimize: str = 'int8') -> torch.nn.Module:
+    """
+    Prepara un modelo de PeptideBERT para inferencia en CPU.
+
+    'int8' aplica cuantización dinámica int8 a las capas lineales (pesos en int8,
+    activaciones cuantizadas al vuelo) y 'compile' lo compila con `torch.compile` con
+    formas dinámicas, ya que cada lote tiene su propio tamaño y longitud. La primera
+    llamada de un modelo compilado es lenta (compilación).
+
+    Args:
+        model (torch.nn.Module): Modelo cargado en CPU.
+        optimize (str): 'int8', 'compile' o 'int8+compile'. Defaults to 'int8'.
+
+    Returns:
+        torch.nn.Module: Modelo optimizado, en modo evaluación.
+    """
+    modes = _parse_optimize(optimize).split('+')
+    model.eval()
+    if 'int8' in modes:
+        model = _quantize_int8(model)
+    if 'compile' in modes:
+        model = torch.compile(model, dynamic=True)
+    return model
+
+
+def load_bert_model(model_directory_path, feature, device, optimize: Optional[str] = None,
+                    num_threads: Optional[int] = None):
+    """
+    Carga el modelo de PeptideBERT de una feature.
+
+    Args:
+        model_directory_path (str): Ruta al directorio de modelos.
+        feature (str): Feature del modelo ('hemo', 'sol', 'nf', ...).
+        device: Dispositivo de torch.
+        optimize (str, optional): Modo de inferencia en CPU ('int8', 'compile' o
+                                  'int8+compile', ver `optimize_for_cpu`). Por defecto,
+                                  el modelo fp32 sin cambios.
+        num_threads (int, optional): Hilos intra-op de torch (afecta a todo el proceso).
+
+    Returns:
+        torch.nn.Module: El modelo cargado en el dispositivo.
+    """
+    optimize = _parse_optimize(optimize)
+    if optimize and torch.device(device).type != 'cpu':
+        raise ValueError(f"La optimización '{optimize}' solo está disponible en CPU.")
+    if num_threads:
+        torch.set_num_threads(num_threads)
     config = yaml.load(open(f'{model_directory_path}/{feature}/config.yaml', 'r'), Loader=yaml.FullLoader)
     config['device'] = device
     model = create_model(config)
     model.load_state_dict(torch.load(f'{model_directory_path}/{feature}/model.pt',weights_only = False)['model_state_dict'], strict=False)
     model.to(device)
+    if optimize:
+        model = optimize_for_cpu(model, optimize)
     return model
 
 
+class PeptideBertRegistry:
+    """
+    Registro de modelos de PeptideBERT compartido por todo el proceso.
+
+    Cada modelo (directorio, feature, dispositivo, optimización) se carga la primera vez que se pide y
+    se mantiene en memoria para las siguientes llamadas. Si hay más de `max_models`
+    modelos cargados, se libera el usado hace más tiempo.
+    """
+
+    def __init__(self, max_models: Optional[int] = 3):
+        """
+        Args:
+            max_models (int, optional): Máximo de modelos residentes. None = sin límite.
+                                        Defaults to 3 (hemo, sol y nf).
+        """
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_directory_path, feature, device, optimize=None):
+        return (os.path.abspath(str(model_directory_path)), feature, str(torch.device(device)),
+                _parse_optimize(optimize))
+
+    def get(self, model_directory_path, feature, device, optimize: Optional[str] = None):
+        """
+        Devuelve el modelo (en modo evaluación), cargándolo solo si no está en memoria.
+        `optimize` selecciona el modo de inferencia en CPU (ver `load_bert_model`).
+        """
+        key = self._key(model_directory_path, feature, device, optimize)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+            model = load_bert_model(model_directory_path, feature, device, optimize=key[3])
+            model.eval()
+            self._models[key] = model
+            if self.max_models is not None:
+                while len(self._models) > self.max_models:
+                    self._drop(next(iter(self._models)))
+            return model
+
+    def _drop(self, key) -> None:
+        del self._models[key]
+        if key[2].startswith('cuda'):
+            torch.cuda.empty_cache()
+
+    def release(self, model_directory_path=None, feature: Optional[str] = None) -> int:
+        """
+        Libera los modelos que coinciden con el directorio y/o la feature (todos si no se indica nada).
+
+        Returns:
+            int: Número de modelos liberados.
+        """
+        directory = os.path.abspath(str(model_directory_path)) if model_directory_path is not None else None
+        with self._lock:
+            keys = [key for key in self._models
+                    if (directory is None or key[0] == directory) and (feature is None or key[1] == feature)]
+            for key in keys:
+                self._drop(key)
+        return len(keys)
+
+    def loaded(self) -> List[tuple]:
+        """Claves (directorio, feature, dispositivo, optimización) de los modelos cargados, del menos al más reciente."""
+        with self._lock:
+            return list(self._models)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+_MODEL_REGISTRY = PeptideBertRegistry()
+
+
+def get_model_registry() -> PeptideBertRegistry:
+    """Registro de modelos por defecto del proceso."""
+    return _MODEL_REGISTRY
+
+
+def release_models(model_directory_path=None, feature: Optional[str] = None) -> int:
+    """Libera modelos del registro por defecto (ver `PeptideBertRegistry.release`)."""
+    return _MODEL_REGISTRY.release(model_directory_path, feature)
+
+
+class PeptideBertEncoding(NamedTuple):
+    """
+    Secuencias tokenizadas para PeptideBERT, listas para cortar en lotes.
+
+    Attributes:
+        input_ids (torch.Tensor): Matriz int64 (N x L_max) de ids; 0 ([PAD]) es relleno.
+        attention_mask (torch.Tensor): Matriz float (N x L_max), 1 en posiciones reales.
+        lengths (np.ndarray): Longitud de cada secuencia.
+    """
+    input_ids: torch.Tensor
+    attention_mask: torch.Tensor
+    lengths: np.ndarray
+
+
+_ENCODING_CACHE = OrderedDict()
+_ENCODING_CACHE_LOCK = threading.Lock()
+
+
+def _pad_token_ids(flat_ids: np.ndarray, lengths: np.ndarray) -> PeptideBertEncoding:
+    """Coloca los ids concatenados en una matriz rellenada con 0 y calcula la máscara."""
+    input_ids = torch.from_numpy(pad_token_ids(flat_ids, lengths))
+    return PeptideBertEncoding(input_ids=input_ids, attention_mask=(input_ids != 0).float(), lengths=lengths)
 
-def predict_peptidebert(model_directory_path, 
-                        input_dataframe: pd.DataFrame, 
-                        sequence_col: str = 'sequence', 
-                        feats=['hemo','sol','nf']):
+
+def encode_for_peptidebert(sequences: Sequence[str], use_cache: bool = True) -> PeptideBertEncoding:
+    """
+    Tokeniza todas las secuencias de una vez con una tabla de búsqueda sobre sus bytes.
+
+    Cada carácter se convierte en un byte (latin-1; los que no caben pasan a '?', es decir
+    [UNK]) y la tabla de 256 entradas da su id, igual que `mapping.get(c, [UNK])`.
+    Con use_cache=True, el resultado se guarda por contenido (últimas ENCODING_CACHE_SIZE
+    listas), así que varias features o llamadas repetidas con las mismas secuencias
+    reutilizan el mismo tensor.
+
+    Args:
+        sequences (Sequence[str]): Secuencias de aminoácidos.
+        use_cache (bool): Reutiliza codificaciones ya calculadas. Defaults to True.
+
+    Returns:
+        PeptideBertEncoding: ids rellenados, máscara de atención y longitudes.
+    """
+    raw, lengths = sequences_to_bytes(sequences)
+
+    key = None
+    if use_cache:
+        key = hashlib.sha1(raw + b"\0" + lengths.tobytes()).hexdigest()
+        with _ENCODING_CACHE_LOCK:
+            if key in _ENCODING_CACHE:
+                _ENCODING_CACHE.move_to_end(key)
+                return _ENCODING_CACHE[key]
+
+    encoded = _pad_token_ids(token_ids_from_bytes(raw), lengths)
+    if use_cache:
+        with _ENCODING_CACHE_LOCK:
+            _ENCODING_CACHE[key] = encoded
+            while len(_ENCODING_CACHE) > ENCODING_CACHE_SIZE:
+                _ENCODING_CACHE.popitem(last=False)
+    return encoded
+
+
+def clear_encoding_cache() -> None:
+    """Vacía la caché de codificaciones de `encode_for_peptidebert`."""
+    with _ENCODING_CACHE_LOCK:
+        _ENCODING_CACHE.clear()
+
+
+def tokenize_peptides(sequences: Sequence[str]) -> List[List[int]]:
+    """
+    Convierte las secuencias en listas de ids de PeptideBERT, sin relleno.
+    Los caracteres desconocidos se codifican como [UNK].
+    """
+    encoded = encode_for_peptidebert(sequences, use_cache=False)
+    return [row[:n].tolist() for row, n in zip(encoded.input_ids.numpy(), encoded.lengths)]
+
+
+def predict_batched_multi(models: Dict[str, torch.nn.Module],
+                          encoded: Union[PeptideBertEncoding, List[List[int]]], device,
+                          batch_size: int = DEFAULT_BATCH_SIZE, bucket_by_length: bool = True,
+                          progress: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Ejecuta varios modelos por lotes con una sola pasada sobre los lotes: cada lote se
+    construye una vez y se evalúa con todos los modelos.
+
+    Cada lote se rellena solo hasta su propia longitud máxima; con la máscara de atención
+    el relleno no cambia la predicción respecto a rellenar hasta la longitud global.
+
+    Args:
+        models (Dict[str, torch.nn.Module]): Modelos de PeptideBERT por nombre de feature.
+        encoded (PeptideBertEncoding | List[List[int]]): Salida de `encode_for_peptidebert`
+                                                         o secuencias tokenizadas sin relleno.
+        device: Dispositivo de torch.
+        batch_size (int): Secuencias por lote. Defaults to 64.
+        bucket_by_length (bool): Si es True, agrupa secuencias de longitud parecida en el
+                                 mismo lote para minimizar el relleno. Defaults to True.
+        progress (bool): Muestra una barra de progreso. Defaults to True.
+
+    Returns:
+        Dict[str, np.ndarray]: Predicciones (float64) por feature, una por secuencia y en
+                               el orden original.
+    """
+    if not isinstance(encoded, PeptideBertEncoding):
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        flat_ids = np.fromiter((t for seq in encoded for t in seq), dtype=np.int64, count=int(lengths.sum()))
+        encoded = _pad_token_ids(flat_ids, lengths)
+    lengths = encoded.lengths
+    n_sequences = lengths.size
+    batches = batch_indices(lengths, batch_size, bucket_by_length)
+
+    preds = {name: np.empty(n_sequences, dtype=np.float64) for name in models}
+    with torch.inference_mode():
+        for idx in tqdm(batches, disable=not progress):
+            width = max(1, int(lengths[idx].max()))
+            rows = torch.from_numpy(idx)
+            input_ids = encoded.input_ids[rows, :width].to(device)
+            attention_mask = encoded.attention_mask[rows, :width].to(device)
+            for name, model in models.items():
+                output = model(input_ids, attention_mask)
+                # Se vuelven a colocar las predicciones en la posición original de cada secuencia
+                preds[name][idx] = output.reshape(len(idx), -1)[:, 0].float().cpu().numpy()
+    return preds
+
+
+def predict_batched(model, encoded: Union[PeptideBertEncoding, List[List[int]]], device,
+                    batch_size: int = DEFAULT_BATCH_SIZE, bucket_by_length: bool = True,
+                    progress: bool = True) -> np.ndarray:
+    """
+    Ejecuta un modelo por lotes y devuelve una predicción por secuencia, en el orden original.
+    Ver `predict_batched_multi`.
+    """
+    return predict_batched_multi({'model': model}, encoded, device, batch_size=batch_size,
+                                 bucket_by_length=bucket_by_length, progress=progress)['model']
+
+
+def _predict_per_row(model, tokenized_sequences: List[List[int]], device, progress: bool = True) -> np.ndarray:
+    """Ruta original: una secuencia por llamada, rellenando hasta la longitud máxima global."""
+    max_len = max(map(len, tokenized_sequences))
+    preds = []
+    with torch.inference_mode():
+        for seq in tqdm(tokenized_sequences, disable=not progress):
+            input_ids = torch.tensor([seq + [0] * (max_len - len(seq))]).to(device)
+            attention_mask = (input_ids != 0).float()
+            preds.append(float(model(input_ids, attention_mask)[0]))
+    return np.asarray(preds, dtype=np.float64)
+
+
+def predict_peptidebert(model_directory_path,
+                        input_dataframe: pd.DataFrame,
+                        sequence_col: str = 'sequence',
+                        feats=['hemo','sol','nf'],
+                        batch_size: int = DEFAULT_BATCH_SIZE,
+                        bucket_by_length: bool = True,
+                        registry: Optional[PeptideBertRegistry] = None,
+                        keep_loaded: bool = True,
+                        optimize: Optional[str] = None,
+                        num_threads: Optional[int] = None,
+                        backend: str = 'torch',
+                        prediction_cache: Optional[FeatureCache] = None):
     """
     Ejecuta PeptideBERT sobre un DataFrame y añade las predicciones como nuevas columnas.
 
+    Los modelos se obtienen del registro del proceso, así que solo se cargan en la primera
+    llamada. Todas las features comparten la tokenización y la pasada sobre los lotes.
+
     Args:
         model_directory_path (str): Ruta al directorio de modelos.
         input_dataframe (pd.DataFrame): DataFrame que contiene las secuencias.
-        sequence_col (str, optional): Nombre de la columna que tiene las secuencias. 
+        sequence_col (str, optional): Nombre de la columna que tiene las secuencias.
                                       Defaults to 'sequence'.
-        feats (list, optional): Lista de features a predecir. 
+        feats (list, optional): Lista de features a predecir.
                                 Defaults to ['hemo','sol','nf'].
+        batch_size (int, optional): Secuencias por lote de inferencia. Defaults to 64.
+        bucket_by_length (bool, optional): Agrupa secuencias de longitud parecida en cada
+                                           lote para reducir el relleno. Defaults to True.
+        registry (PeptideBertRegistry, optional): Registro de modelos. Por defecto, el del proceso.
+        keep_loaded (bool, optional): Si es False, libera los modelos al terminar. Defaults to True.
+        optimize (str, optional): Modo de inferencia en CPU ('int8', 'compile' o 'int8+compile').
+                                  Fuerza el uso de CPU. Por defecto, el modelo fp32. Solo con
+                                  backend='torch'.
+        num_threads (int, optional): Hilos intra-op de torch (o de onnxruntime). Por defecto, no se cambian.
+        backend (str, optional): 'torch' o 'onnx'. Con 'onnx', model_directory_path debe contener
+                                 los modelos exportados por `export_peptidebert_onnx` y la
+                                 inferencia se hace con onnxruntime. Defaults to 'torch'.
+        prediction_cache (FeatureCache, optional): Caché de predicciones por secuencia. Si se
+                                                   indica, solo se puntúan las secuencias que
+                                                   no están en la caché (ver `predict_with_cache`).
 
     Returns:
         pd.DataFrame: Una copia del DataFrame original con las columnas de predicción añadidas.
     """
-    
+
+    if backend == 'onnx' and optimize:
+        raise ValueError(f"optimize='{optimize}' solo se aplica con backend='torch'.")
+    if prediction_cache is not None:
+        return predict_with_cache(predict_peptidebert, prediction_cache, model_directory_path,
+                                  input_dataframe, sequence_col, feats, backend=backend, optimize=optimize,
+                                  batch_size=batch_size, bucket_by_length=bucket_by_length,
+                                  registry=registry, keep_loaded=keep_loaded, num_threads=num_threads)
+    if backend == 'onnx':
+        from .peptidebert_onnx import predict_peptidebert_onnx
+        return predict_peptidebert_onnx(model_directory_path, input_dataframe, sequence_col, feats,
+                                        batch_size=batch_size, bucket_by_length=bucket_by_length,
+                                        num_threads=num_threads)
+    if backend != 'torch':
+        raise ValueError(f"Backend desconocido: {backend}. Opciones: 'torch', 'onnx'.")
+
     # 1. Extraer la lista de secuencias del DataFrame
     sequences_list = input_dataframe[sequence_col].tolist()
-    
+
     # Manejar caso de DataFrame vacío
     if not sequences_list:
         print("DataFrame de entrada está vacío. Devolviendo copia.")
@@ -47,56 +415,526 @@ def predict_peptidebert(model_directory_path,
             results[c] = pd.Series(dtype=float) # Añade columnas vacías
         return results
 
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f'Usando dispositivo: {device}')
-    
-    MAX_LEN = max(map(len, sequences_list))
-    
-    # Definición del mapping
-    mapping = dict(zip(
-        ['[PAD]','[UNK]','[CLS]','[SEP]','[MASK]','L',
-         'A','G','V','E','S','I','K','R','D','T','P','N',
-         'Q','F','Y','M','H','C','W'],
-        range(30)
-    ))
-
-    # 2. Tokenizar las secuencias (usamos una copia de la lista)
-    tokenized_sequences = []
-    for seq in sequences_list:
-        tokenized_seq = [mapping.get(c, mapping['[UNK]']) for c in seq] # Usar .get para manejar UNK
-        tokenized_seq.extend([0] * (MAX_LEN - len(tokenized_seq)))  # padding
-        tokenized_sequences.append(tokenized_seq)
-    
+    optimize = _parse_optimize(optimize)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    device = torch.device('cuda' if torch.cuda.is_available() and not optimize else 'cpu')
+    print(f'Usando dispositivo: {device}' + (f' (optimización: {optimize})' if optimize else ''))
+    registry = registry if registry is not None else _MODEL_REGISTRY
+
+    # 2. Tokenizar las secuencias una sola vez (reutilizado entre features y llamadas)
+    encoded = encode_for_peptidebert(sequences_list)
+
     # 3. Crear el DataFrame de resultados a partir de una COPIA del original
     #    Esto conserva todas las columnas (como 'ID') y el índice original.
     results = input_dataframe.copy()
-    
-    with torch.inference_mode():
 
+    # Si el registro no admite todas las features a la vez, se procesan por grupos
+    group_size = len(feats) if registry.max_models is None else max(1, registry.max_models)
+    try:
+        for start in range(0, len(feats), group_size):
+            group = feats[start:start + group_size]
+            models = {c: registry.get(model_directory_path, c, device, optimize) for c in group}
+            print(f"Procesando caracteristicas: {', '.join(group)}")
+            preds = predict_batched_multi(models, encoded, device,
+                                          batch_size=batch_size, bucket_by_length=bucket_by_length)
+            del models
+
+            # 4. Añadir las predicciones como NUEVAS COLUMNAS
+            #    Usar pd.Series con el índice de 'results' asegura que todo
+            #    se alinee correctamente, incluso si el DataFrame tiene un índice personalizado.
+            for c in group:
+                results[c] = pd.Series(preds[c], index=results.index, dtype=float)
+    except Exception as e:
+        print(f"Error durante la predicción con PeptideBERT: {e}")
+        raise e
+    finally:
+        if not keep_loaded:
+            for c in feats:
+                registry.release(model_directory_path, c)
+        if device.type == 'cuda':
+            torch.cuda.empty_cache()
+
+    return results
+
+
+def _init_scoring_worker(num_threads: int) -> None:
+    """Inicializador de cada worker: fija sus hilos intra-op de torch."""
+    torch.set_num_threads(num_threads)
+
+
+def _score_shard(model_directory_path, feats, sequences, batch_size, optimize):
+    """
+    Tarea del pool de procesos con backend='torch': puntúa un fragmento de secuencias. Los
+    modelos quedan en el registro del worker, así que solo se cargan con el primer fragmento.
+    (Con 'onnx' la tarea es `peptidebert_onnx.score_onnx_shard`, que no importa torch).
+    """
+    device = torch.device('cpu')
+    models = {c: _MODEL_REGISTRY.get(model_directory_path, c, device, optimize) for c in feats}
+    encoded = encode_for_peptidebert(sequences, use_cache=False)
+    return predict_batched_multi(models, encoded, device, batch_size=batch_size, progress=False)
+
+
+def predict_peptidebert_sharded(model_directory_path,
+                                input_dataframe: pd.DataFrame,
+                                sequence_col: str = 'sequence',
+                                feats=['hemo','sol','nf'],
+                                n_workers: Optional[int] = None,
+                                threads_per_worker: int = 1,
+                                shard_size: int = 10000,
+                                batch_size: int = DEFAULT_BATCH_SIZE,
+                                optimize: Optional[str] = None,
+                                backend: str = 'torch',
+                                progress: bool = True,
+                                prediction_cache: Optional[FeatureCache] = None) -> pd.DataFrame:
+    """
+    Ejecuta PeptideBERT en CPU repartiendo el DataFrame en fragmentos entre varios procesos.
+
+    Cada worker fija `threads_per_worker` hilos (de torch o de onnxruntime) y mantiene sus propios modelos cargados
+    entre fragmentos. Solo hay como máximo 2 * n_workers fragmentos en vuelo, y cada
+    worker tokeniza únicamente su fragmento, así que la memoria no crece con el tamaño
+    de la tabla más allá de las columnas de resultados. Las predicciones se colocan en
+    su posición original a medida que llegan.
+
+    Los workers se crean con 'spawn' (torch no es seguro tras fork): el script que llame
+    a esta función debe protegerse con `if __name__ == '__main__':`.
+
+    Args:
+        model_directory_path (str): Ruta al directorio de modelos (o de modelos ONNX).
+        input_dataframe (pd.DataFrame): DataFrame que contiene las secuencias.
+        sequence_col (str, optional): Columna con las secuencias. Defaults to 'sequence'.
+        feats (list, optional): Features a predecir. Defaults to ['hemo','sol','nf'].
+        n_workers (int, optional): Número de procesos. Por defecto, os.cpu_count() // threads_per_worker.
+        threads_per_worker (int, optional): Hilos intra-op de cada worker. Defaults to 1.
+        shard_size (int, optional): Secuencias por fragmento. Defaults to 10000.
+        batch_size (int, optional): Secuencias por lote de inferencia. Defaults to 64.
+        optimize (str, optional): Modo de inferencia en CPU (ver `load_bert_model`). Solo con
+                                  backend='torch'.
+        backend (str, optional): 'torch' u 'onnx'. Defaults to 'torch'.
+        progress (bool, optional): Muestra una barra de progreso por fragmento. Defaults to True.
+        prediction_cache (FeatureCache, optional): Caché de predicciones por secuencia; solo se
+                                                   reparten las secuencias que no están en ella.
+
+    Returns:
+        pd.DataFrame: Una copia del DataFrame original con las columnas de predicción añadidas.
+    """
+    if backend not in ('torch', 'onnx'):
+        raise ValueError(f"Backend desconocido: {backend}. Opciones: 'torch', 'onnx'.")
+    if backend == 'onnx' and optimize:
+        raise ValueError(f"optimize='{optimize}' solo se aplica con backend='torch'.")
+    if prediction_cache is not None:
+        return predict_with_cache(predict_peptidebert_sharded, prediction_cache, model_directory_path,
+                                  input_dataframe, sequence_col, feats, backend=backend, optimize=optimize,
+                                  n_workers=n_workers, threads_per_worker=threads_per_worker,
+                                  shard_size=shard_size, batch_size=batch_size, progress=progress)
+    if shard_size < 1:
+        raise ValueError("shard_size debe ser un entero positivo.")
+    optimize = _parse_optimize(optimize)
+    n_workers = n_workers or max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+    sequences = input_dataframe[sequence_col]
+    n_sequences = len(sequences)
+    preds = {c: np.empty(n_sequences, dtype=np.float64) for c in feats}
+    shards = iter(range(0, n_sequences, shard_size))
+    print(f"Procesando caracteristicas: {', '.join(feats)} "
+          f"({n_sequences} secuencias, {n_workers} procesos x {threads_per_worker} hilos)")
+
+    if backend == 'onnx':
+        # Los workers de onnxruntime solo importan peptidebert_onnx (sin torch)
+        from .peptidebert_onnx import score_onnx_shard
+        pool_kwargs = {}
+
+        def shard_task(chunk):
+            return executor.submit(score_onnx_shard, model_directory_path, feats, chunk, batch_size,
+                                   threads_per_worker)
+    else:
+        pool_kwargs = dict(initializer=_init_scoring_worker, initargs=(threads_per_worker,))
+
+        def shard_task(chunk):
+            return executor.submit(_score_shard, model_directory_path, feats, chunk, batch_size, optimize)
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+                             **pool_kwargs) as executor, \
+            tqdm(total=n_sequences, desc="puntuando fragmentos", disable=not progress) as bar:
+        pending = {}
+
+        def submit_next() -> bool:
+            start = next(shards, None)
+            if start is None:
+                return False
+            chunk = sequences.iloc[start:start + shard_size].tolist()
+            pending[shard_task(chunk)] = (start, len(chunk))
+            return True
+
+        while len(pending) < 2 * n_workers and submit_next():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start, size = pending.pop(future)
+                shard_preds = future.result()
+                for c in feats:
+                    preds[c][start:start + size] = shard_preds[c]
+                bar.update(size)
+                submit_next()
+
+    results = input_dataframe.copy()
+    for c in feats:
+        results[c] = pd.Series(preds[c], index=results.index, dtype=float)
+    return results
+
+
+# Checksums de modelos ya calculados: (ruta, tamaño, mtime) -> sha1
+_MODEL_CHECKSUMS: Dict[tuple, str] = {}
+
+
+def _file_sha1(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _MODEL_CHECKSUMS:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):
+                digest.update(block)
+        _MODEL_CHECKSUMS[key] = digest.hexdigest()
+    return _MODEL_CHECKSUMS[key]
+
+
+def model_checksum(model_directory_path, feature: str, backend: str = 'torch') -> str:
+    """
+    Huella de los pesos de una feature: SHA-1 de model.pt (o model.onnx con el backend
+    'onnx') y de config.yaml si existe. Se recalcula solo si el archivo cambia de tamaño
+    o de fecha.
+    """
+    weights = 'model.onnx' if backend == 'onnx' else 'model.pt'
+    parts = [_file_sha1(os.path.join(str(model_directory_path), feature, weights))]
+    config = os.path.join(str(model_directory_path), feature, 'config.yaml')
+    if os.path.exists(config):
+        parts.append(_file_sha1(config))
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _cache_descriptor(feature: str, backend: str = 'torch', optimize: Optional[str] = None) -> str:
+    """
+    Descriptor de caché de una feature: 'PeptideBERT_<feature>_<modo>', con el modo de
+    inferencia (torch, torch_int8, onnx, ...), que también cambia las predicciones. Cada
+    modo es un grupo aparte, así que usar uno no invalida los demás.
+    """
+    if backend == 'onnx':
+        mode = 'onnx'
+    else:
+        optimize = _parse_optimize(optimize)
+        mode = f"torch_{optimize.replace('+', '_')}" if optimize else 'torch'
+    return f'PeptideBERT_{feature}_{mode}'
+
+
+def predict_with_cache(predict_fn, prediction_cache: FeatureCache, model_directory_path,
+                       input_dataframe: pd.DataFrame, sequence_col: str = 'sequence',
+                       feats=['hemo','sol','nf'], backend: str = 'torch',
+                       optimize: Optional[str] = None, **kwargs) -> pd.DataFrame:
+    """
+    Predicciones de PeptideBERT con caché persistente por (secuencia, feature, modelo).
+
+    Las predicciones se guardan en `prediction_cache` con clave el hash de la secuencia,
+    la feature y el modo de inferencia como descriptor (ver `_cache_descriptor`) y
+    `model_checksum` como hash de parámetros. Si cambian los pesos, las entradas de ese
+    descriptor calculadas con los pesos anteriores se eliminan del disco; las de otros
+    backends u optimizaciones se conservan.
+    Solo las secuencias únicas que faltan en la caché (para alguna feature) se puntúan con
+    `predict_fn`; los resultados se unen en el orden original.
+
+    Args:
+        predict_fn: Función de predicción con la firma de `predict_peptidebert`
+                    (p. ej. `predict_peptidebert` o `predict_peptidebert_sharded`).
+        prediction_cache (FeatureCache): Caché de predicciones.
+        model_directory_path (str): Ruta al directorio de modelos.
+        input_dataframe (pd.DataFrame): DataFrame que contiene las secuencias.
+        sequence_col (str, optional): Columna con las secuencias. Defaults to 'sequence'.
+        feats (list, optional): Features a predecir. Defaults to ['hemo','sol','nf'].
+        backend (str, optional): 'torch' u 'onnx'. Defaults to 'torch'.
+        optimize (str, optional): Modo de inferencia en CPU (ver `load_bert_model`).
+        **kwargs: Argumentos adicionales para `predict_fn`.
+
+    Returns:
+        pd.DataFrame: Una copia del DataFrame original con las columnas de predicción añadidas.
+    """
+    if input_dataframe.empty:
+        return predict_fn(model_directory_path, input_dataframe, sequence_col, feats,
+                          backend=backend, optimize=optimize, **kwargs)
+    results = input_dataframe.copy()
+    hashes = pd.Index(sequence_hashes(input_dataframe[sequence_col].astype(str)))
+    unique_hashes = hashes.unique()
+
+    descriptors, checksums, cached = {}, {}, {}
+    for c in feats:
+        descriptors[c] = _cache_descriptor(c, backend, optimize)
+        checksums[c] = model_checksum(model_directory_path, c, backend)
+        prediction_cache.prune(descriptors[c], checksums[c])
+        cached[c] = prediction_cache.lookup(descriptors[c], checksums[c], unique_hashes)
+    missing = unique_hashes[~np.logical_and.reduce([unique_hashes.isin(cached[c].index) for c in feats])]
+    print(f"Caché de predicciones: {len(unique_hashes) - len(missing)} de {len(unique_hashes)} "
+          f"secuencias únicas ya puntuadas")
+
+    if len(missing):
+        first = pd.Series(np.arange(len(hashes)), index=hashes)
+        first = first[~first.index.duplicated()]
+        to_score = input_dataframe.iloc[first.loc[missing].to_numpy()][[sequence_col]]
+        scored = predict_fn(model_directory_path, to_score, sequence_col, feats,
+                            backend=backend, optimize=optimize, **kwargs)
+        scored.index = missing
         for c in feats:
-            try:
-                model = load_bert_model(model_directory_path, c, device)
-                preds = []
-                #for i in tqdm(range(len(prompt_sequences))):
-                # Iterar sobre la lista de secuencias tokenizadas
-                print(f"Procesando caracteristica: {c}")
-                for i in tqdm(range(len(tokenized_sequences))):
-                    input_ids = torch.tensor([tokenized_sequences[i]]).to(device)
-                    attention_mask = (input_ids != 0).float()
-                    output = float(model(input_ids, attention_mask)[0])
-                    preds.append(output)
-                                   
-                # 4. Añadir la lista de predicciones como una NUEVA COLUMNA
-                #    Usar pd.Series con el índice de 'results' asegura que todo
-                #    se alinee correctamente, incluso si el DataFrame tiene un índice personalizado.
-                results[c] = pd.Series(preds, index=results.index, dtype=float)
-            except Exception as e:
-                print(f"Error durante la predicción con PeptideBERT: {e}")
-                raise e
-            finally:
-                if device.type == 'cuda':
-                    torch.cuda.empty_cache()
-                if model is not None:
-                    del model                
-
-    return results
\ No newline at end of file
+            new = scored[[c]][~missing.isin(cached[c].index)]
+            prediction_cache.store(descriptors[c], checksums[c], new)
+            cached[c] = pd.concat([cached[c], new]) if len(cached[c]) else new
+
+    for c in feats:
+        results[c] = pd.Series(cached[c][c].reindex(hashes).to_numpy(dtype=float), index=results.index)
+    return results
+
+
+FASTA_SUFFIXES = ('.fasta', '.fa', '.faa', '.fas')
+STREAM_MANIFEST = '_manifest.json'
+
+
+def _input_format(input_path: Path) -> str:
+    suffixes = [suffix.lower() for suffix in input_path.suffixes]
+    if suffixes and suffixes[-1] == '.gz':
+        suffixes = suffixes[:-1]
+    suffix = suffixes[-1] if suffixes else ''
+    if suffix in FASTA_SUFFIXES:
+        return 'fasta'
+    if suffix in ('.csv', '.tsv'):
+        return suffix[1:]
+    if suffix in ('.parquet', '.pq'):
+        return 'parquet'
+    raise ValueError(f"No se reconoce el formato de '{input_path}'. Usa input_format='fasta', 'csv', 'tsv' o 'parquet'.")
+
+
+def iter_sequence_chunks(input_path, chunk_size: int = 50000,
+                         input_format: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Lee un archivo de secuencias en DataFrames de como máximo `chunk_size` filas.
+
+    Args:
+        input_path (str | Path): Archivo FASTA (columnas 'id', 'description' y 'sequence'),
+                                 CSV/TSV o Parquet (sus propias columnas).
+        chunk_size (int): Filas por fragmento. Defaults to 50000.
+        input_format (str, optional): 'fasta', 'csv', 'tsv' o 'parquet'. Por defecto, según la extensión.
+
+    Yields:
+        pd.DataFrame: Fragmentos en el orden del archivo.
+    """
+    input_path = Path(input_path)
+    input_format = input_format or _input_format(input_path)
+    if input_format == 'fasta':
+        yield from iter_fasta_chunks(input_path, chunk_size=chunk_size)
+    elif input_format in ('csv', 'tsv'):
+        with pd.read_csv(input_path, sep='\t' if input_format == 'tsv' else ',', chunksize=chunk_size) as reader:
+            yield from reader
+    elif input_format == 'parquet':
+        # pyarrow solo hace falta para leer Parquet (no en los workers de puntuación)
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Formato desconocido: {input_format}.")
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp_file = path.with_name(f".{path.name}.tmp")
+    write(tmp_file)
+    os.replace(tmp_file, path)
+
+
+def predict_peptidebert_file(model_directory_path, input_path, output_dir,
+                             sequence_col: str = 'sequence',
+                             feats=['hemo','sol','nf'],
+                             chunk_size: int = 50000,
+                             input_format: Optional[str] = None,
+                             resume: bool = True,
+                             **predict_kwargs) -> Path:
+    """
+    Puntúa un archivo de secuencias por fragmentos y escribe cada fragmento como un
+    archivo Parquet nuevo en `output_dir` (un dataset que se lee con `pd.read_parquet(output_dir)`).
+
+    Solo hay un fragmento en memoria a la vez, así que el pico de memoria depende de
+    `chunk_size` y no del tamaño del archivo. Cada fragmento se escribe de forma atómica
+    y `_manifest.json` registra cuántos están completos: si el proceso se interrumpe, la
+    siguiente llamada con resume=True continúa desde el primer fragmento sin terminar.
+
+    Args:
+        model_directory_path (str): Ruta al directorio de modelos.
+        input_path (str | Path): Archivo FASTA, CSV/TSV o Parquet (ver `iter_sequence_chunks`).
+        output_dir (str | Path): Directorio de salida (part-00000.parquet, part-00001.parquet, ...).
+        sequence_col (str, optional): Columna con las secuencias. Defaults to 'sequence'.
+        feats (list, optional): Features a predecir. Defaults to ['hemo','sol','nf'].
+        chunk_size (int, optional): Filas por fragmento. Defaults to 50000.
+        input_format (str, optional): Formato de entrada. Por defecto, según la extensión.
+        resume (bool, optional): Continúa una ejecución anterior con los mismos parámetros
+                                 y el mismo archivo de entrada (ruta, tamaño y fecha de
+                                 modificación). Si es False, se descarta la salida existente. Defaults to True.
+        **predict_kwargs: Argumentos para `predict_peptidebert` (batch_size, backend, optimize,
+                          prediction_cache, ...).
+
+    Returns:
+        Path: Directorio de salida.
+    """
+    input_path, output_dir = Path(input_path), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = output_dir / STREAM_MANIFEST
+    # Tamaño y fecha de modificación: un archivo reemplazado con el mismo nombre no reanuda
+    input_stat = input_path.stat()
+    run = {'input': str(input_path.resolve()), 'input_size': input_stat.st_size,
+           'input_mtime_ns': input_stat.st_mtime_ns, 'sequence_col': sequence_col,
+           'feats': list(feats), 'chunk_size': chunk_size}
+
+    completed = 0
+    if resume and manifest_file.exists():
+        with open(manifest_file, 'r') as handle:
+            manifest = json.load(handle)
+        if {k: manifest.get(k) for k in run} != run:
+            raise ValueError(f"'{output_dir}' contiene una ejecución con otros parámetros; "
+                             f"usa resume=False para sobrescribirla.")
+        completed = manifest['completed']
+        if manifest.get('finished'):
+            print(f"La salida en '{output_dir}' ya está completa ({completed} fragmentos).")
+            return output_dir
+        print(f"Reanudando desde el fragmento {completed}.")
+    else:
+        for part in output_dir.glob('part-*.parquet'):
+            part.unlink()
+
+    def save_manifest(finished: bool) -> None:
+        _write_atomic(manifest_file, lambda tmp: tmp.write_text(
+            json.dumps({**run, 'completed': completed, 'finished': finished}, indent=2)))
+
+    for k, chunk in enumerate(iter_sequence_chunks(input_path, chunk_size, input_format)):
+        if k < completed:
+            continue
+        print(f"Fragmento {k}: {len(chunk)} secuencias")
+        scored = predict_peptidebert(model_directory_path, chunk, sequence_col, feats, **predict_kwargs)
+        _write_atomic(output_dir / f'part-{k:05d}.parquet', lambda tmp: scored.to_parquet(tmp, index=False))
+        completed = k + 1
+        save_manifest(finished=False)
+        del chunk, scored
+    save_manifest(finished=True)
+    return output_dir
+
+
+def _random_peptides(n_sequences: int, min_length: int, max_length: int, seed: int) -> List[str]:
+    rng = np.random.default_rng(seed)
+    residues = np.array(list("ACDEFGHIKLMNPQRSTVWY"))
+    lengths = rng.integers(min_length, max_length + 1, size=n_sequences)
+    return ["".join(residues[rng.integers(0, residues.size, size=n)]) for n in lengths]
+
+
+def benchmark_peptidebert(model_directory_path, feature: str = 'hemo', n_sequences: int = 2000,
+                          min_length: int = 5, max_length: int = 50,
+                          batch_sizes: Sequence[int] = (16, 64, 256),
+                          device: Optional[str] = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Compara el bucle original (una secuencia por llamada) con la inferencia por lotes.
+
+    Args:
+        model_directory_path (str): Ruta al directorio de modelos.
+        feature (str): Modelo a usar. Defaults to 'hemo'.
+        n_sequences (int): Número de péptidos aleatorios. Defaults to 2000.
+        min_length (int): Longitud mínima de los péptidos. Defaults to 5.
+        max_length (int): Longitud máxima de los péptidos. Defaults to 50.
+        batch_sizes (Sequence[int]): Tamaños de lote a medir. Defaults to (16, 64, 256).
+        device (str, optional): Dispositivo de torch. Por defecto, cuda si está disponible.
+        seed (int): Semilla de la librería aleatoria. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Una fila por método con 'seconds', 'sequences_per_second', 'speedup'
+                      y 'max_abs_diff' (diferencia máxima con el bucle original).
+    """
+    sequences = _random_peptides(n_sequences, min_length, max_length, seed)
+    tokenized_sequences = tokenize_peptides(sequences)
+    encoded = encode_for_peptidebert(sequences, use_cache=False)
+
+    device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+    model = _MODEL_REGISTRY.get(model_directory_path, feature, device)
+
+    methods = {'per_row': lambda: _predict_per_row(model, tokenized_sequences, device, progress=False)}
+    for size in batch_sizes:
+        methods[f'batched_{size}'] = (lambda size=size: predict_batched(
+            model, encoded, device, batch_size=size, progress=False))
+        methods[f'batched_{size}_unsorted'] = (lambda size=size: predict_batched(
+            model, encoded, device, batch_size=size, bucket_by_length=False, progress=False))
+
+    rows, reference = [], None
+    for name, method in methods.items():
+        start = time.perf_counter()
+        preds = method()
+        seconds = time.perf_counter() - start
+        if reference is None:
+            reference = preds
+        rows.append({'method': name, 'seconds': seconds,
+                     'max_abs_diff': float(np.max(np.abs(preds - reference)))})
+
+    results = pd.DataFrame(rows).set_index('method')
+    results['sequences_per_second'] = n_sequences / results['seconds']
+    results['speedup'] = results.loc['per_row', 'seconds'] / results['seconds']
+    return results[['seconds', 'sequences_per_second', 'speedup', 'max_abs_diff']]
+
+
+def check_cpu_optimization(model_directory_path, feature: str = 'hemo',
+                           sequences: Optional[Sequence[str]] = None,
+                           optimizations: Sequence[str] = ('int8', 'compile', 'int8+compile'),
+                           num_threads: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                           threshold: float = 0.5, n_sequences: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    Compara los modos de inferencia en CPU con el modelo fp32: paridad y velocidad.
+
+    Cada modo se evalúa sobre las mismas secuencias (idealmente un conjunto reservado que
+    no se usó para entrenar). El tiempo se mide después de una pasada de calentamiento,
+    que se informa aparte porque incluye la compilación en los modos 'compile'.
+
+    Args:
+        model_directory_path (str): Ruta al directorio de modelos.
+        feature (str): Modelo a usar. Defaults to 'hemo'.
+        sequences (Sequence[str], optional): Secuencias de validación. Si no se indican, se
+                                             generan `n_sequences` péptidos aleatorios.
+        optimizations (Sequence[str]): Modos a comparar. Defaults to ('int8', 'compile', 'int8+compile').
+        num_threads (int, optional): Hilos intra-op de torch para todas las mediciones.
+        batch_size (int): Secuencias por lote. Defaults to 64.
+        threshold (float): Umbral para comparar las clases predichas. Defaults to 0.5.
+        n_sequences (int): Número de péptidos aleatorios si no hay secuencias. Defaults to 2000.
+        seed (int): Semilla de los péptidos aleatorios. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Una fila por modo ('fp32' es la referencia) con 'warmup_seconds',
+                      'seconds', 'sequences_per_second', 'speedup', 'max_abs_diff',
+                      'mean_abs_diff' y 'label_agreement' (fracción de clases iguales a fp32).
+    """
+    if sequences is None:
+        sequences = _random_peptides(n_sequences, 5, 50, seed)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    encoded = encode_for_peptidebert(sequences, use_cache=False)
+    warmup = encode_for_peptidebert(list(sequences)[:2 * batch_size], use_cache=False)
+    device = torch.device('cpu')
+
+    rows, reference = [], None
+    for name in ('fp32', *optimizations):
+        model = load_bert_model(model_directory_path, feature, device,
+                                optimize=None if name == 'fp32' else name).eval()
+        start = time.perf_counter()
+        predict_batched(model, warmup, device, batch_size=batch_size, progress=False)
+        warmup_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        preds = predict_batched(model, encoded, device, batch_size=batch_size, progress=False)
+        seconds = time.perf_counter() - start
+        del model
+        if reference is None:
+            reference = preds
+        diff = np.abs(preds - reference)
+        rows.append({'optimize': name, 'warmup_seconds': warmup_seconds, 'seconds': seconds,
+                     'max_abs_diff': float(diff.max()), 'mean_abs_diff': float(diff.mean()),
+                     'label_agreement': float(np.mean((preds >= threshold) == (reference >= threshold)))})
+
+    results = pd.DataFrame(rows).set_index('optimize')
+    results['sequences_per_second'] = len(encoded.lengths) / results['seconds']
+    results['speedup'] = results.loc['fp32', 'seconds'] / results['seconds']
+    return results[['warmup_seconds', 'seconds', 'sequences_per_second', 'speedup',
+                    'max_abs_diff', 'mean_abs_diff', 'label_agreement']]
@@ -1,11 +1,15 @@
 # peptide_generator.py
 
-import random
+import re
+import time
 import torch
+from itertools import groupby
 from tqdm.auto import tqdm
+from typing import Optional
 from transformers import PreTrainedModel, PreTrainedTokenizer
 from transformers import XLNetTokenizer, XLNetLMHeadModel, pipeline
-from accelerate import Accelerator
+from .generator_service import WarmGenerator
+from .prompt_mutator import mutate_prompts
 
 # Lista estándar de aminoácidos
 AMINO_ACIDS_STRING = "ACDEFGHIKLMNPQRSTVWY"
@@ -15,6 +19,20 @@ pattern_to_remove = f"[^{AMINO_ACIDS_STRING}]"
 
 
 
+def _length_sorted_batches(lengths: list, batch_size: int) -> list:
+    """
+    Agrupa los índices de los prompts en lotes de prompts con la misma longitud
+    tokenizada (de como máximo `batch_size`), de la más corta a la más larga.
+    Así ningún lote necesita relleno.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches = []
+    for _, group in groupby(order, key=lengths.__getitem__):
+        group = list(group)
+        batches.extend(group[k:k + batch_size] for k in range(0, len(group), batch_size))
+    return batches
+
+
 def generate_peptide_variants(
     prompt_sequences: list,
     model: PreTrainedModel,
@@ -24,12 +42,21 @@ def generate_peptide_variants(
     max_length: int = 50,
     temperature: float = 1.0,
     top_k: int = 3,
-    top_p: float = 0.95
+    top_p: float = 0.95,
+    num_return_sequences: int = 1,
+    batch_size: int = 32,
+    n_mutations: int = 1,
+    substitution_matrix: Optional[str] = None,
+    seed: Optional[int] = None
 ) -> list:
     """
     Genera nuevas variantes de péptidos introduciendo mutaciones aleatorias en
     un conjunto de secuencias de entrada y usando el modelo para completarlas.
 
+    Todos los prompts mutados se tokenizan de una vez y se generan por lotes de prompts
+    con la misma longitud tokenizada, así que no hay relleno y min_length/max_length
+    significan lo mismo que generando prompt a prompt.
+
     Args:
         prompt_sequences (list): Una lista de secuencias de péptidos (sin espacios)
                                  para usar como base para las mutaciones.
@@ -41,6 +68,11 @@ def generate_peptide_variants(
         temperature (float): Controla la aleatoriedad de la generación.
         top_k (int): Filtra los k tokens más probables.
         top_p (float): Filtra los tokens con probabilidad acumulada p (nucleus sampling).
+        num_return_sequences (int): Secuencias generadas por cada prompt mutado.
+        batch_size (int): Número máximo de prompts por llamada a `model.generate`.
+        n_mutations (int): Sitios mutados por variante.
+        substitution_matrix (str, optional): Matriz para ponderar las sustituciones (p. ej. 'BLOSUM62').
+        seed (int, optional): Semilla de las mutaciones.
 
     Returns:
         list: Una lista de secuencias de péptidos únicas generadas (sin espacios).
@@ -49,50 +81,52 @@ def generate_peptide_variants(
     device = model.device
     unique_variants = set()
 
-    print(f"Iniciando generación de variantes para {len(prompt_sequences)} secuencias base...")
-
-    for base_seq in tqdm(prompt_sequences, desc="Procesando secuencias"):
-        if not base_seq or len(base_seq) < 1:
-            continue
-
-        for _ in range(num_variants_per_seq):
-            # 1. Crear una mutación aleatoria
-            seq_list = list(base_seq)
-            mutation_index = random.randint(0, len(seq_list) - 1)
-            original_aa = seq_list[mutation_index]
-            
-            new_aa = random.choice([aa for aa in AMINO_ACIDS if aa != original_aa])
-            seq_list[mutation_index] = new_aa
-            mutated_seq = "".join(seq_list)
-
-            # 2. Preparar el prompt para el modelo (con espacios)
-            prompt = " ".join(list(mutated_seq))
-            print(f"\nPrompt generado: {prompt}")
-            inputs = tokenizer(prompt, return_tensors="pt").to(device)
-            print(f"\nshape len: {inputs['input_ids'].shape[1]}")
-
-            # 3. Generar variantes usando el modelo
+    # 1. Crear las mutaciones aleatorias (una por variante); prompt para el modelo con espacios
+    prompts = [" ".join(seq) for seq in mutate_prompts(
+        prompt_sequences, num_variants_per_seq, n_mutations=n_mutations,
+        substitution_matrix=substitution_matrix, rng=seed, unique=False)]
+
+    if not prompts:
+        print("No hay secuencias base válidas; no se genera nada.")
+        return []
+
+    # 2. Tokenizar todos los prompts de una vez y agruparlos por longitud
+    encoded = tokenizer(prompts)["input_ids"]
+    batches = _length_sorted_batches([len(ids) for ids in encoded], batch_size)
+    print(f"Generando {len(prompts) * num_return_sequences} variantes a partir de {len(prompts)} prompts "
+          f"({len(prompt_sequences)} secuencias base) en {len(batches)} lotes...")
+
+    # 3. Generar variantes por lotes
+    n_generated = 0
+    start = time.perf_counter()
+    with tqdm(total=len(prompts), desc="Generando variantes") as progress:
+        for batch in batches:
+            input_ids = torch.tensor([encoded[i] for i in batch], device=device)
             with torch.no_grad():
                 outputs = model.generate(
-                    input_ids=inputs["input_ids"],
-                    attention_mask=inputs["attention_mask"],
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
                     min_length=min_length,
-                    max_length=max_length,                    
+                    max_length=max_length,
                     do_sample=True,
                     temperature=temperature,
                     top_k=top_k,
                     top_p=top_p,
                     pad_token_id=tokenizer.eos_token_id,
-                    num_return_sequences=1
+                    num_return_sequences=num_return_sequences
                 )
 
-            # 4. Decodificar, limpiar y guardar la nueva variante
-            for output in outputs:
-                generated_text = tokenizer.decode(output, skip_special_tokens=True)
-                cleaned_variant = generated_text.replace(" ", "")
-                unique_variants.add(cleaned_variant)
-
-    print(f"\nGeneración completada. Se encontraron {len(unique_variants)} variantes únicas.")
+            # 4. Decodificar, limpiar y guardar las nuevas variantes
+            decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+            unique_variants.update(text.replace(" ", "") for text in decoded)
+            n_generated += len(decoded)
+            progress.update(len(batch))
+            progress.set_postfix(unicas=len(unique_variants),
+                                 seq_s=f"{n_generated / (time.perf_counter() - start):.1f}")
+
+    elapsed = time.perf_counter() - start
+    print(f"\nGeneración completada en {elapsed:.1f} s: {n_generated} secuencias generadas "
+          f"({n_generated / max(elapsed, 1e-9):.1f}/s), {len(unique_variants)} variantes únicas.")
     return list(unique_variants)
 
 def generate_peptide_variants_fast(
@@ -107,23 +141,19 @@ def generate_peptide_variants_fast(
     top_k: int = 3,
     top_p: float = 0.95,
     repetition_penalty: float=1.0,
-    batch_size: int = 32
+    batch_size: int = 32,
+    n_mutations: int = 1,
+    substitution_matrix: Optional[str] = None,
+    seed: Optional[int] = None
 ) -> list:
     model.eval()
     device = model.device
     unique_variants = set()
 
     # --- Pre-generar todas las mutaciones ---
-    mutated_prompts = []
-    for base_seq in prompt_sequences:
-        if not base_seq:
-            continue
-        for _ in range(num_variants_per_seq):
-            seq_list = list(base_seq)
-            idx = random.randrange(len(seq_list))
-            aa = seq_list[idx]
-            seq_list[idx] = random.choice([x for x in AMINO_ACIDS if x != aa])
-            mutated_prompts.append(" ".join(seq_list))
+    mutated_prompts = [" ".join(seq) for seq in mutate_prompts(
+        prompt_sequences, num_variants_per_seq, n_mutations=n_mutations,
+        substitution_matrix=substitution_matrix, rng=seed, unique=False)]
 
     print(f"Generando {len(mutated_prompts)} variantes en lotes de {batch_size}...")
 
@@ -165,18 +195,46 @@ def generate_peptide_variants_fast(
     print(f"\nGeneración completada. Se obtuvieron {len(unique_variants)} variantes únicas.")
     return list(unique_variants)
 
-import random
-import torch
-import re  # <--- CAMBIO: Importar el módulo de expresiones regulares
-from tqdm.auto import tqdm
-from transformers import XLNetTokenizer, XLNetLMHeadModel, pipeline
-from accelerate import Accelerator
+class ProtXLNetGenerator(WarmGenerator):
+    """
+    Generador de ProtXLNet que mantiene el pipeline cargado entre peticiones
+    (ver `WarmGenerator`). `generate` acepta los mismos parámetros que
+    `generate_with_protxlnet_pipeline`.
+    """
 
-# Lista estándar de aminoácidos
-AMINO_ACIDS_STRING = "ACDEFGHIKLMNPQRSTVWY"
-AMINO_ACIDS = list(AMINO_ACIDS_STRING)
-# El patrón de regex para eliminar cualquier cosa que NO sea un AA
-pattern_to_remove = f"[^{AMINO_ACIDS_STRING}]"
+    name = "ProtXLNet"
+    # XLNet usa `mems` en lugar de una caché de `past_key_values` reutilizable
+    supports_prefix_sharing = False
+
+    def _load(self) -> None:
+        # --- CAMBIO: Configurar el tokenizer (forma más limpia) ---
+        print("Cargando tokenizer de ProtXLNet...")
+        tokenizer = XLNetTokenizer.from_pretrained(self.model_name_or_path)
+
+        # Configuración ESENCIAL para generación: padding a la izquierda
+        tokenizer.padding_side = 'left'
+        if tokenizer.pad_token is None:
+             tokenizer.pad_token = tokenizer.eos_token
+        self.tokenizer = tokenizer
+
+        # --- Cargar pipeline ---
+        print("Cargando pipeline de generación...")
+        self.generator = pipeline(
+            "text-generation",
+            # El modelo se carga aquí
+            model=XLNetLMHeadModel.from_pretrained(self.model_name_or_path),
+            tokenizer=tokenizer, # Pasamos el tokenizer ya configurado
+            device=self.device
+        )
+
+    def _format_prompt(self, sequence: str) -> str:
+        return " ".join(sequence)
+
+    def _clean(self, generated_text: str) -> str:
+        # 1. Quitar espacios y saltos de línea
+        no_spaces_text = generated_text.replace(" ", "").replace("\n", "").strip()
+        # 2. Usar regex para quitar CUALQUIER OTRA COSA que no sea un AA
+        return re.sub(pattern_to_remove, '', no_spaces_text)
 
 
 def generate_with_protxlnet_pipeline(
@@ -195,115 +253,38 @@ def generate_with_protxlnet_pipeline(
     apply_truncation: bool = True,
     truncation_prob: float = 0.3,
     start_cut_pos: int = 5,
+    n_mutations: int = 1,
+    substitution_matrix: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    constrained: bool = False,
+    seed: Optional[int] = None,
 ) -> list:
-
-    accelerator = Accelerator()
-    device = accelerator.device
-    print(f"Usando dispositivo: {device}")
-
-    # CAMBIO: Inicializar a None para el bloque 'finally'
-    tokenizer = None
-    generator = None
-
-    try: 
-        # --- CAMBIO: Configurar el tokenizer (forma más limpia) ---
-        print("Cargando tokenizer de ProtXLNet...")
-        tokenizer = XLNetTokenizer.from_pretrained(
-            ruta_modelo_protxlnet,
-            # No pasamos max/min length aquí
-        )
-
-        # Configuración ESENCIAL para generación: padding a la izquierda
-        tokenizer.padding_side = 'left'
-        if tokenizer.pad_token is None:
-             tokenizer.pad_token = tokenizer.eos_token        
-        
-        # --- Cargar pipeline ---
-        print("Cargando pipeline de generación...")
-        generator = pipeline(
-            "text-generation",
-            # El modelo se carga aquí
-            model=XLNetLMHeadModel.from_pretrained(ruta_modelo_protxlnet),
-            tokenizer=tokenizer, # Pasamos el tokenizer ya configurado
-            device=device
-        )
-        print("Pipeline cargado.")
-
-        unique_variants = set()
-    
-        print("Preparando las secuencias iniciales...")
-        mutated_prompts = set()
-        for i in tqdm(range(len(prompt_sequences))):
-            base_seq = prompt_sequences[i]
-            if not base_seq:
-                continue
-
-            for _ in range(num_variants_per_seq):
-                sequence_to_mutate = base_seq
-                if apply_truncation and random.random() < truncation_prob and len(base_seq) > 1:
-                    cut_idx = random.randint(min(start_cut_pos, len(base_seq) - 2), len(base_seq) - 2)
-                    sequence_to_mutate = base_seq[0:cut_idx]
-
-                seq_list = list(sequence_to_mutate)
-                idx = random.randrange(len(seq_list))
-                aa = seq_list[idx]
-                seq_list[idx] = random.choice([x for x in AMINO_ACIDS if x != aa])
-                
-                mutated_prompts.add(" ".join(seq_list)) 
-
-        print(f"Generando {len(mutated_prompts)} variantes (el pipeline manejará los lotes)...")
-
-        formatted_prompts = list(mutated_prompts)
-
-        gen_kwargs = dict(
-            min_length=min_length,
-            max_length=max_length,         
-            max_new_tokens=max_new_tokens, 
+    """
+    Carga ProtXLNet, genera variantes y libera el modelo. Para varias rondas de generación
+    es mejor mantener un `ProtXLNetGenerator` abierto y llamar a su método `generate`.
+    """
+    generator = ProtXLNetGenerator(ruta_modelo_protxlnet, seed=seed)
+    try:
+        return generator.generate(
+            prompt_sequences,
+            num_variants_per_seq=num_variants_per_seq,
             num_return_sequences=num_return_sequences,
-            do_sample=True,
+            min_length=min_length,
+            max_length=max_length,
             temperature=temperature,
             top_k=top_k,
             top_p=top_p,
-            pad_token_id=tokenizer.pad_token_id, 
+            max_new_tokens=max_new_tokens,
             repetition_penalty=repetition_penalty,
+            batch_size=batch_size,
+            apply_truncation=apply_truncation,
+            truncation_prob=truncation_prob,
+            start_cut_pos=start_cut_pos,
+            n_mutations=n_mutations,
+            substitution_matrix=substitution_matrix,
+            token_budget=token_budget,
+            constrained=constrained,
         )
-
-        outputs = generator(
-            formatted_prompts, 
-            batch_size=batch_size, 
-            **gen_kwargs
-        )
-
-        print("Procesando salidas...")
-        for prompt_outputs in tqdm(outputs, desc="Procesando"):
-            for seq_dict in prompt_outputs:
-                generated_text = seq_dict['generated_text']
-                
-                # 1. Quitar espacios y saltos de línea
-                no_spaces_text = generated_text.replace(" ", "").replace("\n", "").strip()
-                # 2. Usar regex para quitar CUALQUIER OTRA COSA que no sea un AA
-                clean = re.sub(pattern_to_remove, '', no_spaces_text)
-                
-                # Truncamiento final (tu lógica es correcta)
-                if len(clean) > max_length:
-                    clean = clean[:max_length]
-                if len(clean) < min_length:
-                    continue                    
-                    
-                unique_variants.add(clean)
-
     finally:
         # --- 5. Limpieza de memoria ---
-        if device.type == 'cuda':
-            torch.cuda.empty_cache()
-
-        # Usamos los 'if' para evitar errores si algo falló al cargar
-        if generator is not None:
-            del generator
-        if tokenizer is not None:
-            del tokenizer
-        if accelerator is not None: 
-            del accelerator
-    
-    print(f"\nGeneración completada. Se obtuvieron {len(unique_variants)} variantes únicas.")
-    return list(unique_variants)
\ No newline at end of file
+        generator.close()
@@ -0,0 +1,55 @@
+# batch_scheduler.py
+
+# --- Planificador de lotes por longitud y presupuesto de tokens para generación ---
+
+import numpy as np
+from typing import List, Optional, Sequence
+
+
+def token_budget_batches(lengths: Sequence[int], max_tokens: int, num_return_sequences: int = 1,
+                         max_new_tokens: int = 0, max_batch_size: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Agrupa prompts ordenados por longitud en lotes que caben en un presupuesto de tokens.
+
+    El coste de un lote es n_prompts * num_return_sequences * (longitud máxima del lote +
+    max_new_tokens), es decir, el tamaño del tensor que `generate` procesa en el último
+    paso. Como los prompts se recorren de menor a mayor longitud, los lotes de prompts
+    cortos llevan más secuencias y el relleno dentro de cada lote es mínimo. Un prompt que
+    por sí solo supera el presupuesto forma su propio lote.
+
+    Args:
+        lengths (Sequence[int]): Longitud tokenizada de cada prompt.
+        max_tokens (int): Presupuesto de tokens por lote.
+        num_return_sequences (int): Secuencias generadas por prompt. Defaults to 1.
+        max_new_tokens (int): Tokens nuevos por secuencia. Defaults to 0.
+        max_batch_size (int, optional): Máximo de prompts por lote.
+
+    Returns:
+        List[np.ndarray]: Índices de cada lote (en orden creciente de longitud).
+    """
+    if max_tokens < 1:
+        raise ValueError("max_tokens debe ser un entero positivo.")
+    lengths = np.asarray(lengths, dtype=np.int64)
+    order = np.argsort(lengths, kind='stable')
+    batches, start = [], 0
+    for end in range(1, len(order) + 1):
+        size = end - start
+        cost = size * num_return_sequences * (int(lengths[order[end - 1]]) + max_new_tokens)
+        if size > 1 and (cost > max_tokens or (max_batch_size and size > max_batch_size)):
+            batches.append(order[start:end - 1])
+            start = end - 1
+    if start < len(order):
+        batches.append(order[start:])
+    return batches
+
+
+def fixed_size_batches(n_prompts: int, batch_size: int) -> List[np.ndarray]:
+    """Lotes de tamaño fijo en el orden original (lo que hace el pipeline con batch_size)."""
+    return [np.arange(k, min(k + batch_size, n_prompts)) for k in range(0, n_prompts, batch_size)]
+
+
+def padding_efficiency(lengths: Sequence[int], batches: List[np.ndarray]) -> float:
+    """Fracción de tokens reales frente a tokens procesados (con relleno hasta el máximo de cada lote)."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    padded = sum(len(batch) * int(lengths[batch].max()) for batch in batches if len(batch))
+    return float(lengths.sum() / padded) if padded else 1.0
@@ -4,14 +4,117 @@
 import pandas as pd
 import subprocess
 import os
+import re
 import numpy as np
+import gzip
+import tempfile
+import time
+from itertools import islice
 from pathlib import Path
-from Bio import SeqIO
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, Tuple
+from .fasta_index import iter_fasta_records, iter_record_blocks, read_fasta, split_record_block
+from .identity_engine import compute_identity_matrix
 
 IUPAC_AMINO_ACID_SET = set("ACDEFGHIKLMNPQRSTVWYBXZJUO-*")  # IUPAC amino acids + gap/stop
+VALID_SEQUENCE_CHARS = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ-*")  # Any letter + gap/stop
+
+# Process umask, read once at import: os.umask can only be queried by setting it, which
+# would race with files created concurrently by other threads.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _iter_fasta_records(records, id_col: Optional[str] = None, seq_col: Optional[str] = None,
+                        columns: bool = False) -> Iterator[Tuple[Any, Any]]:
+    """Normalizes a DataFrame, an (ids, sequences) pair of arrays (columns=True) or an iterable of pairs."""
+    if isinstance(records, pd.DataFrame):
+        if id_col is None or seq_col is None:
+            raise ValueError("id_col and seq_col are required when writing a DataFrame.")
+        return zip(records[id_col].to_numpy(), records[seq_col].to_numpy())
+    if columns:
+        ids, sequences = records
+        if len(ids) != len(sequences):
+            raise ValueError(f"ids and sequences differ in length ({len(ids)} vs {len(sequences)}).")
+        return zip(ids, sequences)
+    return iter(records)
+
+
+def _wrap_sequence(sequence: str, line_width: int) -> str:
+    return "\n".join(sequence[k:k + line_width] for k in range(0, len(sequence), line_width))
+
+
+def write_fasta(records, output_file: Path, id_col: Optional[str] = None,
+                seq_col: Optional[str] = None, line_width: Optional[int] = None,
+                compress: Optional[bool] = None, atomic: bool = True,
+                chunk_size: int = 100_000, columns: bool = False) -> int:
+    """
+    Writes sequences to a FASTA file with buffered bulk writes.
+
+    Records are formatted in chunks of `chunk_size` and each chunk is written with a
+    single call. Null or empty sequences are skipped, as in `save_df_as_fasta`.
+
+    Args:
+        records: A DataFrame (requires id_col and seq_col), an iterable/generator of
+                 (id, sequence) pairs, or, with columns=True, a tuple (ids, sequences)
+                 of column arrays.
+        output_file (Path): Destination path.
+        id_col (str, optional): Header column when `records` is a DataFrame.
+        seq_col (str, optional): Sequence column when `records` is a DataFrame.
+        line_width (int, optional): Wrap sequence lines to this width. Defaults to no wrapping.
+        compress (bool, optional): Gzip the output. Defaults to True if output_file ends in '.gz'.
+        atomic (bool): Write to a temporary file in the same directory and rename it over
+                       output_file when finished. Defaults to True.
+        chunk_size (int): Records formatted per write call. Defaults to 100000.
+        columns (bool): `records` is a tuple (ids, sequences) of column arrays. Defaults to False.
+
+    Returns:
+        int: The number of records written.
+    """
+    output_file = Path(output_file)
+    if compress is None:
+        compress = output_file.suffix == ".gz"
+    pairs = _iter_fasta_records(records, id_col, seq_col, columns)
+
+    if atomic:
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{output_file.name}.", suffix=".tmp",
+                                        dir=output_file.parent)
+        os.close(fd)
+        target = Path(tmp_name)
+        # mkstemp creates the file with mode 0600; give it the permissions of a regular new file
+        os.chmod(target, 0o666 & ~_UMASK)
+    else:
+        target = output_file
+
+    opener = (lambda f: gzip.open(f, "wt", compresslevel=6)) if compress else (lambda f: open(f, "w"))
+    n_written = 0
+    try:
+        with opener(target) as fasta_file:
+            while True:
+                chunk = list(islice(pairs, chunk_size))
+                if not chunk:
+                    break
+                lines = []
+                for identifier, sequence in chunk:
+                    # Ensure the sequence is not null before writing
+                    if pd.isna(sequence) or not sequence:
+                        continue
+                    sequence = f"{sequence}"
+                    if line_width:
+                        sequence = _wrap_sequence(sequence, line_width)
+                    lines.append(f">{identifier}\n{sequence}\n")
+                fasta_file.write("".join(lines))
+                n_written += len(lines)
+        if atomic:
+            os.replace(target, output_file)
+    except BaseException:
+        if atomic and target.exists():
+            target.unlink()
+        raise
+
+    return n_written
+
 
-def save_df_as_fasta(dataframe: pd.DataFrame, id_col: str, seq_col: str, output_file: Path, verbose: bool = True):
+def save_df_as_fasta(dataframe: pd.DataFrame, id_col: str, seq_col: str, output_file: Path,
+                     verbose: bool = True, line_width: Optional[int] = None):
     """
     Saves specified columns from a DataFrame into a FASTA formatted file.
 
@@ -19,20 +122,12 @@ def save_df_as_fasta(dataframe: pd.DataFrame, id_col: str, seq_col: str, output_
         dataframe (pd.DataFrame): The DataFrame containing the sequence data.
         id_col (str): The name of the column to be used for the FASTA header.
         seq_col (str): The name of the column containing the sequence.
-        filename (str): The name of the output file.
+        output_file (Path): The path of the output file ('.gz' writes gzip).
+        verbose (bool): If True, prints a success message. Defaults to True.
+        line_width (int, optional): Wrap sequence lines to this width. Defaults to no wrapping.
     """
     try:
-        with open(output_file, 'w') as fasta_file:
-            # Iterate over each row in the DataFrame
-            for index, row in dataframe.iterrows():
-                identifier = row[id_col]
-                sequence = row[seq_col]
-
-                # Ensure the sequence is not null before writing
-                if pd.notna(sequence) and sequence:
-                    # Write the header and sequence to the file
-                    fasta_file.write(f">{identifier}\n")
-                    fasta_file.write(f"{sequence}\n")
+        write_fasta(dataframe, output_file, id_col=id_col, seq_col=seq_col, line_width=line_width)
 
         if verbose:
             print(f"Success! DataFrame has been saved to '{output_file}'.")
@@ -42,6 +137,64 @@ def save_df_as_fasta(dataframe: pd.DataFrame, id_col: str, seq_col: str, output_
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
+
+def _save_df_as_fasta_iterrows(dataframe: pd.DataFrame, id_col: str, seq_col: str, output_file: Path):
+    """Original row-by-row writer, kept only as the baseline for `benchmark_fasta_writer`."""
+    with open(output_file, 'w') as fasta_file:
+        for index, row in dataframe.iterrows():
+            identifier = row[id_col]
+            sequence = row[seq_col]
+            if pd.notna(sequence) and sequence:
+                fasta_file.write(f">{identifier}\n")
+                fasta_file.write(f"{sequence}\n")
+
+
+def benchmark_fasta_writer(n_records: int = 200_000, seq_length: int = 30, repeats: int = 3,
+                           output_dir: Optional[Path] = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Compares the original iterrows writer against `write_fasta` on a random library.
+
+    Args:
+        n_records (int): Number of random peptides to write. Defaults to 200000.
+        seq_length (int): Length of each peptide. Defaults to 30.
+        repeats (int): Timed runs per writer; the best one is reported. Defaults to 3.
+        output_dir (Path, optional): Where to write the files. Defaults to a temporary directory.
+        seed (int): Random seed for the library. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: One row per writer with 'seconds', 'records_per_second' and 'speedup'.
+    """
+    rng = np.random.default_rng(seed)
+    letters = np.frombuffer(b"ACDEFGHIKLMNPQRSTVWY", dtype=np.uint8)
+    residues = letters[rng.integers(0, letters.size, size=(n_records, seq_length))]
+    df = pd.DataFrame({
+        'id': [f"seq_{i}" for i in range(n_records)],
+        'sequence': residues.view(f"S{seq_length}").ravel().astype(str),
+    })
+
+    writers = {
+        'iterrows': lambda path: _save_df_as_fasta_iterrows(df, 'id', 'sequence', path),
+        'write_fasta': lambda path: write_fasta(df, path, id_col='id', seq_col='sequence'),
+        'write_fasta_gzip': lambda path: write_fasta(df, path.with_suffix('.fasta.gz'),
+                                                     id_col='id', seq_col='sequence'),
+    }
+
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        rows = []
+        for name, writer in writers.items():
+            path = Path(tmp_dir) / f"{name}.fasta"
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                writer(path)
+                timings.append(time.perf_counter() - start)
+            rows.append({'writer': name, 'seconds': min(timings)})
+
+    results = pd.DataFrame(rows).set_index('writer')
+    results['records_per_second'] = n_records / results['seconds']
+    results['speedup'] = results.loc['iterrows', 'seconds'] / results['seconds']
+    return results
+
 def run_clustal_omega(input_file: Path, output_file: Path, output_format: str = 'clu', threads: int = 4):
     """
     Runs a sequence alignment using the Clustal Omega command-line tool.
@@ -95,17 +248,181 @@ def test():
     print("Test function in bio_utils.py is working!")
     
 # This function requires Biopython and pandasimport pandas as pd
-from Bio import SeqIO
 from pathlib import Path
 from typing import Optional, Dict, Any
 
-def inspect_fasta_file(file_path: Path, iupac: bool = False, verbose: bool = True) -> Optional[Dict[str, Any]]:
+# Clases de carácter de la tabla de búsqueda: inválido, válido, espacio en blanco (se ignora)
+_INVALID, _VALID, _WHITESPACE = 0, 1, 2
+
+
+def _character_class(char: str, valid_chars: set) -> int:
+    if char in " \t\r\n":
+        return _WHITESPACE
+    return _INVALID if set(char.upper()).difference(valid_chars) else _VALID
+
+
+def _character_table(valid_chars: set) -> np.ndarray:
+    """256-entry lookup table with the class of every byte / Latin-1 code point."""
+    return np.array([_character_class(chr(code), valid_chars) for code in range(256)], dtype=np.uint8)
+
+
+def _validate_chunk(ids, sequences, valid_chars: set, table: np.ndarray,
+                    invalid_chars_found: Dict[str, list], empty_sequences: list) -> None:
+    """
+    Checks a batch of sequences (str or raw bytes) in bulk with the lookup table.
+
+    Whitespace (including line breaks of raw FASTA bytes) is ignored, as the FASTA
+    parser drops it. Results are accumulated in `invalid_chars_found` and `empty_sequences`.
+    """
+    if not ids:
+        return
+    joined = b"".join(sequences) if isinstance(sequences[0], bytes) else "".join(sequences)
+    if isinstance(joined, bytes) and not joined.isascii():
+        sequences = [seq.decode("utf-8", errors="replace") for seq in sequences]
+        joined = "".join(sequences)
+    if isinstance(joined, bytes):
+        codes = np.frombuffer(joined, dtype=np.uint8)
+        classes = table[codes]
+    elif joined.isascii():
+        codes = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+        classes = table[codes]
+    else:
+        codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+        classes = table[np.minimum(codes, 255)]
+        wide = np.flatnonzero(codes > 255)
+        for code in np.unique(codes[wide]):
+            classes[wide[codes[wide] == code]] = _character_class(chr(code), valid_chars)
+
+    raw_lengths = np.fromiter((len(seq) for seq in sequences), dtype=np.int64, count=len(sequences))
+    ends = np.cumsum(raw_lengths)
+    starts = ends - raw_lengths
+
+    # Longitud efectiva (sin espacios) de cada registro a partir de una suma acumulada
+    residues = np.concatenate(([0], np.cumsum(classes != _WHITESPACE, dtype=np.int64)))
+    lengths = residues[ends] - residues[starts]
+
+    invalid_positions = np.flatnonzero(classes == _INVALID)
+    rogue_by_record: Dict[int, set] = {}
+    if invalid_positions.size:
+        records = np.searchsorted(ends, invalid_positions, side='right')
+        pairs = np.unique(np.stack([records, codes[invalid_positions].astype(np.int64)]), axis=1)
+        for record, code in pairs.T:
+            rogue_by_record.setdefault(int(record), set()).update(
+                set(chr(code).upper()).difference(valid_chars))
+
+    flagged = set(np.flatnonzero(lengths == 0).tolist()) | set(rogue_by_record)
+    for record in sorted(flagged):
+        # 1. Critical Error: Empty sequence
+        if lengths[record] == 0:
+            empty_sequences.append(ids[record])
+        # 3. Critical Error: Invalid characters
+        if record in rogue_by_record:
+            invalid_chars_found[ids[record]] = sorted(rogue_by_record[record])
+
+
+# Primera palabra de cada encabezado (el ID que asigna el parser FASTA)
+_HEADER_ID_PATTERN = re.compile(rb"^>[^\S\n]*(\S*)", re.MULTILINE)
+
+
+def _validate_block(block: bytes, valid_chars: set, table: np.ndarray,
+                    invalid_chars_found: Dict[str, list], empty_sequences: list) -> list:
+    """
+    Validates a raw FASTA block (whole records, starting at '>') without splitting it
+    into records: header lines are masked out and every sequence byte goes through the
+    lookup table at once. Non-ASCII blocks fall back to `_validate_chunk`.
+
+    Returns:
+        list: The record ids found in the block, in order.
+    """
+    if not block.isascii():
+        ids, raw_sequences = split_record_block(block)
+        _validate_chunk(ids, raw_sequences, valid_chars, table, invalid_chars_found, empty_sequences)
+        return ids
+
+    ids = b"\n".join(_HEADER_ID_PATTERN.findall(block)).decode("ascii").split("\n")
+    codes = np.frombuffer(block, dtype=np.uint8)
+    size = codes.size
+
+    line_starts = np.empty(size, dtype=bool)
+    line_starts[0] = True
+    line_starts[1:] = codes[:-1] == ord("\n")
+    header_starts = np.flatnonzero(line_starts & (codes == ord(">")))
+    newlines = np.flatnonzero(codes == ord("\n"))
+    after = np.searchsorted(newlines, header_starts)
+    header_ends = np.where(after < newlines.size, newlines[np.minimum(after, newlines.size - 1)], size)
+
+    # Máscara de encabezados: +1 al inicio de cada encabezado, -1 en su salto de línea
+    delta = np.zeros(size + 1, dtype=np.int32)
+    delta[header_starts] += 1
+    delta[header_ends] -= 1
+    in_header = np.cumsum(delta[:-1], dtype=np.int32) > 0
+
+    classes = table[codes]
+    residues = np.concatenate(([0], np.cumsum((classes != _WHITESPACE) & ~in_header, dtype=np.int32)))
+    record_ends = np.append(header_starts[1:], size)
+    lengths = residues[record_ends] - residues[header_ends]
+
+    invalid_positions = np.flatnonzero((classes == _INVALID) & ~in_header)
+    rogue_by_record: Dict[int, set] = {}
+    if invalid_positions.size:
+        records = np.searchsorted(header_starts, invalid_positions, side='right') - 1
+        pairs = np.unique(np.stack([records, codes[invalid_positions].astype(np.int64)]), axis=1)
+        for record, code in pairs.T:
+            rogue_by_record.setdefault(int(record), set()).update(
+                set(chr(code).upper()).difference(valid_chars))
+
+    for record in sorted(set(np.flatnonzero(lengths == 0).tolist()) | set(rogue_by_record)):
+        if lengths[record] == 0:
+            empty_sequences.append(ids[record])
+        if record in rogue_by_record:
+            invalid_chars_found[ids[record]] = sorted(rogue_by_record[record])
+    return ids
+
+
+def _summarize_inspection(all_ids: pd.Series, invalid_chars_found: Dict[str, list],
+                          empty_sequences: list) -> Dict[str, Any]:
+    record_count = len(all_ids)
+    # 2. Warning: Duplicate ID
+    duplicate_ids = all_ids[all_ids.duplicated()].unique().tolist()
+    return {
+        'is_valid': record_count > 0 and not invalid_chars_found and not empty_sequences,
+        'record_count': record_count,
+        'has_duplicates': bool(duplicate_ids),
+        'duplicate_ids': duplicate_ids,
+        'invalid_chars_found': invalid_chars_found,
+        'empty_sequences': empty_sequences
+    }
+
+
+def _print_inspection(results: Dict[str, Any], source: str = "File") -> None:
+    if results['record_count'] == 0:
+        print(f"  - ERROR: The {source.lower()} contains no FASTA records.")
+    if results['is_valid']:
+        print(f"  - OK! {source} is structurally valid. Found {results['record_count']} records.")
+    else:
+        print(f"  - FAILED! {source} has critical errors.")
+        if results['invalid_chars_found']:
+            print(f"    - Invalid characters in records: {results['invalid_chars_found']}")
+        if results['empty_sequences']:
+            print(f"    - Records with empty sequences: {results['empty_sequences']}")
+
+    if results['has_duplicates']:
+        print(f"  - WARNING: Found duplicate IDs: {results['duplicate_ids']}")
+
+
+def inspect_fasta_file(file_path: Path, iupac: bool = False, verbose: bool = True,
+                       vectorized: bool = True, block_size: int = 1 << 24) -> Optional[Dict[str, Any]]:
     """
     Inspects a FASTA file for format, critical errors, and warnings.
 
     Args:
         file_path (Path): The path to the file to be validated.
+        iupac (bool): If True, only IUPAC amino acids plus gap/stop are accepted.
         verbose (bool): If True, prints detailed progress and results. Defaults to True.
+        vectorized (bool): If True (default), the raw file bytes are checked in bulk
+                           against a lookup table, one block of whole records at a time.
+                           If False, records are checked one by one.
+        block_size (int): Approximate bytes per vectorized block. Defaults to 16 MiB.
 
     Returns:
         Dict[str, Any]: A dictionary containing inspection results:
@@ -117,6 +434,88 @@ def inspect_fasta_file(file_path: Path, iupac: bool = False, verbose: bool = Tru
                          'empty_sequences': list}
         None: If the file is not found or a critical parsing error occurs.
     """
+    if not vectorized:
+        return _inspect_fasta_file_by_record(file_path, iupac, verbose)
+
+    if verbose:
+        print(f"Inspecting file: {file_path}...")
+
+    valid_chars = IUPAC_AMINO_ACID_SET if iupac else VALID_SEQUENCE_CHARS
+    table = _character_table(valid_chars)
+    id_chunks = []
+    invalid_chars_found = {}
+    empty_sequences = []
+
+    try:
+        for block in iter_record_blocks(file_path, block_size):
+            ids = _validate_block(block, valid_chars, table, invalid_chars_found, empty_sequences)
+            id_chunks.append(pd.Series(ids, dtype=object))
+    except FileNotFoundError:
+        if verbose: print(f"  - ERROR: The file was not found at the specified path.")
+        return None
+    except Exception as e:
+        if verbose: print(f"  - ERROR: Invalid FASTA format or parsing error: {e}")
+        return None
+
+    all_ids = pd.concat(id_chunks, ignore_index=True) if id_chunks else pd.Series([], dtype=object)
+    results = _summarize_inspection(all_ids, invalid_chars_found, empty_sequences)
+    if verbose:
+        _print_inspection(results)
+    return results
+
+
+def inspect_sequences(dataframe: pd.DataFrame, id_col: str, seq_col: str, iupac: bool = False,
+                      verbose: bool = True, chunk_size: int = 200_000) -> Dict[str, Any]:
+    """
+    Validates in memory the records `save_df_as_fasta` would write, without the
+    write-then-reread round trip. Returns the same dictionary as `inspect_fasta_file`
+    would for the written file.
+
+    Args:
+        dataframe (pd.DataFrame): The DataFrame containing the sequence data.
+        id_col (str): The name of the column used for the FASTA header.
+        seq_col (str): The name of the column containing the sequence.
+        iupac (bool): If True, only IUPAC amino acids plus gap/stop are accepted.
+        verbose (bool): If True, prints the results. Defaults to True.
+        chunk_size (int): Records per vectorized batch. Defaults to 200000.
+
+    Returns:
+        Dict[str, Any]: See `inspect_fasta_file`.
+    """
+    if verbose:
+        print(f"Inspecting {len(dataframe)} in-memory records...")
+
+    valid_chars = IUPAC_AMINO_ACID_SET if iupac else VALID_SEQUENCE_CHARS
+    table = _character_table(valid_chars)
+
+    # Igual que save_df_as_fasta: las secuencias nulas o vacías no se escriben
+    sequences = dataframe[seq_col]
+    written = sequences.notna() & (sequences.astype(str) != "")
+    sequences = sequences[written].astype(str).tolist()
+    # El parser FASTA toma como ID la primera palabra del encabezado
+    # astype(str) también con IDs numéricos o un DataFrame vacío (dtype object para .str)
+    headers = dataframe.loc[written, id_col].astype(str).astype(object)
+    if len(headers) and headers.str.contains(r"\s", regex=True).any():
+        headers = headers.str.split(n=1).str[0].fillna("")
+    ids = headers.tolist()
+
+    invalid_chars_found = {}
+    empty_sequences = []
+    for start in range(0, len(ids), chunk_size):
+        _validate_chunk(ids[start:start + chunk_size], sequences[start:start + chunk_size],
+                        valid_chars, table, invalid_chars_found, empty_sequences)
+
+    results = _summarize_inspection(pd.Series(ids, dtype=object), invalid_chars_found, empty_sequences)
+    if verbose:
+        _print_inspection(results, source="Data")
+    return results
+
+
+def _inspect_fasta_file_by_record(file_path: Path, iupac: bool = False, verbose: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Record-by-record version of `inspect_fasta_file` (vectorized=False).
+    Returns the same dictionary, or None if the file is not found or cannot be parsed.
+    """
     if verbose:
         print(f"Inspecting file: {file_path}...")
 
@@ -131,35 +530,34 @@ def inspect_fasta_file(file_path: Path, iupac: bool = False, verbose: bool = Tru
     if iupac:
         valid_chars = IUPAC_AMINO_ACID_SET # IUPAC amino acids + gap/stop
     else:
-        valid_chars = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ-*")
+        valid_chars = VALID_SEQUENCE_CHARS
 
     try:
-        with open(file_path, "r") as handle:
-            for record in SeqIO.parse(handle, "fasta"):
-                record_count += 1
-                
-                # --- Validation Checks ---
-                # 1. Critical Error: Empty sequence
-                if len(record.seq) == 0:
-                    empty_sequences.append(record.id)
-                    is_valid = False
-
-                # 2. Warning: Duplicate ID
-                if record.id in seen_ids:
-                    duplicate_ids.append(record.id)
-                    has_duplicates = True
-                seen_ids.add(record.id)
-
-                # 3. Critical Error: Invalid characters
-                sequence_chars = set(str(record.seq).upper())
-                rogue_chars = sequence_chars.difference(valid_chars)
-                if rogue_chars:
-                    invalid_chars_found[record.id] = list(rogue_chars)
-                    is_valid = False
+        for record_id, _, sequence in iter_fasta_records(file_path):
+            record_count += 1
             
-            if record_count == 0:
+            # --- Validation Checks ---
+            # 1. Critical Error: Empty sequence
+            if len(sequence) == 0:
+                empty_sequences.append(record_id)
                 is_valid = False
-                if verbose: print("  - ERROR: The file contains no FASTA records.")
+
+            # 2. Warning: Duplicate ID
+            if record_id in seen_ids:
+                duplicate_ids.append(record_id)
+                has_duplicates = True
+            seen_ids.add(record_id)
+
+            # 3. Critical Error: Invalid characters
+            sequence_chars = set(sequence.upper())
+            rogue_chars = sequence_chars.difference(valid_chars)
+            if rogue_chars:
+                invalid_chars_found[record_id] = list(rogue_chars)
+                is_valid = False
+        
+        if record_count == 0:
+            is_valid = False
+            if verbose: print("  - ERROR: The file contains no FASTA records.")
 
     except FileNotFoundError:
         if verbose: print(f"  - ERROR: The file was not found at the specified path.")
@@ -194,64 +592,40 @@ def inspect_fasta_file(file_path: Path, iupac: bool = False, verbose: bool = Tru
     return results
 
 
-def fasta_to_dataframe(filename: str) -> pd.DataFrame:
+def fasta_to_dataframe(filename: str, use_pyarrow: bool = False) -> pd.DataFrame:
     """
     Loads sequences from a FASTA file into a pandas DataFrame.
 
     Args:
-        filename (str): The path to the FASTA file.
+        filename (str): The path to the FASTA file (plain or '.gz').
+        use_pyarrow (bool): If True, columns use the pyarrow-backed string dtype,
+                            which takes far less memory than Python objects.
 
     Returns:
         pd.DataFrame: A DataFrame with 'id', 'description', and 'sequence' columns.
     """
-    # SeqIO.parse is used to read the file.
-    # 'fasta' indicates the file format.
-    # This returns a generator, which is memory-efficient.
-    fasta_sequences = SeqIO.parse(open(filename), 'fasta')
-    
-    # Create lists to store the data for each sequence
-    ids = []
-    descriptions = []
-    sequences = []
-    
-    # Iterate over each record in the FASTA file
-    for seq_record in fasta_sequences:
-        ids.append(seq_record.id)
-        descriptions.append(seq_record.description)
-        sequences.append(str(seq_record.seq))
-    
-    # Create a dictionary from the lists
-    data = {
-        'id': ids,
-        'description': descriptions,
-        'sequence': sequences
-    }
-    
-    # Convert the dictionary into a pandas DataFrame
-    df = pd.DataFrame(data)
-    
-    return df
+    # The file is parsed directly from a memory-mapped buffer (no SeqRecord objects).
+    # Use fasta_index.iter_fasta_chunks or FastaIndex to read in batches or by ID.
+    return read_fasta(filename, use_pyarrow=use_pyarrow)
 
 # --- Función para calcular la matriz de identidad ---
-def calculate_identity_matrix(sequences):
+def calculate_identity_matrix(sequences, block_size: int = 1024, n_jobs: int = 1, dtype=np.float64,
+                              condensed: bool = False):
     """
     Calcula una matriz de identidad por pares para una lista de secuencias de igual longitud.
+
+    Delegates to the vectorized engine in `identity_engine`; the result is identical to
+    the original pairwise loop (identity normalized by the lower-index sequence length).
+
+    Args:
+        sequences (list): Sequences to compare.
+        block_size (int): Sequences per tile, bounds temporary memory. Defaults to 1024.
+        n_jobs (int): Threads used to compute tiles. Defaults to 1.
+        dtype: Output dtype (np.float64 by default, np.float16 to save memory).
+        condensed (bool): If True, returns only the upper triangle as a 1-D vector.
+
+    Returns:
+        np.ndarray: The N x N identity matrix (or its condensed upper triangle).
     """
-    n_sequences = len(sequences)
-    identity_matrix = np.zeros((n_sequences, n_sequences))
-    
-    for i in range(n_sequences):
-        for j in range(i, n_sequences):
-            # Calculte la identidad entre la secuencia i y j
-            seq1 = sequences[i]
-            seq2 = sequences[j]
-            if len(seq1) == 0: continue # Evitar división por cero
-            
-            score = sum(1 for a, b in zip(seq1, seq2) if a == b)
-            identity = score / len(seq1)
-            
-            # La matriz es simétrica
-            identity_matrix[i, j] = identity
-            identity_matrix[j, i] = identity
-            
-    return identity_matrix
\ No newline at end of file
+    return compute_identity_matrix(sequences, block_size=block_size, n_jobs=n_jobs,
+                                   dtype=dtype, condensed=condensed)
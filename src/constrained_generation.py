@@ -0,0 +1,98 @@
+# constrained_generation.py
+
+# --- Generación restringida a aminoácidos con parada al alcanzar la longitud máxima ---
+
+import torch
+from typing import List, NamedTuple
+from transformers import LogitsProcessor, StoppingCriteria
+
+# Lista estándar de aminoácidos
+AMINO_ACIDS_STRING = "ACDEFGHIKLMNPQRSTVWY"
+# Marcas de espacio de los tokenizers BPE (GPT-2) y SentencePiece (XLNet)
+_SPACE_MARKERS = "Ġ▁"
+
+
+class ResidueTable(NamedTuple):
+    """Aminoácidos que aporta cada token del vocabulario ('' si no es un token de aminoácidos)."""
+    residues: List[str]
+    residues_per_token: torch.Tensor
+    allowed: torch.Tensor
+
+
+def residue_table(tokenizer, vocab_size: int) -> ResidueTable:
+    """
+    Construye la tabla de residuos de un tokenizer: un token es de aminoácidos si, sin sus
+    marcas de espacio, solo contiene letras de los 20 aminoácidos estándar. Los tokens
+    especiales, los saltos de línea, X, etc. quedan fuera.
+
+    Args:
+        tokenizer: Tokenizer del modelo.
+        vocab_size (int): Tamaño de los logits del modelo (puede superar al del tokenizer).
+
+    Returns:
+        ResidueTable: Residuos por token, su número (tensor) y la máscara de tokens permitidos.
+    """
+    special = set(tokenizer.all_special_ids)
+    residues = [""] * vocab_size
+    for token_id, token in enumerate(tokenizer.convert_ids_to_tokens(list(range(min(len(tokenizer), vocab_size))))):
+        if token_id in special or token is None:
+            continue
+        text = token.lstrip(_SPACE_MARKERS)
+        if text and all(char in AMINO_ACIDS_STRING for char in text):
+            residues[token_id] = text
+    residues_per_token = torch.tensor([len(text) for text in residues], dtype=torch.long)
+    return ResidueTable(residues, residues_per_token, residues_per_token > 0)
+
+
+class ResidueCounter:
+    """
+    Cuenta los aminoácidos de cada fila durante `generate`: los del prompt (conocidos de
+    antemano) más los de los tokens generados. La posición donde empieza lo generado se
+    fija en la primera llamada, que hace el procesador de logits antes del primer token.
+    """
+
+    def __init__(self, residues_per_token: torch.Tensor, prompt_residues: torch.Tensor):
+        self.residues_per_token = residues_per_token
+        self.prompt_residues = prompt_residues
+        self.start = None
+
+    def __call__(self, input_ids: torch.LongTensor) -> torch.Tensor:
+        if self.start is None:
+            self.start = input_ids.shape[1]
+        table = self.residues_per_token.to(input_ids.device)
+        generated = table[input_ids[:, self.start:]].sum(dim=1)
+        return self.prompt_residues.to(input_ids.device) + generated
+
+
+class AminoAcidLogitsProcessor(LogitsProcessor):
+    """
+    Enmascara los tokens que no son de aminoácidos. El token de fin solo se permite cuando
+    la secuencia tiene ya `min_length` aminoácidos, así que no se generan variantes cortas.
+    """
+
+    def __init__(self, allowed: torch.Tensor, counter: ResidueCounter, min_length: int, eos_token_id: int):
+        self.allowed = allowed
+        self.counter = counter
+        self.min_length = min_length
+        self.eos_token_id = eos_token_id
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        # También fija en el contador dónde empiezan los tokens generados
+        can_stop = self.counter(input_ids) >= self.min_length
+        allowed = self.allowed.to(scores.device)
+        eos_scores = scores[:, self.eos_token_id] if self.eos_token_id is not None else None
+        scores = scores.masked_fill(~allowed[:scores.shape[-1]], -float("inf"))
+        if eos_scores is not None:
+            scores[:, self.eos_token_id] = torch.where(can_stop, eos_scores, torch.full_like(eos_scores, -float("inf")))
+        return scores
+
+
+class MaxResiduesStoppingCriteria(StoppingCriteria):
+    """Detiene cada fila en cuanto alcanza `max_length` aminoácidos."""
+
+    def __init__(self, counter: ResidueCounter, max_length: int):
+        self.counter = counter
+        self.max_length = max_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        return self.counter(input_ids) >= self.max_length
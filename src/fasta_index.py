@@ -0,0 +1,310 @@
+# fasta_index.py
+
+# --- Lector FASTA ligero sobre archivos memory-mapped, con índice estilo .fai ---
+import gzip
+import mmap
+import os
+import pandas as pd
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+# Biopython elimina espacios y retornos de carro dentro de la secuencia
+_SEQUENCE_WHITESPACE = b" \t\r\n"
+FAI_COLUMNS = ["id", "length", "offset", "line_bases", "line_width"]
+
+
+def _is_gzip(path: Union[str, Path]) -> bool:
+    return Path(path).suffix == ".gz"
+
+
+@contextmanager
+def _open_buffer(path: Union[str, Path]):
+    """Yields a read-only bytes-like view of a plain (uncompressed) file: an mmap."""
+    if os.path.getsize(path) == 0:
+        yield b""
+        return
+    with open(path, "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def _first_header(buffer) -> int:
+    """Position of the first '>' at the start of a line, or -1 if the file has no records."""
+    if buffer[:1] == b">":
+        return 0
+    start = buffer.find(b"\n>")
+    leading = buffer[:len(buffer) if start == -1 else start]
+    # Igual que Biopython: no se permite texto antes del primer registro
+    if bytes(leading).strip():
+        raise ValueError("The FASTA file contains text before the first '>' record.")
+    return -1 if start == -1 else start + 1
+
+
+def _iter_block_ranges(buffer, block_size: int = 1 << 26) -> Iterator[Tuple[int, int]]:
+    """Yields (start, end) byte ranges of about `block_size` bytes that hold whole records."""
+    size = len(buffer)
+    start = _first_header(buffer)
+    if start == -1:
+        return
+    while start < size:
+        cut = buffer.find(b"\n>", min(start + block_size, size) - 1)
+        yield start, size if cut == -1 else cut
+        start = size if cut == -1 else cut + 1
+
+
+def _iter_gzip_blocks(path: Union[str, Path], block_size: int = 1 << 24) -> Iterator[bytes]:
+    """
+    Decompresses a .gz FASTA file incrementally and yields blocks of whole records (each
+    starting at '>'), like `_iter_block_ranges` does for a plain file. Only about two
+    blocks (or one record, if larger) are in memory at a time.
+    """
+    carry, started = b"", False
+    with gzip.open(path, "rb") as handle:
+        for data in iter(lambda: handle.read(block_size), b""):
+            buffer = carry + data
+            if not started:
+                start = _first_header(buffer)
+                if start == -1:
+                    carry = buffer
+                    continue
+                buffer, started = buffer[start:], True
+            cut = buffer.rfind(b"\n>")
+            if cut == -1:
+                carry = buffer
+                continue
+            yield buffer[:cut]
+            carry = buffer[cut + 1:]
+    if started:
+        if carry:
+            yield carry
+    else:
+        _first_header(carry)
+
+
+def _scan_records(buffer, block_size: int = 1 << 26) -> Iterator[Tuple[int, bytes, int, bytes]]:
+    """
+    Yields (header_start, header, sequence_offset, raw_sequence) for every record.
+
+    The buffer is processed in blocks of about `block_size` bytes cut at record
+    boundaries; each block is split on '\n>' in C, so the per-record Python work is
+    a few slices. raw_sequence still contains the line breaks.
+    """
+    size = len(buffer)
+    for start, end in _iter_block_ranges(buffer, block_size):
+        position = start
+        for piece in bytes(buffer[start + 1:end]).split(b"\n>"):
+            eol = piece.find(b"\n")
+            if eol == -1:
+                header, raw_sequence = piece, b""
+                offset = min(position + len(piece) + 2, size)
+            else:
+                header, raw_sequence = piece[:eol], piece[eol + 1:]
+                offset = position + eol + 2
+            yield position, header, offset, raw_sequence
+            position += len(piece) + 2
+
+
+def _parse_header(header: bytes) -> Tuple[str, str]:
+    title = header.decode("utf-8", errors="replace").rstrip()
+    record_id = title.split(None, 1)[0] if title else ""
+    return record_id, title
+
+
+def _parse_sequence(raw_sequence: bytes) -> str:
+    return raw_sequence.translate(None, _SEQUENCE_WHITESPACE).decode("utf-8", errors="replace")
+
+
+def _to_dataframe(ids: List[str], descriptions: List[str], sequences: List[str],
+                  use_pyarrow: bool = False) -> pd.DataFrame:
+    df = pd.DataFrame({'id': ids, 'description': descriptions, 'sequence': sequences})
+    if use_pyarrow:
+        df = df.astype("string[pyarrow]")
+    return df
+
+
+def iter_fasta_records(path: Union[str, Path]) -> Iterator[Tuple[str, str, str]]:
+    """
+    Iterates (id, description, sequence) tuples without building SeqRecord objects.
+
+    Args:
+        path (str | Path): FASTA file (plain or '.gz').
+
+    Yields:
+        Tuple[str, str, str]: Record id (first word of the header), full header and sequence.
+    """
+    if _is_gzip(path):
+        for block in _iter_gzip_blocks(path):
+            for _, header, _, raw_sequence in _scan_records(block):
+                record_id, description = _parse_header(header)
+                yield record_id, description, _parse_sequence(raw_sequence)
+        return
+    with _open_buffer(path) as buffer:
+        for _, header, _, raw_sequence in _scan_records(buffer):
+            record_id, description = _parse_header(header)
+            yield record_id, description, _parse_sequence(raw_sequence)
+
+
+def iter_record_blocks(path: Union[str, Path], block_size: int = 1 << 24) -> Iterator[bytes]:
+    """
+    Yields raw byte blocks of about `block_size` bytes; each block starts at a '>'
+    and holds only whole records. Used for byte-level (vectorized) processing.
+    """
+    if _is_gzip(path):
+        yield from _iter_gzip_blocks(path, block_size)
+        return
+    with _open_buffer(path) as buffer:
+        for start, end in _iter_block_ranges(buffer, block_size):
+            yield bytes(buffer[start:end])
+
+
+def split_record_block(block: bytes) -> Tuple[List[str], List[bytes]]:
+    """Splits a block from `iter_record_blocks` into record ids and raw sequence bytes."""
+    ids, raw_sequences = [], []
+    for _, header, _, raw_sequence in _scan_records(block):
+        words = header.split(None, 1)
+        ids.append(words[0].decode("utf-8", errors="replace") if words else "")
+        raw_sequences.append(raw_sequence)
+    return ids, raw_sequences
+
+
+def iter_fasta_chunks(path: Union[str, Path], chunk_size: int = 100_000,
+                      use_pyarrow: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Reads a FASTA file in DataFrame batches of at most `chunk_size` records.
+
+    Args:
+        path (str | Path): FASTA file (plain or '.gz').
+        chunk_size (int): Records per batch. Defaults to 100000.
+        use_pyarrow (bool): If True, columns use the pyarrow-backed string dtype.
+
+    Yields:
+        pd.DataFrame: Batches with 'id', 'description' and 'sequence' columns.
+    """
+    ids, descriptions, sequences = [], [], []
+    for record_id, description, sequence in iter_fasta_records(path):
+        ids.append(record_id)
+        descriptions.append(description)
+        sequences.append(sequence)
+        if len(ids) >= chunk_size:
+            yield _to_dataframe(ids, descriptions, sequences, use_pyarrow)
+            ids, descriptions, sequences = [], [], []
+    if ids:
+        yield _to_dataframe(ids, descriptions, sequences, use_pyarrow)
+
+
+def read_fasta(path: Union[str, Path], use_pyarrow: bool = False) -> pd.DataFrame:
+    """Reads a whole FASTA file into a DataFrame with 'id', 'description' and 'sequence'."""
+    ids, descriptions, sequences = [], [], []
+    for record_id, description, sequence in iter_fasta_records(path):
+        ids.append(record_id)
+        descriptions.append(description)
+        sequences.append(sequence)
+    return _to_dataframe(ids, descriptions, sequences, use_pyarrow)
+
+
+class FastaIndex:
+    """
+    Random access to the records of a FASTA file through a samtools-style `.fai` index.
+
+    The index stores, for every record: id, sequence length, byte offset of the sequence,
+    bases per line and bytes per line. It is written next to the FASTA file
+    (`<file>.fai`) and reused while it is newer than the FASTA file.
+    """
+
+    def __init__(self, fasta_file: Union[str, Path], rebuild: bool = False, write: bool = True):
+        """
+        Loads or builds the index of a FASTA file.
+
+        Args:
+            fasta_file (str | Path): Plain (uncompressed) FASTA file.
+            rebuild (bool): If True, ignores an existing `.fai` file. Defaults to False.
+            write (bool): If True, writes the `.fai` file after building it. Defaults to True.
+        """
+        self.fasta_file = Path(fasta_file)
+        if _is_gzip(self.fasta_file):
+            raise ValueError("FastaIndex requires an uncompressed FASTA file.")
+        self.fai_file = self.fasta_file.with_name(self.fasta_file.name + ".fai")
+
+        if (not rebuild and self.fai_file.exists()
+                and self.fai_file.stat().st_mtime >= self.fasta_file.stat().st_mtime):
+            self.index = pd.read_csv(self.fai_file, sep="\t", header=None, names=FAI_COLUMNS,
+                                     dtype={"id": str}, keep_default_na=False)
+        else:
+            self.index = self._build()
+            if write:
+                self.write_fai()
+
+        # Ante IDs duplicados, la búsqueda devuelve la primera aparición
+        self._positions = pd.Series(range(len(self.index)), index=self.index["id"])
+        self._positions = self._positions[~self._positions.index.duplicated()]
+
+    def _build(self) -> pd.DataFrame:
+        rows = []
+        with _open_buffer(self.fasta_file) as buffer:
+            for _, header, offset, raw in _scan_records(buffer):
+                words = header.split(None, 1)
+                record_id = words[0].decode("utf-8", errors="replace") if words else ""
+                first_eol = raw.find(b"\n")
+                first_line = raw if first_eol == -1 else raw[:first_eol + 1]
+                line_bases = len(first_line.translate(None, _SEQUENCE_WHITESPACE))
+                length = len(raw.translate(None, _SEQUENCE_WHITESPACE))
+                rows.append((record_id, length, offset, line_bases, len(first_line)))
+        return pd.DataFrame(rows, columns=FAI_COLUMNS)
+
+    def write_fai(self) -> None:
+        """Writes the index as a tab-separated `.fai` file."""
+        self.index.to_csv(self.fai_file, sep="\t", header=False, index=False)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._positions.index
+
+    @property
+    def ids(self) -> List[str]:
+        return self.index["id"].tolist()
+
+    def _read(self, buffer, position: int) -> Tuple[str, str, str]:
+        offset = int(self.index.iat[position, 2])
+        if offset >= len(buffer):
+            end = offset
+        else:
+            next_header = buffer.find(b"\n>", offset - 1)
+            end = len(buffer) if next_header == -1 else max(next_header, offset)
+        header_start = buffer.rfind(b"\n", 0, max(offset - 1, 0)) + 1
+        record_id, description = _parse_header(bytes(buffer[header_start + 1:offset]))
+        return record_id, description, _parse_sequence(bytes(buffer[offset:end]))
+
+    def fetch(self, record_id: str) -> str:
+        """Returns the sequence of `record_id`, reading only that record from disk."""
+        if record_id not in self:
+            raise KeyError(f"Record '{record_id}' not found in '{self.fasta_file}'.")
+        with _open_buffer(self.fasta_file) as buffer:
+            return self._read(buffer, int(self._positions[record_id]))[2]
+
+    def get_records(self, record_ids: Sequence[str], use_pyarrow: bool = False) -> pd.DataFrame:
+        """Returns the requested records (in the given order) as an id/description/sequence DataFrame."""
+        missing = [rid for rid in record_ids if rid not in self]
+        if missing:
+            raise KeyError(f"Records not found in '{self.fasta_file}': {missing[:5]}")
+        ids, descriptions, sequences = [], [], []
+        with _open_buffer(self.fasta_file) as buffer:
+            for record_id in record_ids:
+                _, description, sequence = self._read(buffer, int(self._positions[record_id]))
+                ids.append(record_id)
+                descriptions.append(description)
+                sequences.append(sequence)
+        return _to_dataframe(ids, descriptions, sequences, use_pyarrow)
+
+    def iter_chunks(self, chunk_size: int = 100_000, use_pyarrow: bool = False,
+                    start: int = 0, stop: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Yields DataFrame batches for records [start, stop) in file order."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        with _open_buffer(self.fasta_file) as buffer:
+            for chunk_start in range(start, stop, chunk_size):
+                records = [self._read(buffer, position)
+                           for position in range(chunk_start, min(chunk_start + chunk_size, stop))]
+                ids, descriptions, sequences = (list(column) for column in zip(*records))
+                yield _to_dataframe(ids, descriptions, sequences, use_pyarrow)
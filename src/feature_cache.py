@@ -0,0 +1,235 @@
+# feature_cache.py
+
+# --- Caché persistente de descriptores por secuencia (direccionada por contenido) ---
+import hashlib
+import json
+import os
+import time
+import uuid
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+SEQ_HASH_COL = "seq_hash"
+
+
+def sequence_hash(sequence: str) -> str:
+    """Hash SHA-1 (hex) de una secuencia; es la clave de la caché."""
+    return hashlib.sha1(str(sequence).encode("utf-8")).hexdigest()
+
+
+def sequence_hashes(sequences: Iterable[str]) -> List[str]:
+    return [sequence_hash(seq) for seq in sequences]
+
+
+def settings_hash(descriptor: str, settings_json_file: Optional[Union[str, Path]] = None) -> str:
+    """
+    Hash de los parámetros que afectan a un descriptor.
+
+    Solo se considera la entrada del descriptor dentro del JSON de configuración, de modo
+    que dos archivos con los mismos parámetros para ese descriptor comparten la caché.
+    Sin archivo (o sin entrada para el descriptor) se usan los valores por defecto.
+    """
+    params = None
+    if settings_json_file and Path(settings_json_file).exists():
+        with open(settings_json_file, "r") as handle:
+            try:
+                params = json.load(handle).get(descriptor)
+            except ValueError:
+                params = None
+    payload = json.dumps(params, sort_keys=True) if params is not None else "default"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class FeatureCache:
+    """
+    Caché en disco de descriptores de iFeature, con clave (hash de secuencia, descriptor,
+    hash de parámetros).
+
+    Cada combinación (descriptor, parámetros) es un directorio con archivos Parquet
+    (formato columnar; requiere pyarrow). Cada archivo tiene la columna `seq_hash` y las
+    columnas del descriptor. Al buscar solo se lee la columna de claves de cada archivo,
+    y los archivos completos solo si contienen aciertos.
+
+    Cuando el tamaño total supera `max_bytes`, se eliminan los archivos usados hace
+    más tiempo (la fecha de modificación se actualiza en cada acierto).
+
+    Cada `store` añade un archivo; cuando un grupo pasa de `max_parts` archivos, los
+    menores de `compact_bytes` se fusionan en uno para que `lookup` no tenga que abrir
+    cada vez más archivos.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: Optional[int] = 2 * 1024 ** 3,
+                 max_parts: Optional[int] = 32, compact_bytes: int = 64 * 1024 ** 2):
+        """
+        Parámetros
+        ----------
+        cache_dir : str | Path
+            Directorio raíz de la caché (se crea si no existe).
+        max_bytes : int | None
+            Tamaño máximo en disco. None desactiva la expulsión. Por defecto 2 GiB.
+        max_parts : int | None
+            Archivos por grupo a partir de los cuales `store` compacta el grupo. None
+            desactiva la compactación automática. Por defecto 32.
+        compact_bytes : int
+            Solo se fusionan los archivos menores que este tamaño, así los ya compactados
+            no se reescriben en cada compactación. Por defecto 64 MiB.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_parts = max_parts
+        self.compact_bytes = compact_bytes
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _group_dir(self, descriptor: str, params_hash: str) -> Path:
+        safe_name = "".join(c if c.isalnum() else "_" for c in descriptor)
+        return self.cache_dir / f"{safe_name}__{params_hash}"
+
+    def _parts(self, descriptor: str, params_hash: str) -> List[Path]:
+        group_dir = self._group_dir(descriptor, params_hash)
+        return sorted(group_dir.glob("*.parquet")) if group_dir.exists() else []
+
+    def _record(self, descriptor: str, hits: int, misses: int) -> None:
+        entry = self.stats.setdefault(descriptor, {"hits": 0, "misses": 0})
+        entry["hits"] += hits
+        entry["misses"] += misses
+
+    def lookup(self, descriptor: str, params_hash: str, hashes: Iterable[str]) -> pd.DataFrame:
+        """
+        Busca en bloque los hashes pedidos.
+
+        Retorna
+        -------
+        pandas.DataFrame
+            Descriptores de los hashes encontrados, indexados por `seq_hash`.
+        """
+        pending = set(hashes)
+        requested = len(pending)
+        found = []
+        for part in self._parts(descriptor, params_hash):
+            if not pending:
+                break
+            try:
+                keys = pd.read_parquet(part, columns=[SEQ_HASH_COL])[SEQ_HASH_COL]
+                mask = keys.isin(pending)
+                if not mask.any():
+                    continue
+                rows = pd.read_parquet(part)[mask.to_numpy()]
+            except (OSError, ValueError) as e:
+                print(f"Archivo de caché ilegible '{part}', se ignora: {e}")
+                continue
+            found.append(rows)
+            pending.difference_update(rows[SEQ_HASH_COL])
+            os.utime(part)
+
+        if found:
+            result = pd.concat(found, ignore_index=True).drop_duplicates(SEQ_HASH_COL)
+            result = result.set_index(SEQ_HASH_COL)
+        else:
+            result = pd.DataFrame(index=pd.Index([], name=SEQ_HASH_COL))
+        self._record(descriptor, requested - len(pending), len(pending))
+        return result
+
+    def store(self, descriptor: str, params_hash: str, features: pd.DataFrame) -> None:
+        """
+        Guarda descriptores nuevos. `features` debe estar indexado por `seq_hash`.
+        """
+        if features.empty:
+            return
+        group_dir = self._group_dir(descriptor, params_hash)
+        group_dir.mkdir(parents=True, exist_ok=True)
+        table = features[~features.index.duplicated()].reset_index()
+        table.columns = [SEQ_HASH_COL] + [str(c) for c in table.columns[1:]]
+
+        self._write_part(group_dir, table)
+        if self.max_parts is not None and len(self._parts(descriptor, params_hash)) > self.max_parts:
+            self.compact(descriptor, params_hash)
+        self.evict()
+
+    @staticmethod
+    def _write_part(group_dir: Path, table: pd.DataFrame) -> Path:
+        # Escritura atómica: archivo temporal + rename
+        name = f"{time.time_ns()}_{uuid.uuid4().hex[:8]}.parquet"
+        tmp_file = group_dir / f".{name}.tmp"
+        table.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, group_dir / name)
+        return group_dir / name
+
+    def compact(self, descriptor: str, params_hash: str) -> int:
+        """
+        Fusiona en un solo archivo los archivos del grupo menores de `compact_bytes`.
+        El archivo nuevo conserva la fecha de uso más reciente de los fusionados.
+        Devuelve cuántos archivos se fusionaron (0 si había menos de dos).
+        """
+        small = [part for part in self._parts(descriptor, params_hash)
+                 if part.stat().st_size < self.compact_bytes]
+        tables, merged, last_used = [], [], 0.0
+        for part in small:
+            try:
+                last_used = max(last_used, part.stat().st_mtime)
+                tables.append(pd.read_parquet(part))
+            except (OSError, ValueError) as e:
+                print(f"Archivo de caché ilegible '{part}', no se compacta: {e}")
+                continue
+            merged.append(part)
+        if len(merged) < 2:
+            return 0
+
+        table = pd.concat(tables, ignore_index=True).drop_duplicates(SEQ_HASH_COL)
+        new_part = self._write_part(self._group_dir(descriptor, params_hash), table)
+        os.utime(new_part, (last_used, last_used))
+        # Los lectores concurrentes ignoran los archivos que desaparecen (OSError en lookup)
+        for part in merged:
+            part.unlink(missing_ok=True)
+        return len(merged)
+
+    def size_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.cache_dir.glob("*/*.parquet"))
+
+    def evict(self) -> int:
+        """Elimina los archivos usados hace más tiempo hasta respetar max_bytes. Devuelve cuántos."""
+        if self.max_bytes is None:
+            return 0
+        parts = [(f.stat().st_mtime, f.stat().st_size, f) for f in self.cache_dir.glob("*/*.parquet")]
+        total = sum(size for _, size, _ in parts)
+        removed = 0
+        for _, size, part in sorted(parts):
+            if total <= self.max_bytes:
+                break
+            part.unlink()
+            total -= size
+            removed += 1
+        return removed
+
+    def prune(self, descriptor: str, keep_params_hash: str) -> int:
+        """
+        Elimina los archivos de `descriptor` guardados con otros parámetros (p. ej. tras
+        cambiar un modelo). Devuelve cuántos archivos se eliminaron.
+        """
+        keep_dir = self._group_dir(descriptor, keep_params_hash)
+        prefix = keep_dir.name[:-len(keep_params_hash)]
+        removed = 0
+        for group_dir in self.cache_dir.glob(f"{prefix}*"):
+            # Solo grupos del mismo descriptor (no 'desc__x' de un descriptor 'desc_' ...)
+            if group_dir == keep_dir or not group_dir.is_dir() or "_" in group_dir.name[len(prefix):]:
+                continue
+            for part in group_dir.glob("*.parquet"):
+                part.unlink()
+                removed += 1
+            if not any(group_dir.iterdir()):
+                group_dir.rmdir()
+        return removed
+
+    def clear(self) -> None:
+        """Vacía la caché."""
+        for part in self.cache_dir.glob("*/*.parquet"):
+            part.unlink()
+
+    def hit_rates(self) -> pd.DataFrame:
+        """Aciertos, fallos y tasa de aciertos por descriptor desde que se creó el objeto."""
+        rows = [{"descriptor": d, **s} for d, s in self.stats.items()]
+        report = pd.DataFrame(rows, columns=["descriptor", "hits", "misses"])
+        total = report["hits"] + report["misses"]
+        report["hit_rate"] = (report["hits"] / total.where(total > 0)).fillna(0.0)
+        return report
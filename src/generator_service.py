@@ -0,0 +1,611 @@
+# generator_service.py
+
+# --- Generadores persistentes: el modelo se carga una vez y atiende varias peticiones ---
+
+import copy
+import json
+import os
+import threading
+import time
+import numpy as np
+import torch
+from pathlib import Path
+from tqdm.auto import tqdm
+from typing import Optional, Union
+from accelerate import Accelerator
+from transformers import LogitsProcessorList, StoppingCriteriaList
+from .batch_scheduler import fixed_size_batches, padding_efficiency, token_budget_batches
+from .constrained_generation import (AminoAcidLogitsProcessor, MaxResiduesStoppingCriteria, ResidueCounter,
+                                     ResidueTable, residue_table)
+from .prefix_sharing import prefill_tokens, prefix_batches, shared_prefix_groups
+from .prompt_mutator import mutate_prompts
+from .variant_sink import VariantDeduplicator, VariantSink
+
+
+class WarmGenerator:
+    """
+    Generador de péptidos con un pipeline de Hugging Face que se mantiene cargado.
+
+    El modelo, el tokenizer y el pipeline se crean una sola vez (en el constructor) y cada
+    llamada a `generate` solo prepara los prompts y genera. Las subclases definen cómo
+    se carga el modelo (`_load`), cómo se escribe un prompt (`_format_prompt`) y cómo se
+    limpia el texto generado (`_clean`).
+
+    Uso:
+        with ProtGPT2Generator("nferruz/ProtGPT2") as generator:
+            for ronda in range(10):
+                variantes = generator.generate(semillas, num_variants_per_seq=5)
+        print(generator.metrics())
+    """
+
+    name = "generador"
+    # Si el modelo admite reutilizar `past_key_values` entre prompts (ver `generate`)
+    supports_prefix_sharing = True
+
+    def __init__(self, model_name_or_path: str, seed: Optional[int] = None):
+        """
+        Args:
+            model_name_or_path (str): Nombre o ruta del modelo.
+            seed (int, optional): Semilla de las mutaciones de los prompts (reproducibles
+                                  entre ejecuciones con la misma secuencia de peticiones).
+        """
+        self.model_name_or_path = model_name_or_path
+        self.rng = np.random.default_rng(seed)
+        self.accelerator = Accelerator()
+        self.device = self.accelerator.device
+        self.tokenizer = None
+        self.generator = None
+        self._residues = None
+        self._lock = threading.Lock()
+        self._metrics = {"load_seconds": 0.0, "n_requests": 0, "generate_seconds": 0.0,
+                         "last_generate_seconds": 0.0, "last_n_prompts": 0, "last_n_variants": 0,
+                         "last_sequences_per_second": 0.0, "last_padding_efficiency": None,
+                         "last_prefill_tokens_saved": 0, "last_acceptance_rates": []}
+        print(f"Usando dispositivo: {self.device}")
+
+        start = time.perf_counter()
+        self._load()
+        self._metrics["load_seconds"] = time.perf_counter() - start
+        print(f"Pipeline de {self.name} cargado en {self._metrics['load_seconds']:.1f} s.")
+
+    def _load(self) -> None:
+        raise NotImplementedError
+
+    def _format_prompt(self, sequence: str) -> str:
+        raise NotImplementedError
+
+    def _clean(self, generated_text: str) -> str:
+        raise NotImplementedError
+
+    def _accept(self, generated_text: str, min_length: int, max_length: int) -> Optional[str]:
+        """Texto limpio y recortado a max_length, o None si queda por debajo de min_length."""
+        clean = self._clean(generated_text)
+        if len(clean) > max_length:
+            clean = clean[:max_length]
+        if len(clean) < min_length:
+            return None
+        return clean
+
+    def _gen_kwargs(self, num_return_sequences, min_length, max_length, temperature, top_k, top_p,
+                    max_new_tokens, repetition_penalty) -> dict:
+        return dict(
+            min_length=min_length,
+            max_length=max_length,
+            max_new_tokens=max_new_tokens,
+            num_return_sequences=num_return_sequences,
+            do_sample=True,
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            pad_token_id=self.tokenizer.pad_token_id,
+            repetition_penalty=repetition_penalty,
+        )
+
+    def _schedule(self, formatted_prompts: list, token_budget: int, num_return_sequences: int,
+                  max_new_tokens: int, batch_size: Optional[int] = None):
+        """
+        Ordena los prompts por longitud tokenizada y los agrupa por presupuesto de tokens
+        (ver `token_budget_batches`). Informa de la eficiencia de relleno y, con `batch_size`,
+        de la que tendrían lotes fijos de ese tamaño en el orden recibido.
+
+        Returns:
+            tuple: (orden de los prompts, tamaño de cada lote consecutivo en ese orden).
+        """
+        lengths = [len(ids) for ids in self.tokenizer(formatted_prompts)["input_ids"]]
+        batches = token_budget_batches(lengths, token_budget, num_return_sequences, max_new_tokens)
+        efficiency = padding_efficiency(lengths, batches)
+        self._metrics["last_padding_efficiency"] = efficiency
+        message = f"{len(batches)} lotes con presupuesto de {token_budget} tokens. Eficiencia de relleno: {efficiency:.1%}"
+        if batch_size:
+            baseline = padding_efficiency(lengths, fixed_size_batches(len(lengths), batch_size))
+            message += f" (lotes fijos de {batch_size}: {baseline:.1%})"
+        print(message)
+        order = np.concatenate(batches) if batches else np.empty(0, dtype=np.int64)
+        return order, [len(batch) for batch in batches]
+
+    def _run_batches(self, prompts: list, batch_sizes: list, gen_kwargs: dict):
+        """Ejecuta el pipeline lote a lote y devuelve las salidas de cada prompt en orden."""
+        start = 0
+        for size in batch_sizes:
+            yield from self.generator(prompts[start:start + size], batch_size=size, **gen_kwargs)
+            start += size
+
+    def _plan_shared_prefixes(self, formatted_prompts: list, num_return_sequences: int, batch_size: int) -> tuple:
+        """
+        Agrupa los prompts por prefijo común (ver `shared_prefix_groups`) e informa de los
+        tokens de prompt ahorrados.
+
+        Returns:
+            tuple: (tokens de cada prompt, lista de (longitud del prefijo, lotes de índices) por grupo).
+        """
+        # Como el pipeline, sin tokens especiales añadidos por el tokenizer
+        token_ids = self.tokenizer(formatted_prompts, add_special_tokens=False)["input_ids"]
+        groups = shared_prefix_groups(token_ids, num_return_sequences)
+        baseline, shared = prefill_tokens(token_ids, groups, num_return_sequences)
+        self._metrics["last_prefill_tokens_saved"] = baseline - shared
+        print(f"{len(groups)} grupos de prefijo común. Tokens de prompt procesados: {shared} de "
+              f"{baseline} ({(baseline - shared) / max(baseline, 1):.1%} de ahorro).")
+        plan = [(prefix_length, prefix_batches(token_ids, indices, batch_size)) for prefix_length, indices in groups]
+        return token_ids, plan
+
+    def _run_shared_prefixes(self, token_ids: list, plan: list, gen_kwargs: dict):
+        """
+        Genera siguiendo un plan de `_plan_shared_prefixes`: el prefijo de cada grupo se
+        codifica una vez y su caché de claves/valores se copia para todos los prompts y
+        `num_return_sequences` del grupo, así que el modelo solo procesa el resto de cada prompt.
+
+        Devuelve, por prompt y en el orden del plan, su índice y, como el pipeline, una lista
+        de {'generated_text': ...}.
+        """
+        model = self.generator.model
+        num_return_sequences = gen_kwargs.get("num_return_sequences", 1)
+        gen_kwargs = dict(gen_kwargs, num_return_sequences=1)
+        for prefix_length, batches in plan:
+            prefix_cache = None
+            if prefix_length:
+                prefix = torch.tensor([token_ids[batches[0][0]][:prefix_length]], device=model.device)
+                with torch.no_grad():
+                    prefix_cache = model(prefix, use_cache=True).past_key_values
+            for batch in batches:
+                # prefijo + relleno + resto del prompt: el relleno va tras el prefijo en caché y
+                # se enmascara (generate calcula las posiciones a partir de attention_mask)
+                width = max(len(token_ids[i]) for i in batch)
+                rows, masks = [], []
+                for i in batch:
+                    ids = token_ids[i]
+                    n_pad = width - len(ids)
+                    rows.append(ids[:prefix_length] + [self.tokenizer.pad_token_id] * n_pad + ids[prefix_length:])
+                    masks.append([1] * prefix_length + [0] * n_pad + [1] * (len(ids) - prefix_length))
+                input_ids = torch.tensor(rows, device=model.device).repeat_interleave(num_return_sequences, dim=0)
+                attention_mask = torch.tensor(masks, device=model.device).repeat_interleave(num_return_sequences, dim=0)
+                cache = None
+                if prefix_cache is not None:
+                    # generate amplía la caché que recibe: cada lote parte de una copia
+                    cache = copy.deepcopy(prefix_cache)
+                    cache.batch_repeat_interleave(input_ids.shape[0])
+                with torch.no_grad():
+                    sequences = model.generate(input_ids, attention_mask=attention_mask,
+                                               past_key_values=cache, **gen_kwargs)
+                texts = self.tokenizer.batch_decode(sequences, skip_special_tokens=True)
+                for k, i in enumerate(batch):
+                    yield i, [{"generated_text": text}
+                              for text in texts[k * num_return_sequences:(k + 1) * num_return_sequences]]
+
+    def _residue_table(self) -> ResidueTable:
+        """Tabla de tokens de aminoácidos del tokenizer (se construye una vez)."""
+        if self._residues is None:
+            vocab_size = max(len(self.tokenizer), self.generator.model.config.vocab_size)
+            self._residues = residue_table(self.tokenizer, vocab_size)
+        return self._residues
+
+    def _prefilter_constrained(self, sequences: list, min_length: int, max_length: int,
+                               max_new_tokens: Optional[int]) -> tuple:
+        """
+        Separa, antes de generar, los prompts cuyo resultado ya se conoce: los que tienen
+        max_length aminoácidos o más darían siempre su prefijo de max_length, y los que no
+        pueden llegar a min_length ni generando max_new_tokens tokens se descartarían.
+
+        Returns:
+            tuple: (índices de los prompts que hay que generar, índices de los que ya alcanzan
+                   max_length; su variante es `sequences[i][:max_length]`).
+        """
+        longest_token = int(self._residue_table().residues_per_token.max())
+        reach = max_new_tokens * longest_token if max_new_tokens else float("inf")
+        direct = [i for i, seq in enumerate(sequences) if len(seq) >= max_length]
+        pending = [i for i, seq in enumerate(sequences) if min_length - reach <= len(seq) < max_length]
+        n_short = len(sequences) - len(direct) - len(pending)
+        if direct or n_short:
+            print(f"Sin generar: {len(direct)} prompts ya alcanzan max_length y {n_short} no pueden llegar a min_length.")
+        return pending, direct
+
+    def _run_constrained(self, sequences: list, indices: list, gen_kwargs: dict, batch_size: int,
+                         min_length: int, max_length: int):
+        """
+        Genera restringiendo el muestreo a tokens de aminoácidos (ver `AminoAcidLogitsProcessor`)
+        y deteniendo cada secuencia al alcanzar max_length aminoácidos. Como lo generado son
+        solo aminoácidos, cada variante es el prompt más el texto nuevo, sin limpieza.
+
+        Devuelve, por lote, una lista de (índice del prompt en `sequences`, variantes), con
+        None en lugar de las variantes por debajo de min_length.
+        """
+        table = self._residue_table()
+        num_return_sequences = gen_kwargs.get("num_return_sequences", 1)
+        gen_kwargs = dict(gen_kwargs, return_full_text=False)
+        # La longitud mínima se controla en aminoácidos, no en tokens
+        gen_kwargs.pop("min_length", None)
+        # Prompts de longitud parecida en el mismo lote
+        indices = sorted(indices, key=lambda i: len(sequences[i]))
+        for start in range(0, len(indices), batch_size):
+            batch_indices = indices[start:start + batch_size]
+            batch = [sequences[i] for i in batch_indices]
+            prompt_residues = torch.tensor([len(seq) for seq in batch]).repeat_interleave(num_return_sequences)
+            counter = ResidueCounter(table.residues_per_token, prompt_residues)
+            processor = AminoAcidLogitsProcessor(table.allowed, counter, min_length, self.tokenizer.eos_token_id)
+            outputs = self.generator(
+                [self._format_prompt(seq) for seq in batch],
+                batch_size=len(batch),
+                logits_processor=LogitsProcessorList([processor]),
+                stopping_criteria=StoppingCriteriaList([MaxResiduesStoppingCriteria(counter, max_length)]),
+                **gen_kwargs,
+            )
+            results = []
+            for i, seq, prompt_outputs in zip(batch_indices, batch, outputs):
+                variants = []
+                for seq_dict in prompt_outputs:
+                    # Solo quedan los espacios que añade la decodificación entre tokens
+                    variant = (seq + seq_dict["generated_text"].replace(" ", ""))[:max_length]
+                    variants.append(variant if len(variant) >= min_length else None)
+                results.append((i, variants))
+            yield results
+
+    def _check_modes(self, token_budget: Optional[int], share_prefixes: bool, constrained: bool) -> None:
+        """Comprueba que el generador está abierto y que los modos de generación son compatibles."""
+        if self.generator is None:
+            raise RuntimeError(f"El {self.name} está cerrado.")
+        if share_prefixes and not self.supports_prefix_sharing:
+            raise ValueError(f"El {self.name} no admite compartir prefijos (share_prefixes).")
+        if share_prefixes and token_budget:
+            raise ValueError("share_prefixes y token_budget no se pueden combinar.")
+        if constrained and (share_prefixes or token_budget):
+            raise ValueError("constrained no se puede combinar con share_prefixes ni con token_budget.")
+
+    def _iter_variants(self, sequences: list, gen_kwargs: dict, batch_size: int, min_length: int,
+                       max_length: int, add, stats: dict, token_budget: Optional[int] = None,
+                       share_prefixes: bool = False, constrained: bool = False,
+                       fixed_batch_size: Optional[int] = None):
+        """
+        Genera a partir de `sequences` (sin formatear) en cualquiera de los modos de `generate`
+        y pasa cada variante limpia a `add`, que devuelve True si es nueva. En `stats` se
+        acumulan las secuencias generadas ('generated'), nuevas ('accepted'), repetidas
+        ('duplicates') y por debajo de min_length ('too_short'). En modo constrained se
+        informa de la tasa de aceptación de cada lote.
+
+        Devuelve el índice en `sequences` de cada prompt terminado; con share_prefixes o
+        constrained el orden no es el de `sequences`. `fixed_batch_size` solo se usa para
+        comparar con `token_budget` la eficiencia de relleno de lotes fijos.
+        """
+        def count(variants):
+            for variant in variants:
+                stats["generated"] += 1
+                if variant is None:
+                    stats["too_short"] += 1
+                elif add(variant):
+                    stats["accepted"] += 1
+                else:
+                    stats["duplicates"] += 1
+
+        self._metrics["last_padding_efficiency"] = None
+        self._metrics["last_prefill_tokens_saved"] = 0
+        self._metrics["last_acceptance_rates"] = []
+        if not sequences:
+            return
+        num_return_sequences = gen_kwargs.get("num_return_sequences", 1)
+        max_new_tokens = gen_kwargs.get("max_new_tokens")
+        if constrained:
+            pending, direct = self._prefilter_constrained(sequences, min_length, max_length, max_new_tokens)
+            for i in direct:
+                count([sequences[i][:max_length]])
+                yield i
+            # Los que no pueden llegar a min_length terminan sin variantes
+            yield from sorted(set(range(len(sequences))).difference(pending, direct))
+            batches = self._run_constrained(sequences, pending, gen_kwargs, batch_size, min_length, max_length)
+            for n_batch, results in enumerate(batches, start=1):
+                n_generated, n_accepted = stats["generated"], stats["accepted"]
+                for i, variants in results:
+                    count(variants)
+                    yield i
+                n_sequences = stats["generated"] - n_generated
+                n_accepted = stats["accepted"] - n_accepted
+                rate = n_accepted / max(n_sequences, 1)
+                self._metrics["last_acceptance_rates"].append(rate)
+                print(f"Lote {n_batch}: {n_accepted} de {n_sequences} secuencias aceptadas ({rate:.1%}).")
+            return
+
+        if share_prefixes:
+            formatted = [self._format_prompt(seq) for seq in sequences]
+            token_ids, plan = self._plan_shared_prefixes(formatted, num_return_sequences, batch_size)
+            outputs = self._run_shared_prefixes(token_ids, plan, gen_kwargs)
+        elif token_budget:
+            formatted = [self._format_prompt(seq) for seq in sequences]
+            order, batch_sizes = self._schedule(formatted, token_budget, num_return_sequences, max_new_tokens,
+                                                fixed_batch_size)
+            outputs = zip(order, self._run_batches([formatted[i] for i in order], batch_sizes, gen_kwargs))
+        else:
+            # Con un generador como entrada, el pipeline devuelve las salidas a medida que las produce
+            outputs = enumerate(self.generator((self._format_prompt(seq) for seq in sequences),
+                                               batch_size=batch_size, **gen_kwargs))
+        # Salida del pipeline: una lista de {'generated_text': ...} por prompt (num_return_sequences)
+        for i, prompt_outputs in outputs:
+            count(self._accept(seq_dict['generated_text'], min_length, max_length) for seq_dict in prompt_outputs)
+            yield i
+
+    def _sink_order(self, sequences: list, num_return_sequences: int, batch_size: int,
+                    token_budget: Optional[int], share_prefixes: bool, constrained: bool) -> list:
+        """
+        Ordena los prompts de una ejecución nueva de `generate_to_sink` como los procesará
+        el modo elegido, para que el progreso guardado (prompts completados en orden) avance
+        de forma continua.
+        """
+        if constrained:
+            return sorted(sequences, key=len)
+        if token_budget:
+            lengths = [len(ids) for ids in self.tokenizer([self._format_prompt(seq) for seq in sequences])["input_ids"]]
+            return [sequences[i] for i in np.argsort(lengths, kind='stable')]
+        if share_prefixes:
+            formatted = [self._format_prompt(seq) for seq in sequences]
+            _, plan = self._plan_shared_prefixes(formatted, num_return_sequences, batch_size)
+            return [sequences[i] for _, batches in plan for batch in batches for i in batch]
+        return sequences
+
+    def _mutate(self, prompt_sequences: list, num_variants_per_seq: int, apply_truncation: bool,
+                truncation_prob: float, start_cut_pos: int, n_mutations: int,
+                substitution_matrix: Optional[str]) -> list:
+        return mutate_prompts(prompt_sequences, num_variants_per_seq, n_mutations=n_mutations,
+                              apply_truncation=apply_truncation, truncation_prob=truncation_prob,
+                              start_cut_pos=start_cut_pos, substitution_matrix=substitution_matrix,
+                              rng=self.rng)
+
+    def build_prompts(self, prompt_sequences: list, num_variants_per_seq: int = 5,
+                      apply_truncation: bool = True, truncation_prob: float = 0.3,
+                      start_cut_pos: int = 5, n_mutations: int = 1,
+                      substitution_matrix: Optional[str] = None) -> list:
+        """Prompts únicos ya formateados para el modelo (ver `mutate_prompts`)."""
+        mutated = self._mutate(prompt_sequences, num_variants_per_seq, apply_truncation, truncation_prob,
+                               start_cut_pos, n_mutations, substitution_matrix)
+        return [self._format_prompt(seq) for seq in mutated]
+
+    def generate(
+        self,
+        prompt_sequences: list,
+        num_variants_per_seq: int = 5,
+        num_return_sequences: int = 5,
+        min_length: int = 25,
+        max_length: int = 50,
+        temperature: float = 1.0,
+        top_k: int = 3,
+        top_p: float = 0.95,
+        max_new_tokens: int = 10,
+        repetition_penalty: float = 1.0,
+        batch_size: int = 32,
+        apply_truncation: bool = True,
+        truncation_prob: float = 0.3,
+        start_cut_pos: int = 5,
+        n_mutations: int = 1,
+        substitution_matrix: Optional[str] = None,
+        token_budget: Optional[int] = None,
+        share_prefixes: bool = False,
+        constrained: bool = False,
+    ) -> list:
+        """
+        Genera variantes a partir de las secuencias base con el pipeline ya cargado.
+        Mismos parámetros y resultado que `generate_with_protgpt2_pipeline` /
+        `generate_with_protxlnet_pipeline`. `n_mutations` y `substitution_matrix`
+        (p. ej. 'BLOSUM62') controlan las mutaciones de los prompts.
+
+        Con `token_budget`, los prompts se ordenan por longitud tokenizada y cada lote
+        se dimensiona para no superar ese número de tokens (prompts x num_return_sequences
+        x (longitud + max_new_tokens)) en lugar de usar `batch_size` prompts fijos.
+
+        Con `share_prefixes`, los prompts que comparten prefijo (mutantes y truncamientos de
+        una misma semilla) reutilizan la caché de claves/valores del prefijo, que se codifica
+        una sola vez (ver `_run_shared_prefixes`). Pensado para CPU, donde domina el coste de
+        procesar los prompts. No se combina con `token_budget`.
+
+        Con `constrained`, el muestreo se limita a tokens de aminoácidos, el fin de secuencia
+        no se permite antes de min_length aminoácidos y cada secuencia se detiene al llegar a
+        max_length (ver `constrained_generation`), así que no se gasta cómputo en salidas que
+        se descartarían. Informa de la tasa de aceptación (variantes nuevas / generadas) de
+        cada lote. No se combina con `token_budget` ni con `share_prefixes`.
+
+        Returns:
+            list: Variantes únicas limpias, con longitud entre min_length y max_length.
+        """
+        self._check_modes(token_budget, share_prefixes, constrained)
+        with self._lock:
+            start = time.perf_counter()
+            unique_variants = set()
+
+            print("Preparando las secuencias iniciales...")
+            sequences = self._mutate(prompt_sequences, num_variants_per_seq, apply_truncation,
+                                     truncation_prob, start_cut_pos, n_mutations, substitution_matrix)
+            print(f"Generando {len(sequences)} variantes (el pipeline manejará los lotes)...")
+
+            def add(variant: str) -> bool:
+                if variant in unique_variants:
+                    return False
+                unique_variants.add(variant)
+                return True
+
+            gen_kwargs = self._gen_kwargs(num_return_sequences, min_length, max_length, temperature,
+                                          top_k, top_p, max_new_tokens, repetition_penalty)
+            stats = {"generated": 0, "accepted": 0, "duplicates": 0, "too_short": 0}
+            prompts = self._iter_variants(sequences, gen_kwargs, batch_size, min_length, max_length, add, stats,
+                                          token_budget, share_prefixes, constrained, fixed_batch_size=batch_size)
+            print("Procesando salidas...")
+            for _ in tqdm(prompts, total=len(sequences), desc="Procesando"):
+                pass
+
+            if self.device.type == 'cuda':
+                torch.cuda.empty_cache()
+
+            elapsed = time.perf_counter() - start
+            self._metrics["n_requests"] += 1
+            self._metrics["generate_seconds"] += elapsed
+            self._metrics["last_generate_seconds"] = elapsed
+            self._metrics["last_n_prompts"] = len(sequences)
+            self._metrics["last_n_variants"] = len(unique_variants)
+            self._metrics["last_sequences_per_second"] = stats["generated"] / max(elapsed, 1e-9)
+
+        print(f"\nGeneración completada en {elapsed:.1f} s (carga del modelo: "
+              f"{self._metrics['load_seconds']:.1f} s, una sola vez). "
+              f"Se obtuvieron {len(unique_variants)} variantes únicas.")
+        return list(unique_variants)
+
+    def generate_to_sink(
+        self,
+        prompt_sequences: list,
+        sink_path: Union[str, Path],
+        resume: bool = True,
+        flush_every: int = 256,
+        num_variants_per_seq: int = 5,
+        num_return_sequences: int = 5,
+        min_length: int = 25,
+        max_length: int = 50,
+        temperature: float = 1.0,
+        top_k: int = 3,
+        top_p: float = 0.95,
+        max_new_tokens: int = 10,
+        repetition_penalty: float = 1.0,
+        batch_size: int = 32,
+        apply_truncation: bool = True,
+        truncation_prob: float = 0.3,
+        start_cut_pos: int = 5,
+        n_mutations: int = 1,
+        substitution_matrix: Optional[str] = None,
+        token_budget: Optional[int] = None,
+        share_prefixes: bool = False,
+        constrained: bool = False,
+    ) -> dict:
+        """
+        Modo streaming de `generate`: las salidas del pipeline se procesan a medida que
+        se producen y las variantes aceptadas (limpias, con longitud válida y no vistas
+        antes) se escriben en `sink_path` en lugar de acumularse en memoria.
+
+        La deduplicación usa `VariantDeduplicator` (8 bytes por variante). Cada
+        `flush_every` prompts se vacía el sink y se guarda el progreso en
+        `<sink_path>.progress.json`; los prompts mutados se guardan en
+        `<sink_path>.prompts.txt`. Con resume=True, una ejecución interrumpida continúa
+        con los mismos prompts desde el último punto guardado, sin repetir variantes.
+        Admite los modos `token_budget`, `share_prefixes` y `constrained` de `generate`: los
+        prompts se guardan en el orden en que el modo los procesa y el progreso solo avanza
+        hasta el primer prompt sin terminar. Al reanudar, los prompts ya procesados fuera de
+        ese orden se generan de nuevo (sin escribir variantes repetidas). Con `constrained`,
+        como en `generate`, se informa de la tasa de aceptación de cada lote (variantes nuevas
+        para el sink / generadas), que queda también en `metrics()['last_acceptance_rates']`.
+
+        Args:
+            prompt_sequences (list): Secuencias base (se ignoran al reanudar).
+            sink_path (str | Path): FASTA (.fasta, .fa, ...) o directorio Parquet (ver `VariantSink`).
+            resume (bool): Continúa una ejecución anterior sobre el mismo sink. Defaults to True.
+            flush_every (int): Prompts entre escrituras a disco. Defaults to 256.
+            Resto: mismos parámetros que `generate`.
+
+        Returns:
+            dict: Prompts procesados, secuencias generadas, aceptadas, duplicadas, demasiado
+                  cortas, segundos y ruta del sink.
+        """
+        self._check_modes(token_budget, share_prefixes, constrained)
+        sink = VariantSink(sink_path)
+        progress_file = Path(f"{sink.path}.progress.json")
+        prompts_file = Path(f"{sink.path}.prompts.txt")
+        dedup = VariantDeduplicator()
+
+        with self._lock:
+            start = time.perf_counter()
+            completed = 0
+            if resume and progress_file.exists() and prompts_file.exists():
+                with open(progress_file, "r") as handle:
+                    completed = json.load(handle)["completed"]
+                sequences = [line for line in prompts_file.read_text().split("\n") if line]
+                dedup.update(sink.read_existing())
+                sink.n_written = len(dedup)
+                print(f"Reanudando: {completed} de {len(sequences)} prompts ya procesados, "
+                      f"{len(dedup)} variantes en el sink.")
+            else:
+                sink.clear()
+                print("Preparando las secuencias iniciales...")
+                sequences = self._mutate(prompt_sequences, num_variants_per_seq, apply_truncation,
+                                         truncation_prob, start_cut_pos, n_mutations, substitution_matrix)
+                if sequences:
+                    sequences = self._sink_order(sequences, num_return_sequences, batch_size,
+                                                 token_budget, share_prefixes, constrained)
+                tmp_file = prompts_file.with_name(f".{prompts_file.name}.tmp")
+                tmp_file.write_text("\n".join(sequences))
+                os.replace(tmp_file, prompts_file)
+
+            def save_progress(n_completed: int) -> None:
+                tmp_file = progress_file.with_name(f".{progress_file.name}.tmp")
+                tmp_file.write_text(json.dumps({"completed": n_completed, "n_prompts": len(sequences)}))
+                os.replace(tmp_file, progress_file)
+
+            stats = {"prompts": 0, "generated": 0, "accepted": 0, "duplicates": 0, "too_short": 0}
+            remaining = sequences[completed:]
+            gen_kwargs = self._gen_kwargs(num_return_sequences, min_length, max_length, temperature,
+                                          top_k, top_p, max_new_tokens, repetition_penalty)
+
+            def add(variant: str) -> bool:
+                if not dedup.add(variant):
+                    return False
+                sink.add(variant)
+                return True
+
+            prompts = self._iter_variants(remaining, gen_kwargs, batch_size, min_length, max_length, add, stats,
+                                          token_budget, share_prefixes, constrained)
+            # Prompts terminados; el progreso guardado es el primero sin terminar
+            done = np.zeros(len(remaining), dtype=bool)
+            frontier = 0
+            with tqdm(total=len(remaining), desc="Generando") as progress:
+                for k, i in enumerate(prompts, start=1):
+                    done[i] = True
+                    while frontier < len(remaining) and done[frontier]:
+                        frontier += 1
+                    if k % flush_every == 0 or k == len(remaining):
+                        sink.flush()
+                        save_progress(completed + frontier)
+                    stats["prompts"] = k
+                    progress.update(1)
+                    progress.set_postfix(aceptadas=stats["accepted"], duplicadas=stats["duplicates"])
+            save_progress(len(sequences))
+
+            if self.device.type == 'cuda':
+                torch.cuda.empty_cache()
+            elapsed = time.perf_counter() - start
+            self._metrics["n_requests"] += 1
+            self._metrics["generate_seconds"] += elapsed
+            self._metrics["last_generate_seconds"] = elapsed
+            self._metrics["last_n_prompts"] = len(remaining)
+            self._metrics["last_n_variants"] = stats["accepted"]
+            self._metrics["last_sequences_per_second"] = stats["generated"] / max(elapsed, 1e-9)
+
+        stats.update(seconds=elapsed, sink=str(sink.path))
+        print(f"\nGeneración completada en {elapsed:.1f} s. {stats['accepted']} variantes nuevas "
+              f"({sink.n_written} en total) escritas en {sink.path}.")
+        return stats
+
+    def metrics(self) -> dict:
+        """Tiempo de carga frente a tiempo de generación (total y de la última petición)."""
+        return dict(self._metrics)
+
+    def close(self) -> None:
+        """Libera el pipeline, el tokenizer y la memoria de la GPU."""
+        self.generator = None
+        self.tokenizer = None
+        self.accelerator = None
+        if self.device.type == 'cuda':
+            torch.cuda.empty_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,232 @@
+# identity_engine.py
+
+# --- Motor vectorizado para calcular identidad de secuencias todas-contra-todas ---
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+GAP_CHARS = "-."
+NORMALIZATION_MODES = ("first", "shorter", "longer")
+
+
+class EncodedSequences(NamedTuple):
+    """
+    Integer-encoded sequence library.
+
+    Attributes:
+        codes (np.ndarray): Unsigned integer matrix (N x L_max), uint8 unless the library has
+                            more than 255 distinct symbols. 0 is padding; 1..n_symbols are residues.
+        lengths (np.ndarray): int64 vector with the length used to normalize each sequence.
+        n_symbols (int): Number of distinct residue symbols present in the library.
+    """
+    codes: np.ndarray
+    lengths: np.ndarray
+    n_symbols: int
+
+
+def encode_sequences(sequences: Sequence[str], ignore_gaps: bool = False,
+                     gap_chars: str = GAP_CHARS) -> EncodedSequences:
+    """
+    Encodes a list of sequences once into a padded integer matrix.
+
+    Every distinct character (any Unicode code point) is mapped to its own code, so two
+    positions match exactly when the original characters are equal (case sensitive, like `==`).
+
+    Args:
+        sequences (Sequence[str]): Sequences to encode. They may have different lengths.
+        ignore_gaps (bool): If True, gap characters never count as a match and are
+                            excluded from the sequence lengths. Defaults to False.
+        gap_chars (str): Characters treated as gaps when `ignore_gaps` is True.
+
+    Returns:
+        EncodedSequences: The encoded matrix, the per-sequence lengths and the alphabet size.
+    """
+    sequences = ["" if s is None else str(s) for s in sequences]
+    n_sequences = len(sequences)
+    raw_lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=n_sequences)
+    max_len = int(raw_lengths.max()) if n_sequences else 0
+
+    # UTF-32 da un entero por carácter, así que dos caracteres distintos nunca comparten código
+    buffer = np.frombuffer("".join(sequences).encode("utf-32-le"), dtype=np.uint32)
+
+    # Tabla de búsqueda: punto de código presente -> código compacto (0 = relleno)
+    present, inverse = np.unique(buffer, return_inverse=True)
+    symbols = np.ones(present.size, dtype=bool)
+    if ignore_gaps:
+        gap_codes = np.frombuffer(gap_chars.encode("utf-32-le"), dtype=np.uint32)
+        symbols = ~np.isin(present, gap_codes)
+    n_symbols = int(np.count_nonzero(symbols))
+    lut = np.zeros(present.size, dtype=np.min_scalar_type(n_symbols))
+    lut[symbols] = np.arange(1, n_symbols + 1)
+
+    codes = np.zeros((n_sequences, max_len), dtype=lut.dtype)
+    if buffer.size:
+        offsets = np.cumsum(raw_lengths) - raw_lengths
+        rows = np.repeat(np.arange(n_sequences), raw_lengths)
+        cols = np.arange(buffer.size) - np.repeat(offsets, raw_lengths)
+        codes[rows, cols] = lut[inverse]
+
+    lengths = np.count_nonzero(codes, axis=1).astype(np.int64) if ignore_gaps else raw_lengths
+    return EncodedSequences(codes=codes, lengths=lengths, n_symbols=n_symbols)
+
+
+def _one_hot(codes: np.ndarray, n_symbols: int) -> np.ndarray:
+    """Expands a block of codes into a flattened (rows x L*n_symbols) float32 one-hot matrix."""
+    n_rows, max_len = codes.shape
+    one_hot = np.zeros((n_rows, max_len, n_symbols + 1), dtype=np.float32)
+    np.put_along_axis(one_hot, codes[..., None].astype(np.intp), 1.0, axis=2)
+    # La columna 0 corresponde al relleno (y a los huecos ignorados): nunca cuenta como coincidencia
+    return one_hot[..., 1:].reshape(n_rows, max_len * n_symbols)
+
+
+def _denominator(row_idx: np.ndarray, col_idx: np.ndarray, lengths: np.ndarray,
+                 normalize: str) -> np.ndarray:
+    row_len = lengths[row_idx][:, None]
+    col_len = lengths[col_idx][None, :]
+    if normalize == "first":
+        # Comportamiento original: se divide por la longitud de la secuencia con menor índice
+        return np.where(row_idx[:, None] <= col_idx[None, :], row_len, col_len)
+    if normalize == "shorter":
+        return np.minimum(row_len, col_len)
+    return np.maximum(row_len, col_len)
+
+
+def identity_block(encoded: EncodedSequences, rows: slice, cols: slice,
+                   normalize: str = "first", row_one_hot: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Computes the float64 identity block for encoded[rows] x encoded[cols].
+
+    Args:
+        encoded (EncodedSequences): Output of `encode_sequences`.
+        rows (slice): Row range of the block.
+        cols (slice): Column range of the block.
+        normalize (str): 'first' (length of the lower-index sequence, the original
+                         behaviour), 'shorter' or 'longer'. Defaults to 'first'.
+        row_one_hot (np.ndarray, optional): Precomputed one-hot matrix for `rows`.
+
+    Returns:
+        np.ndarray: Identity values in [0, 1]; pairs whose denominator is 0 are set to 0.
+    """
+    if normalize not in NORMALIZATION_MODES:
+        raise ValueError(f"normalize must be one of {NORMALIZATION_MODES}, got '{normalize}'.")
+
+    if row_one_hot is None:
+        row_one_hot = _one_hot(encoded.codes[rows], encoded.n_symbols)
+    col_one_hot = _one_hot(encoded.codes[cols], encoded.n_symbols)
+    matches = (row_one_hot @ col_one_hot.T).astype(np.float64)  # conteos enteros exactos
+
+    row_idx = np.arange(encoded.codes.shape[0])[rows]
+    col_idx = np.arange(encoded.codes.shape[0])[cols]
+    denominator = _denominator(row_idx, col_idx, encoded.lengths, normalize).astype(np.float64)
+
+    identity = np.zeros_like(matches)
+    np.divide(matches, denominator, out=identity, where=denominator > 0)
+    return identity
+
+
+def block_ranges(n_sequences: int, block_size: int) -> List[slice]:
+    """Splits [0, n_sequences) into consecutive slices of at most `block_size` rows."""
+    if block_size < 1:
+        raise ValueError("block_size must be a positive integer.")
+    return [slice(start, min(start + block_size, n_sequences))
+            for start in range(0, n_sequences, block_size)]
+
+
+def iter_identity_blocks(encoded: EncodedSequences, block_size: int = 1024,
+                         normalize: str = "first",
+                         upper_only: bool = True) -> Iterator[Tuple[slice, slice, np.ndarray]]:
+    """
+    Yields identity tiles one at a time, so memory stays bounded by `block_size`.
+
+    Args:
+        encoded (EncodedSequences): Output of `encode_sequences`.
+        block_size (int): Number of sequences per tile side. Defaults to 1024.
+        normalize (str): See `identity_block`.
+        upper_only (bool): If True, only tiles on or above the diagonal are produced
+                           (the matrix is symmetric). Defaults to True.
+
+    Yields:
+        Tuple[slice, slice, np.ndarray]: (rows, cols, float64 identity tile).
+    """
+    ranges = block_ranges(encoded.codes.shape[0], block_size)
+    for bi, rows in enumerate(ranges):
+        row_one_hot = _one_hot(encoded.codes[rows], encoded.n_symbols)
+        for cols in ranges[bi if upper_only else 0:]:
+            yield rows, cols, identity_block(encoded, rows, cols, normalize, row_one_hot)
+
+
+def _condensed_offsets(row_idx: np.ndarray, n_sequences: int) -> np.ndarray:
+    # Posición en el vector condensado (estilo scipy.spatial.distance.squareform) del par (i, i+1)
+    return row_idx * n_sequences - row_idx * (row_idx + 1) // 2
+
+
+def compute_identity_matrix(sequences: Sequence[str],
+                            block_size: int = 1024,
+                            n_jobs: int = 1,
+                            dtype=np.float64,
+                            condensed: bool = False,
+                            normalize: str = "first",
+                            ignore_gaps: bool = False,
+                            gap_chars: str = GAP_CHARS) -> np.ndarray:
+    """
+    Computes the all-vs-all identity matrix with a blocked one-hot matrix product.
+
+    Sequences are encoded once into a uint8 matrix; each tile of identities is the
+    product of two one-hot blocks, so the work runs in BLAS instead of Python loops.
+    With the defaults, the result is identical to the original pairwise loop.
+
+    Args:
+        sequences (Sequence[str]): Sequences to compare (unequal lengths are allowed;
+                                   positions beyond the shorter sequence never match).
+        block_size (int): Number of sequences per tile side. Bounds the temporary
+                          memory to roughly block_size * L_max * n_symbols * 4 bytes.
+        n_jobs (int): Number of threads computing tiles concurrently. Defaults to 1.
+        dtype: Output dtype, e.g. np.float64 (default), np.float32 or np.float16.
+        condensed (bool): If True, returns only the strict upper triangle as a 1-D vector
+                          of length N*(N-1)/2, in the order used by scipy's `squareform`.
+        normalize (str): 'first' (original behaviour), 'shorter' or 'longer'.
+        ignore_gaps (bool): If True, gaps never match and are excluded from lengths.
+        gap_chars (str): Characters treated as gaps. Defaults to '-.'.
+
+    Returns:
+        np.ndarray: N x N symmetric identity matrix, or its condensed upper triangle.
+    """
+    if normalize not in NORMALIZATION_MODES:
+        raise ValueError(f"normalize must be one of {NORMALIZATION_MODES}, got '{normalize}'.")
+
+    encoded = encode_sequences(sequences, ignore_gaps=ignore_gaps, gap_chars=gap_chars)
+    n_sequences = encoded.codes.shape[0]
+
+    if condensed:
+        result = np.zeros(n_sequences * (n_sequences - 1) // 2, dtype=dtype)
+    else:
+        result = np.zeros((n_sequences, n_sequences), dtype=dtype)
+
+    ranges = block_ranges(n_sequences, block_size) if n_sequences else []
+
+    def _fill_row_band(bi: int) -> None:
+        rows = ranges[bi]
+        row_idx = np.arange(rows.start, rows.stop)
+        row_one_hot = _one_hot(encoded.codes[rows], encoded.n_symbols)
+        for cols in ranges[bi:]:
+            tile = identity_block(encoded, rows, cols, normalize, row_one_hot)
+            if condensed:
+                col_idx = np.arange(cols.start, cols.stop)
+                mask = col_idx[None, :] > row_idx[:, None]
+                positions = (_condensed_offsets(row_idx, n_sequences)[:, None]
+                             + col_idx[None, :] - row_idx[:, None] - 1)
+                result[positions[mask]] = tile[mask]
+            else:
+                result[rows, cols] = tile
+                if cols.start != rows.start:
+                    result[cols, rows] = tile.T
+
+    if n_jobs is not None and n_jobs > 1 and len(ranges) > 1:
+        # Cada banda escribe regiones disjuntas; numpy libera el GIL durante el producto matricial
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(_fill_row_band, range(len(ranges))))
+    else:
+        for bi in range(len(ranges)):
+            _fill_row_band(bi)
+
+    return result
@@ -0,0 +1,292 @@
+# identity_store.py
+
+# --- Almacenamiento en disco (memory-mapped) de matrices de identidad grandes ---
+import hashlib
+import json
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence, Tuple, Union
+
+from .identity_engine import block_ranges, encode_sequences, identity_block
+
+MATRIX_FILE = "matrix.npy"
+PROGRESS_FILE = "progress.npy"
+META_FILE = "meta.json"
+
+
+def _fingerprint(sequences: Sequence[str], normalize: str, ignore_gaps: bool) -> str:
+    """Hash that identifies the library and options a stored matrix was computed from."""
+    digest = hashlib.sha1()
+    digest.update(f"{normalize}|{ignore_gaps}|{len(sequences)}\n".encode())
+    for seq in sequences:
+        digest.update(str(seq).encode("utf-8", errors="surrogatepass"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _bin_edges(n: int, max_size: int) -> np.ndarray:
+    n_bins = max(1, min(n, max_size))
+    return np.linspace(0, n, n_bins + 1).astype(np.int64)
+
+
+def downsample_matrix(matrix, max_size: int = 2000, order: Optional[np.ndarray] = None,
+                      rows_per_read: int = 256) -> np.ndarray:
+    """
+    Reduces a (possibly memory-mapped) N x N matrix to at most max_size x max_size
+    by averaging contiguous bins, reading only `rows_per_read` rows at a time.
+
+    Args:
+        matrix: 2-D array-like (np.ndarray, np.memmap) supporting row slicing.
+        max_size (int): Maximum side of the output. Defaults to 2000.
+        order (np.ndarray, optional): Permutation applied to rows and columns before binning
+                                      (e.g. a cluster ordering).
+        rows_per_read (int): Rows loaded per read. Defaults to 256.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (min(N, max_size), min(N, max_size)).
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    edges = _bin_edges(n, max_size)
+    n_bins = edges.size - 1
+    row_bin = np.repeat(np.arange(n_bins), np.diff(edges))
+    counts = np.diff(edges).astype(np.float64)
+
+    sums = np.zeros((n_bins, n_bins), dtype=np.float64)
+    for start in range(0, n, rows_per_read):
+        stop = min(start + rows_per_read, n)
+        if order is None:
+            band = np.asarray(matrix[start:stop], dtype=np.float64)
+        else:
+            band_rows = order[start:stop]
+            sort_idx = np.argsort(band_rows)
+            band = np.empty((stop - start, n), dtype=np.float64)
+            band[sort_idx] = matrix[band_rows[sort_idx]]
+            band = band[:, order]
+        # Suma por bins de columnas y después por bins de filas
+        col_sums = np.add.reduceat(band, edges[:-1], axis=1)
+        np.add.at(sums, row_bin[start:stop], col_sums)
+
+    return (sums / np.outer(counts, counts)).astype(np.float32)
+
+
+class IdentityMatrixStore:
+    """
+    On-disk N x N identity matrix stored as a memory-mapped .npy file.
+
+    The directory layout is:
+        matrix.npy    -> the full symmetric matrix (float16 by default)
+        progress.npy  -> one flag per (row block, column block) tile already written
+        meta.json     -> size, block size, dtype and a fingerprint of the sequences
+
+    Tiles are written band by band and flushed before being marked as done, so an
+    interrupted `build` can be resumed and only recomputes the missing tiles.
+    """
+
+    def __init__(self, path: Union[str, Path], mode: str = "r"):
+        """
+        Opens an existing store.
+
+        Args:
+            path (str | Path): Directory of the store.
+            mode (str): 'r' for read-only access, 'r+' to continue writing. Defaults to 'r'.
+        """
+        self.path = Path(path)
+        meta_file = self.path / META_FILE
+        if not meta_file.exists():
+            raise FileNotFoundError(f"No identity matrix store found at '{self.path}'.")
+        with open(meta_file, "r") as handle:
+            self.meta = json.load(handle)
+        self.matrix = np.load(self.path / MATRIX_FILE, mmap_mode=mode)
+        self.progress = np.load(self.path / PROGRESS_FILE, mmap_mode=mode)
+
+    # --- Construcción ---
+
+    @classmethod
+    def create(cls, path: Union[str, Path], n_sequences: int, block_size: int = 1024,
+               dtype=np.float16, fingerprint: str = "", normalize: str = "first",
+               ignore_gaps: bool = False) -> "IdentityMatrixStore":
+        """Allocates an empty store on disk and opens it for writing."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        n_blocks = len(block_ranges(n_sequences, block_size)) if n_sequences else 0
+
+        matrix = np.lib.format.open_memmap(path / MATRIX_FILE, mode="w+", dtype=np.dtype(dtype),
+                                           shape=(n_sequences, n_sequences))
+        del matrix
+        progress = np.lib.format.open_memmap(path / PROGRESS_FILE, mode="w+", dtype=np.uint8,
+                                             shape=(n_blocks, n_blocks))
+        del progress
+
+        meta = {
+            "n_sequences": int(n_sequences),
+            "block_size": int(block_size),
+            "dtype": np.dtype(dtype).name,
+            "fingerprint": fingerprint,
+            "normalize": normalize,
+            "ignore_gaps": bool(ignore_gaps),
+        }
+        with open(path / META_FILE, "w") as handle:
+            json.dump(meta, handle, indent=2)
+        return cls(path, mode="r+")
+
+    @classmethod
+    def build(cls, path: Union[str, Path], sequences: Sequence[str], block_size: int = 1024,
+              dtype=np.float16, n_jobs: int = 1, normalize: str = "first",
+              ignore_gaps: bool = False, resume: bool = True,
+              verbose: bool = True) -> "IdentityMatrixStore":
+        """
+        Computes the identity matrix of `sequences` tile by tile directly into a store.
+
+        Args:
+            path (str | Path): Directory of the store.
+            sequences (Sequence[str]): Sequences to compare.
+            block_size (int): Tile side in sequences. Defaults to 1024.
+            dtype: On-disk dtype. Defaults to np.float16 (2 bytes per pair).
+            n_jobs (int): Threads computing the tiles of a band. Defaults to 1.
+            normalize (str): See `identity_engine.identity_block`.
+            ignore_gaps (bool): See `identity_engine.encode_sequences`.
+            resume (bool): If True and a compatible store exists, only missing tiles are
+                           computed. If False, any existing store is overwritten.
+            verbose (bool): If True, prints progress.
+
+        Returns:
+            IdentityMatrixStore: The completed store, opened read-only.
+        """
+        path = Path(path)
+        fingerprint = _fingerprint(sequences, normalize, ignore_gaps)
+
+        store = None
+        if resume and (path / META_FILE).exists():
+            store = cls(path, mode="r+")
+            if (store.meta["fingerprint"] != fingerprint
+                    or store.meta["block_size"] != block_size
+                    or store.meta["dtype"] != np.dtype(dtype).name):
+                raise ValueError(
+                    f"The store at '{path}' was built from different sequences or options. "
+                    "Use resume=False to overwrite it."
+                )
+            if verbose:
+                print(f"Resuming identity matrix store: {store.tiles_done}/{store.tiles_total} tiles done.")
+        if store is None:
+            store = cls.create(path, len(sequences), block_size, dtype, fingerprint,
+                               normalize, ignore_gaps)
+
+        encoded = encode_sequences(sequences, ignore_gaps=ignore_gaps)
+        ranges = block_ranges(len(sequences), block_size) if len(sequences) else []
+
+        def _write_tile(bi: int, bj: int) -> None:
+            rows, cols = ranges[bi], ranges[bj]
+            tile = identity_block(encoded, rows, cols, normalize).astype(store.matrix.dtype)
+            store.matrix[rows, cols] = tile
+            if bi != bj:
+                store.matrix[cols, rows] = tile.T
+
+        for bi in range(len(ranges)):
+            pending = [bj for bj in range(bi, len(ranges)) if not store.progress[bi, bj]]
+            if not pending:
+                continue
+            if n_jobs is not None and n_jobs > 1:
+                with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                    list(executor.map(lambda bj: _write_tile(bi, bj), pending))
+            else:
+                for bj in pending:
+                    _write_tile(bi, bj)
+            # Primero se persisten los datos, después se marcan las teselas como completadas
+            store.matrix.flush()
+            store.progress[bi, pending] = 1
+            store.progress.flush()
+            if verbose:
+                print(f"  - Band {bi + 1}/{len(ranges)} written.")
+
+        path = store.path
+        del store
+        return cls(path, mode="r")
+
+    # --- Estado ---
+
+    @property
+    def n_sequences(self) -> int:
+        return self.meta["n_sequences"]
+
+    @property
+    def tiles_total(self) -> int:
+        n_blocks = self.progress.shape[0]
+        return n_blocks * (n_blocks + 1) // 2
+
+    @property
+    def tiles_done(self) -> int:
+        return int(np.triu(np.asarray(self.progress)).sum())
+
+    @property
+    def is_complete(self) -> bool:
+        return self.tiles_done == self.tiles_total
+
+    # --- Lectura ---
+
+    def row(self, i: int, distance: bool = False) -> np.ndarray:
+        """Returns row i (identity, or 1 - identity if `distance`) as float32."""
+        values = np.asarray(self.matrix[i], dtype=np.float32)
+        return 1.0 - values if distance else values
+
+    def rows(self, indices: Sequence[int], distance: bool = False) -> np.ndarray:
+        """Returns the requested rows (identity or distance) as a float32 array."""
+        indices = np.asarray(indices, dtype=np.int64)
+        sort_idx = np.argsort(indices)
+        values = np.empty((indices.size, self.n_sequences), dtype=np.float32)
+        values[sort_idx] = self.matrix[indices[sort_idx]]
+        return 1.0 - values if distance else values
+
+    def tile(self, rows: slice, cols: slice, distance: bool = False) -> np.ndarray:
+        """Returns matrix[rows, cols] (identity or distance) as float32."""
+        values = np.asarray(self.matrix[rows, cols], dtype=np.float32)
+        return 1.0 - values if distance else values
+
+    # --- Vistas para graficar ---
+
+    def downsample(self, max_size: int = 2000, order: Optional[np.ndarray] = None) -> np.ndarray:
+        """Bin-averaged view of at most max_size x max_size, see `downsample_matrix`."""
+        return downsample_matrix(self.matrix, max_size=max_size, order=order)
+
+    def cluster_order(self, n_pivots: int = 32, seed: int = 0) -> np.ndarray:
+        """
+        Orders sequences so that similar ones are contiguous, using bounded memory.
+
+        Pivots are chosen by farthest-point sampling (only n_pivots rows are read);
+        every sequence is assigned to its most similar pivot and sorted by
+        (pivot, decreasing identity to the pivot).
+
+        Args:
+            n_pivots (int): Number of pivot sequences. Defaults to 32.
+            seed (int): Seed for choosing the first pivot. Defaults to 0.
+
+        Returns:
+            np.ndarray: Permutation of range(N).
+        """
+        n = self.n_sequences
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        n_pivots = max(1, min(n_pivots, n))
+        rng = np.random.default_rng(seed)
+
+        pivot_rows = np.empty((n_pivots, n), dtype=np.float32)
+        pivot = int(rng.integers(n))
+        closest = np.full(n, -np.inf, dtype=np.float32)
+        for k in range(n_pivots):
+            pivot_rows[k] = self.row(pivot)
+            closest = np.maximum(closest, pivot_rows[k])
+            pivot = int(np.argmin(closest))
+
+        assignment = np.argmax(pivot_rows, axis=0)
+        similarity = pivot_rows[assignment, np.arange(n)]
+        return np.lexsort((-similarity, assignment))
+
+    def cluster_ordered_view(self, max_size: int = 2000, n_pivots: int = 32,
+                             seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (view, order): a bin-averaged view after reordering by `cluster_order`.
+        """
+        order = self.cluster_order(n_pivots=n_pivots, seed=seed)
+        return self.downsample(max_size=max_size, order=order), order
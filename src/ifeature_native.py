@@ -0,0 +1,548 @@
+# ifeature_native.py
+
+# --- Descriptores de iFeatureOmega calculados con NumPy (mismos nombres y valores) ---
+from iFeatureOmega import iFeatureOmegaCLI
+import inspect
+import json
+import math
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+AA_ORDER = "ACDEFGHIKLMNPQRSTVWY"
+
+NATIVE_DESCRIPTORS = (
+    "AAC",
+    "DPC type 1",
+    "DPC type 2",
+    "CKSAAGP type 1",
+    "CKSAAGP type 2",
+    "GAAC",
+    "CTriad",
+    "Moran",
+    "NMBroto",
+    "SOCNumber",
+    "QSOrder",
+    "PAAC",
+    "APAAC",
+)
+
+# Parámetros por defecto de iProtein para estos descriptores
+_DEFAULT_AAINDEX = "ANDN920101;ARGP820101;ARGP820102;ARGP820103;BEGF750101;BEGF750102;BEGF750103;BHAR880101"
+_DEFAULT_PARAMETERS = {"kspace": 3, "nlag": 3, "weight": 0.05, "lambdaValue": 3, "aaindex": _DEFAULT_AAINDEX}
+_DEFAULT_PARAMETERS_DICT = {
+    "CKSAAGP type 1": {"kspace": 3},
+    "CKSAAGP type 2": {"kspace": 3},
+    "NMBroto": {"aaindex": _DEFAULT_AAINDEX, "nlag": 3},
+    "Moran": {"aaindex": _DEFAULT_AAINDEX, "nlag": 3},
+    "SOCNumber": {"nlag": 3},
+    "QSOrder": {"nlag": 3, "weight": 0.05},
+    "PAAC": {"weight": 0.05, "lambdaValue": 3},
+    "APAAC": {"weight": 0.05, "lambdaValue": 3},
+}
+
+# Orden de aminoácidos de las tablas de iFeature (AAidx.txt, Grantham.txt)
+_AA_ORDER_TABLES = "ARNDCQEGHILKMFPSTWYV"
+
+# Códigos de residuo: 0..19 = AA_ORDER, 20 = U, 21 = '-' o carácter no permitido, 22 = relleno
+_U_CODE = 20
+_GAP_CODE = 21
+_PAD_CODE = 22
+
+_GAAC_GROUPS = {
+    "alphatic": "GAVLMI",
+    "aromatic": "FYW",
+    "postivecharge": "KRH",
+    "negativecharge": "DE",
+    "uncharge": "STCPNQ",
+}
+_CKSAAGP_GROUPS = {
+    "alphaticr": "GAVLMI",
+    "aromatic": "FYW",
+    "postivecharger": "KRH",
+    "negativecharger": "DE",
+    "uncharger": "STCPNQ",
+}
+_CTRIAD_GROUPS = {
+    "g1": "AGV",
+    "g2": "ILFP",
+    "g3": "YMTS",
+    "g4": "HNQW",
+    "g5": "RK",
+    "g6": "DE",
+    "g7": "C",
+}
+
+
+def _residue_table() -> np.ndarray:
+    table = np.full(256, _GAP_CODE, dtype=np.int8)
+    for code, aa in enumerate(AA_ORDER):
+        table[ord(aa)] = code
+    table[ord("U")] = _U_CODE
+    return table
+
+
+_RESIDUE_TABLE = _residue_table()
+
+
+def _symbol_map(groups: Optional[Dict[str, str]] = None) -> np.ndarray:
+    """Tabla código de residuo -> índice de símbolo (grupo o aminoácido); -1 si no cuenta."""
+    mapping = np.full(_PAD_CODE + 1, -1, dtype=np.int64)
+    if groups is None:
+        mapping[:len(AA_ORDER)] = np.arange(len(AA_ORDER))
+    else:
+        for k, members in enumerate(groups.values()):
+            for aa in members:
+                mapping[AA_ORDER.index(aa)] = k
+    return mapping
+
+
+class EncodedPeptides(NamedTuple):
+    """
+    Secuencias preprocesadas igual que iProtein y codificadas como enteros.
+
+    Atributos
+    ---------
+    codes : np.ndarray
+        Matriz int8 (N x L_max) de códigos de residuo; las posiciones sobrantes valen 22.
+    lengths : np.ndarray
+        Longitud de cada secuencia después de quitar los huecos.
+    min_length_without_minus : int
+        Longitud mínima que iProtein usa para validar CTriad, QSOrder, PAAC y APAAC
+        (antes de convertir U).
+    """
+    codes: np.ndarray
+    lengths: np.ndarray
+    min_length_without_minus: int
+
+
+def encode_peptides(sequences: Sequence[str]) -> EncodedPeptides:
+    """
+    Reproduce la lectura de iProtein sobre un conjunto de secuencias, sin archivo FASTA.
+
+    Pasa a mayúsculas, convierte los caracteres fuera de 'ACDEFGHIKLMNPQRSTUVWY' en
+    huecos y los elimina. Igual que `check_sequence_type`, el tratamiento de 'U' depende
+    del alfabeto del conjunto: con 6-21 símbolos distintos se elimina, y con 5 o menos
+    (sin 'T') se convierte en 'T'. iProtein decide con una muestra aleatoria de 100
+    secuencias si hay más; aquí se usan todas.
+    """
+    raw = [str(seq).upper().encode("utf-8") for seq in sequences]
+    n_sequences = len(raw)
+    raw_lengths = np.fromiter((len(r) for r in raw), dtype=np.int64, count=n_sequences)
+    classes = _RESIDUE_TABLE[np.frombuffer(b"".join(raw), dtype=np.uint8)]
+    owner = np.repeat(np.arange(n_sequences), raw_lengths)
+
+    keep = classes != _GAP_CODE
+    lengths = np.bincount(owner[keep], minlength=n_sequences)
+    min_length = int(lengths.min()) if n_sequences else 1
+
+    n_chars = np.unique(classes).size
+    if 5 < n_chars <= 21:
+        keep &= classes != _U_CODE
+    elif 0 < n_chars <= 5 and not (classes == AA_ORDER.index("T")).any():
+        classes = np.where(classes == _U_CODE, AA_ORDER.index("T"), classes).astype(np.int8)
+
+    kept, owner = classes[keep], owner[keep]
+    lengths = np.bincount(owner, minlength=n_sequences)
+    max_len = int(lengths.max()) if n_sequences else 0
+    codes = np.full((n_sequences, max_len), _PAD_CODE, dtype=np.int8)
+    if kept.size:
+        starts = np.cumsum(lengths) - lengths
+        codes[owner, np.arange(kept.size) - starts[owner]] = kept
+    return EncodedPeptides(codes=codes, lengths=lengths, min_length_without_minus=min_length)
+
+
+def kmer_counts(codes: np.ndarray, offsets: Tuple[int, ...], mapping: np.ndarray,
+                n_symbols: int, chunk_size: int = 8192) -> np.ndarray:
+    """
+    Cuenta, por secuencia, las k-tuplas de símbolos en las posiciones (i + o for o in offsets).
+
+    Las tuplas con algún residuo que no cuenta (mapping == -1, o relleno) se ignoran.
+    Las columnas siguen el orden lexicográfico de los símbolos (primer símbolo más lento).
+
+    Retorna
+    -------
+    np.ndarray
+        Matriz int64 de forma (N, n_symbols ** len(offsets)).
+    """
+    n_sequences, max_len = codes.shape
+    n_columns = n_symbols ** len(offsets)
+    counts = np.zeros((n_sequences, n_columns), dtype=np.int64)
+    span = offsets[-1]
+    if max_len <= span:
+        return counts
+
+    for start in range(0, n_sequences, chunk_size):
+        symbols = mapping[codes[start:start + chunk_size].astype(np.intp)]
+        n_rows = symbols.shape[0]
+        index = np.zeros((n_rows, max_len - span), dtype=np.int64)
+        valid = np.ones(index.shape, dtype=bool)
+        for offset in offsets:
+            window = symbols[:, offset:max_len - span + offset]
+            valid &= window >= 0
+            index = index * n_symbols + window
+        index += np.arange(n_rows)[:, None] * n_columns
+        counts[start:start + n_rows] = np.bincount(
+            index[valid], minlength=n_rows * n_columns
+        ).reshape(n_rows, n_columns)
+    return counts
+
+
+def _has_u(encoded: EncodedPeptides, min_length: int) -> bool:
+    """True si alguna secuencia de al menos `min_length` residuos contiene U (KeyError en iFeature)."""
+    rows = encoded.lengths >= min_length
+    return bool((encoded.codes[rows] == _U_CODE).any())
+
+
+def _normalize_rows(counts: np.ndarray) -> np.ndarray:
+    totals = counts.sum(axis=1, keepdims=True)
+    values = counts.astype(np.float64)
+    np.divide(values, totals, out=values, where=totals != 0)
+    return values
+
+
+def _aac(encoded: EncodedPeptides, params: dict) -> Tuple[np.ndarray, List[str]]:
+    counts = kmer_counts(encoded.codes, (0,), _symbol_map(), len(AA_ORDER))
+    lengths = encoded.lengths[:, None]
+    values = np.zeros(counts.shape, dtype=np.float64)
+    np.divide(counts, lengths, out=values, where=lengths > 0)
+    return values, [f"AAC_{aa}" for aa in AA_ORDER]
+
+
+def _dpc(encoded: EncodedPeptides, params: dict, normalized: bool = True) -> Tuple[np.ndarray, List[str]]:
+    if _has_u(encoded, 2):
+        raise ValueError("DPC no admite 'U' en secuencias de proteína.")
+    counts = kmer_counts(encoded.codes, (0, 1), _symbol_map(), len(AA_ORDER))
+    values = _normalize_rows(counts) if normalized else counts.astype(np.float64)
+    return values, [f"DPC_{a1}{a2}" for a1 in AA_ORDER for a2 in AA_ORDER]
+
+
+def _gaac(encoded: EncodedPeptides, params: dict) -> Tuple[np.ndarray, List[str]]:
+    if (encoded.lengths == 0).any():
+        raise ValueError("GAAC no admite secuencias vacías.")
+    counts = kmer_counts(encoded.codes, (0,), _symbol_map(_GAAC_GROUPS), len(_GAAC_GROUPS))
+    values = counts / encoded.lengths[:, None]
+    return values, [f"GAAC_{key}" for key in _GAAC_GROUPS]
+
+
+def _cksaagp(encoded: EncodedPeptides, params: dict, normalized: bool = True) -> Tuple[np.ndarray, List[str]]:
+    gap = int(params["kspace"])
+    mapping = _symbol_map(_CKSAAGP_GROUPS)
+    pairs = [f"{k1}.{k2}" for k1 in _CKSAAGP_GROUPS for k2 in _CKSAAGP_GROUPS]
+    blocks, columns = [], []
+    for g in range(gap + 1):
+        counts = kmer_counts(encoded.codes, (0, g + 1), mapping, len(_CKSAAGP_GROUPS))
+        blocks.append(_normalize_rows(counts) if normalized else counts.astype(np.float64))
+        columns += [f"CKSAAGP_{p}.gap{g}" for p in pairs]
+    return np.hstack(blocks), columns
+
+
+def _ctriad(encoded: EncodedPeptides, params: dict) -> Tuple[np.ndarray, List[str]]:
+    if encoded.min_length_without_minus < 3:
+        raise ValueError("CTriad necesita secuencias de al menos 3 residuos.")
+    if _has_u(encoded, 3):
+        raise ValueError("CTriad no admite 'U' en secuencias de proteína.")
+    groups = {key: _CTRIAD_GROUPS[key] for key in sorted(_CTRIAD_GROUPS)}
+    counts = kmer_counts(encoded.codes, (0, 1, 2), _symbol_map(groups), len(groups))
+    min_value = counts.min(axis=1, keepdims=True)
+    max_value = counts.max(axis=1, keepdims=True)
+    # Igual que iFeature: (c - min) / max, NaN si la secuencia no tiene tripletes
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = (counts - min_value) / max_value
+    names = [f"CTriad_{f1}.{f2}.{f3}" for f1 in groups for f2 in groups for f3 in groups]
+    return values, names
+
+
+# --- Descriptores de orden de secuencia (autocorrelación y pseudo-composición) ---
+
+def _order_map(order: str) -> np.ndarray:
+    """Tabla código de residuo -> posición del aminoácido en `order`; -1 si no está."""
+    mapping = np.full(_PAD_CODE + 1, -1, dtype=np.int64)
+    for k, aa in enumerate(order):
+        mapping[AA_ORDER.index(aa)] = k
+    return mapping
+
+
+@lru_cache(maxsize=None)
+def _data_lines(file_name: str) -> Tuple[str, ...]:
+    """Líneas de un archivo de datos de iFeatureOmega (carpeta 'data' junto al módulo)."""
+    data_dir = Path(inspect.getfile(iFeatureOmegaCLI.iProtein)).parent / "data"
+    with open(data_dir / file_name) as handle:
+        return tuple(handle.readlines())
+
+
+def _residue_values(values_by_aa: np.ndarray, order: str, default: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Reordena una tabla (P x 20, columnas en `order`) a códigos de residuo (P x 23).
+    El relleno vale 0; U y huecos valen `default` (o 0).
+    """
+    table = np.zeros((values_by_aa.shape[0], _PAD_CODE + 1), dtype=np.float64)
+    for k, aa in enumerate(order):
+        table[:, AA_ORDER.index(aa)] = values_by_aa[:, k]
+    if default is not None:
+        table[:, _U_CODE] = default
+        table[:, _GAP_CODE] = default
+    return table
+
+
+def _aaindex_table(props: List[str]) -> np.ndarray:
+    """Propiedades AAindex estandarizadas igual que iFeature (media 0, desviación típica 1)."""
+    records = {}
+    for line in _data_lines("AAidx.txt")[1:]:
+        array = line.rstrip().split("\t")
+        records[array[0]] = array[1:]
+    missing = [prop for prop in props if prop not in records]
+    if missing:
+        raise ValueError(f"Propiedades AAindex inexistentes: {missing}")
+    aaidx = np.array([float(v) for prop in props for v in records[prop]]).reshape((len(props), 20))
+    mean = np.average(aaidx, axis=1)
+    std = np.std(aaidx, axis=1)
+    return (aaidx - mean[:, None]) / std[:, None]
+
+
+def _distance_matrix(file_name: str, order: str) -> np.ndarray:
+    """Matriz (23 x 23) de distancias al cuadrado entre códigos de residuo; 0 fuera de los 20 AA."""
+    rows = [line.rstrip().split()[1:] for line in _data_lines(file_name)[1:] if line.rstrip() != ""]
+    distance = np.array([[float(v) for v in row] for row in rows]).reshape((20, 20))
+    matrix = np.zeros((_PAD_CODE + 1, _PAD_CODE + 1), dtype=np.float64)
+    codes = [AA_ORDER.index(aa) for aa in order]
+    matrix[np.ix_(codes, codes)] = distance ** 2
+    return matrix
+
+
+def _paac_properties(skip_last: bool = False) -> Tuple[str, List[str], List[List[float]]]:
+    """Orden de AA, nombres y valores estandarizados de PAAC.txt (APAAC omite la última línea, como iFeature)."""
+    records = _data_lines("PAAC.txt")
+    order = "".join(records[0].rstrip().split()[1:])
+    names, properties = [], []
+    for line in records[1:len(records) - 1 if skip_last else len(records)]:
+        array = line.rstrip().split()
+        values = [float(v) for v in array[1:]]
+        mean = sum(values) / 20
+        scale = math.sqrt(sum([(v - mean) ** 2 for v in values]) / 20)
+        names.append(array[0])
+        properties.append([(v - mean) / scale for v in values])
+    return order, names, properties
+
+
+def _row_chunks(n_rows: int, chunk_size: int = 4096) -> List[slice]:
+    return [slice(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
+
+
+def _lag_products(values: np.ndarray, nlag: int) -> np.ndarray:
+    """
+    sum_j values[..., j] * values[..., j + lag] para lag = 1..nlag.
+
+    `values` debe valer 0 en el relleno, así las secuencias de distinta longitud se
+    enmascaran solas. Retorna un array (..., nlag).
+    """
+    max_len = values.shape[-1]
+    sums = np.zeros(values.shape[:-1] + (nlag,), dtype=np.float64)
+    for lag in range(1, min(nlag, max_len - 1) + 1):
+        sums[..., lag - 1] = (values[..., :-lag] * values[..., lag:]).sum(axis=-1)
+    return sums
+
+
+def _lag_pair_sums(codes: np.ndarray, matrix: np.ndarray, nlag: int) -> np.ndarray:
+    """sum_j matrix[codes[:, j], codes[:, j + lag]] para lag = 1..nlag (relleno = 0). Retorna (N, nlag)."""
+    codes = codes.astype(np.intp)
+    max_len = codes.shape[1]
+    sums = np.zeros((codes.shape[0], nlag), dtype=np.float64)
+    for lag in range(1, min(nlag, max_len - 1) + 1):
+        sums[:, lag - 1] = matrix[codes[:, :-lag], codes[:, lag:]].sum(axis=1)
+    return sums
+
+
+def _check_lag_denominators(lengths: np.ndarray, nlag: int) -> None:
+    """iFeature divide por (longitud - lag): si es 0 para algún lag, el descriptor falla."""
+    if np.isin(lengths, np.arange(1, nlag + 1)).any():
+        raise ValueError(f"hay secuencias de longitud igual a un lag (<= {nlag}).")
+
+
+def _lag_denominators(lengths: np.ndarray, nlag: int) -> np.ndarray:
+    return (lengths[:, None] - np.arange(1, nlag + 1)[None, :]).astype(np.float64)
+
+
+def _autocorrelation(encoded: EncodedPeptides, params: dict, moran: bool) -> Tuple[np.ndarray, List[str]]:
+    props = str(params["aaindex"]).split(";")
+    nlag = int(params["nlag"])
+    if (encoded.lengths <= nlag).any():
+        raise ValueError(f"hay secuencias de longitud <= nlag ({nlag}).")
+    if moran and (encoded.codes == _U_CODE).any():
+        raise ValueError("Moran no admite 'U' en secuencias de proteína.")
+    # NMBroto usa el valor de 'A' para residuos desconocidos (index.get(aa, 0) en iFeature)
+    aaidx = _aaindex_table(props)
+    table = _residue_values(aaidx, _AA_ORDER_TABLES, default=aaidx[:, 0])
+
+    blocks = []
+    for rows in _row_chunks(len(encoded.lengths)):
+        codes = encoded.codes[rows].astype(np.intp)
+        lengths = encoded.lengths[rows].astype(np.float64)
+        values = table[:, codes]                                    # (P, n, L), 0 en el relleno
+        if moran:
+            mask = codes != _PAD_CODE
+            mean = values.sum(axis=-1) / lengths                    # (P, n)
+            values = (values - mean[..., None]) * mask
+            variance = (values ** 2).sum(axis=-1) / lengths
+        lagged = _lag_products(values, nlag) / _lag_denominators(encoded.lengths[rows], nlag)
+        if moran:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                lagged = lagged / variance[..., None]
+        blocks.append(np.transpose(lagged, (1, 0, 2)).reshape(len(lengths), -1))
+
+    prefix = "Moran" if moran else "NMBroto"
+    columns = [f"{prefix}_{p}.lag{n}" for p in props for n in range(1, nlag + 1)]
+    return np.vstack(blocks), columns
+
+
+def _socnumber(encoded: EncodedPeptides, params: dict) -> Tuple[np.ndarray, List[str]]:
+    nlag = int(params["nlag"])
+    if _has_u(encoded, 2):
+        raise ValueError("SOCNumber no admite 'U' en secuencias de proteína.")
+    _check_lag_denominators(encoded.lengths, nlag)
+    sums = np.hstack([_lag_pair_sums(encoded.codes, _distance_matrix("Schneider-Wrede.txt", AA_ORDER), nlag),
+                      _lag_pair_sums(encoded.codes, _distance_matrix("Grantham.txt", _AA_ORDER_TABLES), nlag)])
+    denominators = np.tile(_lag_denominators(encoded.lengths, nlag), 2)
+    columns = ([f"SOCNumber_Schneider.lag{n}" for n in range(1, nlag + 1)]
+               + [f"SOCNumber_gGrantham.lag{n}" for n in range(1, nlag + 1)])
+    return sums / denominators, columns
+
+
+def _qsorder(encoded: EncodedPeptides, params: dict) -> Tuple[np.ndarray, List[str]]:
+    nlag = int(params["nlag"])
+    weight = params["weight"]
+    if nlag > encoded.min_length_without_minus - 1:
+        raise ValueError("el valor de nlag está fuera de rango.")
+    if _has_u(encoded, 2):
+        raise ValueError("QSOrder no admite 'U' en secuencias de proteína.")
+    counts = kmer_counts(encoded.codes, (0,), _order_map(_AA_ORDER_TABLES), len(_AA_ORDER_TABLES))
+    blocks = []
+    for file_name, order in (("Schneider-Wrede.txt", AA_ORDER), ("Grantham.txt", _AA_ORDER_TABLES)):
+        sums = _lag_pair_sums(encoded.codes, _distance_matrix(file_name, order), nlag)
+        blocks.append((counts, sums, 1 + weight * sums.sum(axis=1, keepdims=True)))
+    values = np.hstack([block[0] / block[2] for block in blocks]
+                       + [weight * block[1] / block[2] for block in blocks])
+    columns = ([f"QSOrder_Schneider.Xr.{aa}" for aa in _AA_ORDER_TABLES]
+               + [f"QSOrder_Grantham.Xr.{aa}" for aa in _AA_ORDER_TABLES]
+               + [f"QSOrder_Schneider.Xd.{n}" for n in range(1, nlag + 1)]
+               + [f"QSOrder_Grantham.Xd.{n}" for n in range(1, nlag + 1)])
+    return values, columns
+
+
+def _pseudo_aac(encoded: EncodedPeptides, params: dict, amphiphilic: bool) -> Tuple[np.ndarray, List[str]]:
+    lambda_value = int(params["lambdaValue"])
+    weight = params["weight"]
+    name = "APAAC" if amphiphilic else "PAAC"
+    if lambda_value > encoded.min_length_without_minus - 1:
+        raise ValueError("el valor de lambda está fuera de rango.")
+    if _has_u(encoded, 2):
+        raise ValueError(f"{name} no admite 'U' en secuencias de proteína.")
+    _check_lag_denominators(encoded.lengths, lambda_value)
+    order, prop_names, properties = _paac_properties(skip_last=amphiphilic)
+    denominators = _lag_denominators(encoded.lengths, lambda_value)
+
+    if amphiphilic:
+        table = _residue_values(np.array(properties), order)
+        blocks = []
+        for rows in _row_chunks(len(encoded.lengths)):
+            values = table[:, encoded.codes[rows].astype(np.intp)]        # (P, n, L)
+            lagged = _lag_products(values, lambda_value) / denominators[rows]
+            # Orden de iFeature: por lag y, dentro de cada lag, por propiedad
+            blocks.append(np.transpose(lagged, (1, 2, 0)).reshape(lagged.shape[1], -1))
+        theta = np.vstack(blocks)
+        theta_columns = [f"APAAC_Pc2.{p}.{n}" for n in range(1, lambda_value + 1) for p in prop_names]
+    else:
+        # Rvalue de iFeature: media sobre propiedades de la diferencia al cuadrado
+        index = {aa: k for k, aa in enumerate(order)}
+        rvalue = np.zeros((_PAD_CODE + 1, _PAD_CODE + 1), dtype=np.float64)
+        for aa1 in order:
+            for aa2 in order:
+                rvalue[AA_ORDER.index(aa1), AA_ORDER.index(aa2)] = sum(
+                    [(prop[index[aa1]] - prop[index[aa2]]) ** 2 for prop in properties]) / len(properties)
+        theta = _lag_pair_sums(encoded.codes, rvalue, lambda_value) / denominators
+        theta_columns = [f"PAAC_Xc2.lambda{n}" for n in range(1, lambda_value + 1)]
+
+    counts = kmer_counts(encoded.codes, (0,), _order_map(order), len(order))
+    scale = 1 + weight * theta.sum(axis=1, keepdims=True)
+    prefix = "APAAC_Pc1" if amphiphilic else "PAAC_Xc1"
+    columns = [f"{prefix}.{aa}" for aa in order] + theta_columns
+    return np.hstack([counts / scale, weight * theta / scale]), columns
+
+
+_NATIVE_FUNCTIONS = {
+    "AAC": lambda encoded, params: _aac(encoded, params),
+    "DPC type 1": lambda encoded, params: _dpc(encoded, params, normalized=True),
+    "DPC type 2": lambda encoded, params: _dpc(encoded, params, normalized=False),
+    "CKSAAGP type 1": lambda encoded, params: _cksaagp(encoded, params, normalized=True),
+    "CKSAAGP type 2": lambda encoded, params: _cksaagp(encoded, params, normalized=False),
+    "GAAC": lambda encoded, params: _gaac(encoded, params),
+    "CTriad": lambda encoded, params: _ctriad(encoded, params),
+    "Moran": lambda encoded, params: _autocorrelation(encoded, params, moran=True),
+    "NMBroto": lambda encoded, params: _autocorrelation(encoded, params, moran=False),
+    "SOCNumber": lambda encoded, params: _socnumber(encoded, params),
+    "QSOrder": lambda encoded, params: _qsorder(encoded, params),
+    "PAAC": lambda encoded, params: _pseudo_aac(encoded, params, amphiphilic=False),
+    "APAAC": lambda encoded, params: _pseudo_aac(encoded, params, amphiphilic=True),
+}
+
+
+def native_descriptor_parameters(descriptor: str,
+                                 settings_json_file: Optional[Union[str, Path]] = None) -> dict:
+    """
+    Parámetros efectivos de un descriptor, resueltos como en `iProtein.get_descriptor`:
+    los valores base más la entrada del descriptor en el JSON (que reemplaza por completo
+    a los valores por defecto por descriptor si se puede leer).
+    """
+    params_dict = _DEFAULT_PARAMETERS_DICT
+    if settings_json_file and Path(settings_json_file).exists():
+        with open(settings_json_file) as handle:
+            try:
+                params_dict = json.loads(handle.read().strip())
+            except ValueError:
+                params_dict = _DEFAULT_PARAMETERS_DICT
+    params = dict(_DEFAULT_PARAMETERS)
+    params.update(params_dict.get(descriptor, {}))
+    return params
+
+
+def compute_native_descriptors(ids: Sequence[str], sequences: Sequence[str], descriptors: Sequence[str],
+                               settings_json_file: Optional[Union[str, Path]] = None
+                               ) -> List[Tuple[str, pd.DataFrame]]:
+    """
+    Calcula descriptores de composición directamente desde las secuencias en memoria.
+
+    Parámetros
+    ----------
+    ids : Sequence[str]
+        IDs de las secuencias (tal como los asignaría iFeature).
+    sequences : Sequence[str]
+        Secuencias sin preprocesar.
+    descriptors : Sequence[str]
+        Descriptores a calcular; solo se usan los de NATIVE_DESCRIPTORS.
+    settings_json_file : str | Path | None
+        Archivo JSON de parámetros de iFeature (solo afecta a 'kspace' de CKSAAGP).
+
+    Retorna
+    -------
+    list
+        [(descriptor, DataFrame indexado por ID), ...] con los mismos nombres de columna y
+        valores que iFeatureOmega. Los descriptores que iFeature no podría calcular con
+        estas secuencias se omiten (el llamador puede delegarlos a iFeature).
+    """
+    descriptors = [desc for desc in descriptors if desc in _NATIVE_FUNCTIONS]
+    if not descriptors:
+        return []
+    encoded = encode_peptides(sequences)
+    index = pd.Index([str(i) for i in ids], name="ID")
+
+    results = []
+    for desc in descriptors:
+        try:
+            values, columns = _NATIVE_FUNCTIONS[desc](encoded, native_descriptor_parameters(desc, settings_json_file))
+        except ValueError as e:
+            print(f"{desc}: no se puede calcular de forma nativa ({e}).")
+            continue
+        results.append((desc, pd.DataFrame(values, columns=columns, index=index)))
+    return results
@@ -4,11 +4,125 @@
 from iFeatureOmega import iFeatureOmegaCLI
 import pandas as pd
 import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from tqdm.auto import tqdm
 from typing import List, Optional, Dict, Any
-from .bio_utils import save_df_as_fasta, fasta_to_dataframe, inspect_fasta_file
+from .bio_utils import save_df_as_fasta, fasta_to_dataframe, inspect_fasta_file, inspect_sequences, write_fasta
+from .fasta_index import iter_fasta_chunks, read_fasta
+from .feature_cache import FeatureCache, sequence_hashes, settings_hash
+from .ifeature_native import NATIVE_DESCRIPTORS, compute_native_descriptors
+
+# Parámetros globales de iProtein (atributo privado, sin API pública para restaurarlos)
+_DEFAULT_PARA_ATTR = "_iProtein__default_para"
+
+
+class DescriptorEngine:
+    """
+    Lee el FASTA y el JSON de parámetros una sola vez y calcula varios descriptores
+    de iFeatureOmega sobre ese estado compartido.
+
+    Antes de cada descriptor se restauran los parámetros base (iProtein copia los
+    parámetros de cada descriptor sobre un diccionario global) y se limpian las
+    codificaciones, de modo que cada resultado es idéntico al de una instancia nueva.
+    Si la versión instalada de iFeatureOmega no expone ese diccionario, se crea una
+    instancia nueva por descriptor (se vuelve a leer el FASTA).
+    """
+
+    def __init__(self, input_fasta_file, settings_json_file=None):
+        """
+        Parámetros
+        ----------
+        input_fasta_file : str | Path
+            Ruta al archivo FASTA o TXT con secuencias.
+        settings_json_file : str | Path | None
+            Ruta al archivo JSON de configuración de parámetros.
+        """
+        self.input_fasta_file = input_fasta_file
+        self.settings_json_file = settings_json_file
+        self.protein = self._new_protein()
+
+        # Copia de los parámetros por defecto, si iProtein los expone
+        parametros = getattr(self.protein, _DEFAULT_PARA_ATTR, None)
+        self._parametros_base = dict(parametros) if isinstance(parametros, dict) else None
+        self._usado = False
+        self.n_sequences = self.protein.sequence_number
+        self.timings = []
+
+    def _new_protein(self):
+        protein = iFeatureOmegaCLI.iProtein(str(self.input_fasta_file))
+        if self.settings_json_file:
+            try:
+                protein.import_parameters(str(self.settings_json_file))
+            except Exception as e:
+                print(f"No se pudo importar parámetros: {e}")
+        return protein
+
+    def compute(self, descriptor):
+        """
+        Calcula un descriptor y devuelve un DataFrame indexado por ID, o None si falla.
+        """
+        if self._parametros_base is not None:
+            setattr(self.protein, _DEFAULT_PARA_ATTR, dict(self._parametros_base))
+            self.protein.encodings = None
+        elif self._usado:
+            self.protein = self._new_protein()
+        self._usado = True
+
+        inicio = time.perf_counter()
+        try:
+            self.protein.get_descriptor(descriptor)
+            df = self.protein.encodings.reset_index()
+        except Exception as e:
+            print(f"Error al calcular {descriptor}: {self.protein.encodings} {e}")
+            return None
+        finally:
+            self.timings.append({
+                "descriptor": descriptor,
+                "n_sequences": self.n_sequences,
+                "seconds": time.perf_counter() - inicio,
+                "pid": os.getpid(),
+            })
+
+        if df.empty:
+            print(f"Descriptor {descriptor} no generó resultados.")
+            return None
+
+        # Normalizar el nombre de la columna ID y ponerla como índice
+        df.rename(columns={df.columns[0]: "ID"}, inplace=True)
+        df = df.set_index("ID")
+        return df
+
+    def compute_many(self, descriptors, progress=True):
+        """
+        Calcula una lista de descriptores y devuelve [(descriptor, DataFrame), ...]
+        solo con los que se pudieron calcular.
+        """
+        results = []
+        for desc in tqdm(descriptors, desc="calculando descriptores", disable=not progress):
+            df = self.compute(desc)
+            if df is not None:
+                results.append((desc, df))
+        return results
+
+
+def join_descriptor_frames(frames):
+    """
+    Une los DataFrames de descriptores (indexados por ID) en un solo `concat`.
+
+    Todos provienen del mismo FASTA, así que normalmente comparten el mismo índice
+    en el mismo orden y se concatenan sin realinear. Si no, se alinean con una
+    unión interna sobre el índice, equivalente a los `merge` encadenados.
+    """
+    first_index = frames[0].index
+    if all(df.index.equals(first_index) for df in frames[1:]):
+        return pd.concat(frames, axis=1)
+    return pd.concat(frames, axis=1, join="inner")
+
 
 def compute_single_descriptor(input_fasta_file, descriptor, settings_json_file=None):
     """
@@ -27,57 +141,204 @@ def compute_single_descriptor(input_fasta_file, descriptor, settings_json_file=N
     -------
     pandas.DataFrame
         DataFrame con las secuencias como índice y columnas prefijadas con el descriptor.
+        Para varios descriptores use `DescriptorEngine`, que lee el FASTA una sola vez.
+    """
+    return DescriptorEngine(input_fasta_file, settings_json_file).compute(descriptor)
+
+TIMING_COLUMNS = ["descriptor", "shard", "n_sequences", "seconds", "pid"]
+
+# Caché de motores por proceso: un worker reutiliza el FASTA ya leído entre tareas
+_WORKER_ENGINES: Dict[Any, DescriptorEngine] = {}
+_WORKER_ENGINES_MAX = 2
+
+
+def _descriptor_task(fasta_file, descriptor, settings_json_file):
+    """Tarea del pool de procesos: calcula un descriptor sobre un FASTA (o un fragmento)."""
+    key = (str(fasta_file), str(settings_json_file))
+    engine = _WORKER_ENGINES.get(key)
+    if engine is None:
+        if len(_WORKER_ENGINES) >= _WORKER_ENGINES_MAX:
+            _WORKER_ENGINES.pop(next(iter(_WORKER_ENGINES)))
+        engine = DescriptorEngine(fasta_file, settings_json_file)
+        _WORKER_ENGINES[key] = engine
+    df = engine.compute(descriptor)
+    return df, engine.timings[-1]
+
+
+def _split_fasta_shards(input_fasta_file, shard_size, output_dir):
+    """Divide el FASTA en fragmentos de `shard_size` registros; devuelve sus rutas en orden."""
+    shard_files = []
+    for k, chunk in enumerate(iter_fasta_chunks(input_fasta_file, chunk_size=shard_size)):
+        shard_file = Path(output_dir) / f"shard_{k:05d}.fasta"
+        # Se conserva el encabezado completo: iFeature toma el ID de la primera palabra
+        write_fasta((chunk["description"].tolist(), chunk["sequence"].tolist()), shard_file, atomic=False,
+                    columns=True)
+        shard_files.append(shard_file)
+    return shard_files
+
+
+def compute_descriptors_parallel(input_fasta_file, descriptors, settings_json_file=None,
+                                 n_workers=None, shard_size=None, progress=True):
+    """
+    Calcula descriptores en un pool de procesos, repartiendo por descriptor y,
+    opcionalmente, por fragmentos de secuencias.
+
+    Parámetros
+    ----------
+    input_fasta_file : str | Path
+        Ruta al archivo FASTA.
+    descriptors : list
+        Lista de descriptores de iFeatureOmega.
+    settings_json_file : str | Path | None
+        Ruta al archivo JSON de configuración de parámetros.
+    n_workers : int | None
+        Número de procesos. Por defecto, os.cpu_count().
+    shard_size : int | None
+        Si se indica, el FASTA se divide en fragmentos de este número de secuencias y
+        cada (descriptor, fragmento) es una tarea. Todos los descriptores por defecto
+        se calculan por secuencia, así que el resultado no depende del fragmentado.
+    progress : bool
+        Muestra una barra de progreso.
+
+    Retorna
+    -------
+    tuple
+        ([(descriptor, DataFrame), ...] en el orden de `descriptors`, DataFrame de tiempos
+        por tarea con columnas descriptor, shard, n_sequences, seconds y pid).
     """
-    #print(f"Calculando descriptor: {descriptor}")
+    n_workers = n_workers or os.cpu_count() or 1
+    piezas = {}
+    tiempos = []
+
+    with tempfile.TemporaryDirectory(prefix="ifeature_shards_", dir=Path(input_fasta_file).parent) as tmp_dir:
+        if shard_size:
+            shard_files = _split_fasta_shards(input_fasta_file, shard_size, tmp_dir)
+        else:
+            shard_files = [Path(input_fasta_file)]
+
+        # Orden fragmento-descriptor: tareas consecutivas comparten el FASTA ya leído en el worker
+        tasks = [(desc, k, shard) for k, shard in enumerate(shard_files) for desc in descriptors]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = {
+                executor.submit(_descriptor_task, str(shard), desc, settings_json_file): (desc, k)
+                for desc, k, shard in tasks
+            }
+            for future in tqdm(as_completed(futures), total=len(futures),
+                               desc="calculando descriptores", disable=not progress):
+                desc, k = futures[future]
+                df, tiempo = future.result()
+                piezas[(desc, k)] = df
+                tiempos.append({**tiempo, "shard": k})
 
-    protein = iFeatureOmegaCLI.iProtein(input_fasta_file)
+    results = []
+    for desc in descriptors:
+        frames = [piezas[(desc, k)] for k in range(len(shard_files))]
+        if any(df is None for df in frames):
+            print(f"Descriptor {desc} falló en al menos un fragmento; se omite.")
+            continue
+        results.append((desc, frames[0] if len(frames) == 1 else pd.concat(frames, axis=0)))
 
-    if settings_json_file:
-        try:
-            protein.import_parameters(settings_json_file)
-        except Exception as e:
-            print(f"No se pudo importar parámetros: {e}")
+    orden = {desc: i for i, desc in enumerate(descriptors)}
+    timings = pd.DataFrame(tiempos, columns=TIMING_COLUMNS)
+    timings = (timings.assign(_orden=timings["descriptor"].map(orden))
+               .sort_values(["shard", "_orden"]).drop(columns="_orden").reset_index(drop=True))
+    return results, timings
 
-    try:
-        protein.get_descriptor(descriptor)
-        df = protein.encodings.reset_index()
-    except Exception as e:
-        print(f"Error al calcular {descriptor}: {protein.encodings} {e}")
-        return None
+
+def _ifeature_id(header):
+    """ID que iFeature asigna a un registro: primera palabra del encabezado, antes de '|'."""
+    return (str(header).split() or [""])[0].split('|')[0]
 
 
+def _filas_escritas(dataframe, sequence_col):
+    """Máscara de las filas que `save_df_as_fasta` escribe (secuencia no nula ni vacía)."""
+    return pd.Series([not (pd.isna(seq) or not seq) for seq in dataframe[sequence_col]],
+                     index=dataframe.index, dtype=bool)
+
+
+def _compute_with_ifeature(input_fasta_file, descriptors, settings_json_file, n_workers=1, shard_size=None):
+    """Calcula descriptores con iFeatureOmega (serial o en paralelo). Devuelve (resultados, tiempos)."""
+    if (n_workers is None or n_workers > 1) and (len(descriptors) > 1 or shard_size):
+        return compute_descriptors_parallel(
+            input_fasta_file, descriptors, settings_json_file,
+            n_workers=n_workers, shard_size=shard_size
+        )
+    engine = DescriptorEngine(input_fasta_file, settings_json_file)
+    results = engine.compute_many(descriptors)
+    timings = pd.DataFrame(engine.timings).assign(shard=0).reindex(columns=TIMING_COLUMNS)
+    return results, timings
 
-    if df.empty:
-        print(f"Descriptor {descriptor} no generó resultados.")
-        return None
 
-    # Normalizar el nombre de la columna ID y ponerla como índice
-    df.rename(columns={df.columns[0]: "ID"}, inplace=True)
-    df = df.set_index("ID")
-    return df
+def _in_descriptor_order(descriptors, *result_lists):
+    por_descriptor = {desc: df for results in result_lists for desc, df in results}
+    return [(desc, por_descriptor[desc]) for desc in descriptors if desc in por_descriptor]
 
-def compute_peptide_features(input_fasta_file, descriptors, settings_json_file, output_csv=None):
+
+def compute_descriptor_frames(ids, sequences, descriptors, settings_json_file, fasta_file,
+                              n_workers=1, shard_size=None, native=True, write_fasta_file=True):
+    """
+    Calcula descriptores a partir de secuencias en memoria.
+
+    Los descriptores de NATIVE_DESCRIPTORS se calculan con NumPy sin pasar por un FASTA. Solo si quedan descriptores para iFeature se escribe
+    `fasta_file` con los `ids` como encabezados. Con write_fasta_file=False, `fasta_file`
+    ya contiene esos registros (p. ej. escrito con `save_df_as_fasta`) y no se reescribe.
+
+    Retorna
+    -------
+    list
+        [(descriptor, DataFrame indexado por ID), ...] en el orden de `descriptors`,
+        solo con los que se pudieron calcular.
+    """
+    nativos = compute_native_descriptors(ids, sequences, descriptors, settings_json_file) if native else []
+    calculados = {desc for desc, _ in nativos}
+    restantes = [desc for desc in descriptors if desc not in calculados]
+
+    results = []
+    if restantes:
+        if write_fasta_file:
+            write_fasta((list(ids), list(sequences)), fasta_file, columns=True)
+        results, _ = _compute_with_ifeature(fasta_file, restantes, settings_json_file,
+                                            n_workers=n_workers, shard_size=shard_size)
+    return _in_descriptor_order(descriptors, nativos, results)
+
+
+def compute_peptide_features(input_fasta_file, descriptors, settings_json_file, output_csv=None,
+                             n_workers=1, shard_size=None, return_timings=False, native=True):
     """
     Calcula una lista de descriptores con iFeatureOmega y devuelve un DataFrame combinado.
+
+    El FASTA y los parámetros se cargan una sola vez (`DescriptorEngine`) y los
+    resultados se unen con un único `concat` sobre el índice ID. Con n_workers > 1
+    los descriptores (y fragmentos de `shard_size` secuencias, si se indica) se
+    calculan en un pool de procesos; el resultado es idéntico al de la ruta serial.
+    Con native=True, los descriptores de NATIVE_DESCRIPTORS (composición, autocorrelación
+    y orden de secuencia) se calculan con NumPy, con los mismos nombres de columna y valores.
+    Si return_timings es True, devuelve (DataFrame, tiempos por tarea).
     """
     if not descriptors or not isinstance(descriptors, (list, tuple)):
         raise ValueError("Se necesita una lista no vacía de descriptores.")
 
-    results = []
-    for i in tqdm(range(0, len(descriptors)), desc="calculando descriptores"):
-        desc = descriptors[i]
-        df = compute_single_descriptor(input_fasta_file, desc, settings_json_file)
-        if df is not None:
-            results.append((desc, df))
+    nativos = []
+    if native and any(desc in NATIVE_DESCRIPTORS for desc in descriptors):
+        registros = read_fasta(input_fasta_file)
+        ids = [_ifeature_id(record_id) for record_id in registros["id"]]
+        nativos = compute_native_descriptors(ids, registros["sequence"].tolist(), descriptors,
+                                             settings_json_file)
+    calculados = {desc for desc, _ in nativos}
+    restantes = [desc for desc in descriptors if desc not in calculados]
+
+    results, timings = [], pd.DataFrame(columns=TIMING_COLUMNS)
+    if restantes:
+        results, timings = _compute_with_ifeature(input_fasta_file, restantes, settings_json_file,
+                                                  n_workers=n_workers, shard_size=shard_size)
+    results = _in_descriptor_order(descriptors, nativos, results)
 
     if not results:
         raise Exception("No se pudieron calcular descriptores válidos.")
 
     # Combina todos los dataframes de resultados en uno solo
-    combined_df = results[0][1]
-
-    for desc, df in results[1:]:
-        combined_df = combined_df.merge(df, left_index=True, right_index=True, how="inner")
+    combined_df = join_descriptor_frames([df for desc, df in results])
+    combined_df.index.name = "ID"
 
     combined_df.reset_index(inplace=True)
 
@@ -85,32 +346,91 @@ def compute_peptide_features(input_fasta_file, descriptors, settings_json_file,
         combined_df.to_csv(output_csv, index=False)
         print(f"Resultados guardados en {output_csv}")
 
-    # # Opcional: Verificar si se perdieron secuencias durante el merge
-    # expected_ids = results[0][1].index
-    # for desc, df in results[1:]:
-    #     lost = set(expected_ids) - set(df.index)
-    #     if lost:
-    #         print(f"En el descriptor {desc} faltaron {len(lost)} secuencias: {list(lost)[:3]}...")
-
+    if return_timings:
+        return combined_df, timings
     return combined_df
 
+
+def compute_features_cached(dataframe, sequence_col, id_col, descriptors, settings_json_file,
+                            cache, fasta_file, n_workers=1, shard_size=None, native=True):
+    """
+    Calcula descriptores usando una `FeatureCache`: solo las secuencias que faltan en la
+    caché para algún descriptor se calculan (ver `compute_descriptor_frames`).
+
+    Las secuencias se escriben con su hash como ID, de modo que secuencias repetidas se
+    calculan una vez. Devuelve un DataFrame con la columna 'ID' (derivada de `id_col` con
+    la misma regla que iFeature) y las columnas de descriptores, igual que
+    `compute_peptide_features`.
+    """
+    datos = dataframe.loc[_filas_escritas(dataframe, sequence_col)]
+    secuencias = datos[sequence_col].astype(str).tolist()
+    hashes = sequence_hashes(secuencias)
+    unicos = list(dict.fromkeys(hashes))
+
+    params = {desc: settings_hash(desc, settings_json_file) for desc in descriptors}
+    cacheados = {desc: cache.lookup(desc, params[desc], unicos) for desc in descriptors}
+    a_calcular = [desc for desc in descriptors if len(cacheados[desc]) < len(unicos)]
+    faltantes = [h for h in unicos
+                 if any(h not in cacheados[desc].index for desc in a_calcular)]
+
+    nuevos = {}
+    if faltantes:
+        secuencia_por_hash = dict(zip(hashes, secuencias))
+        print(f"Caché: {len(unicos) - len(faltantes)}/{len(unicos)} secuencias completas; "
+              f"calculando {len(a_calcular)} descriptores para {len(faltantes)} secuencias.")
+        results = compute_descriptor_frames(
+            faltantes, [secuencia_por_hash[h] for h in faltantes], a_calcular, settings_json_file,
+            fasta_file, n_workers=n_workers, shard_size=shard_size, native=native
+        )
+        for desc, df in results:
+            df.index.name = None
+            cache.store(desc, params[desc], df[~df.index.isin(cacheados[desc].index)])
+            nuevos[desc] = df
+
+    frames = []
+    for desc in descriptors:
+        if desc in a_calcular and desc not in nuevos:
+            continue
+        tabla = cacheados[desc]
+        if desc in nuevos:
+            tabla = pd.concat([tabla, nuevos[desc]]) if len(tabla) else nuevos[desc]
+            tabla = tabla[~tabla.index.duplicated()]
+        frames.append(tabla.reindex(hashes))
+
+    if not frames:
+        raise Exception("No se pudieron calcular descriptores válidos.")
+
+    combined_df = pd.concat(frames, axis=1)
+    # Mismo ID que asigna iFeature al leer el encabezado del FASTA
+    ids = [_ifeature_id(i) for i in datos[id_col]]
+    combined_df.insert(0, "ID", ids)
+    return combined_df.reset_index(drop=True)
+
+
 def calcular_descriptores_ifeature(
     directorio_temporal: Path,
     dataframe: pd.DataFrame,
     sequence_col: str,
     id_col: str,
     descriptores: Optional[List[str]] = None,
-    ifeatures_settings_json: Optional[Path] = None
+    ifeatures_settings_json: Optional[Path] = None,
+    validar_en_memoria: bool = True,
+    n_workers: Optional[int] = 1,
+    shard_size: Optional[int] = None,
+    feature_cache: Optional[FeatureCache] = None,
+    nativos: bool = True
 ) -> pd.DataFrame:
     """
     Calcula descriptores de péptidos usando iFeature para un DataFrame dado.
 
     La función realiza los siguientes pasos:
-    1. Genera un archivo FASTA temporal a partir del DataFrame.
-    2. Valida el archivo FASTA.
+    1. Genera un archivo FASTA temporal a partir del DataFrame (solo para los
+       descriptores que no se calculan de forma nativa).
+    2. Valida las secuencias (en memoria antes de escribir, o releyendo el FASTA).
     3. Define una lista de descriptores por defecto si no se proporciona una.
     4. Valida la existencia del archivo de configuración de iFeature (si se proporciona).
-    5. Ejecuta 'compute_peptide_features' (wrapper de iFeature) sobre el FASTA.
+    5. Calcula los descriptores ('compute_descriptor_frames'): los nativos con NumPy
+       y el resto con iFeature sobre el FASTA.
     6. Une los descriptores calculados de nuevo al DataFrame original.
     7. Limpia el archivo FASTA temporal.
 
@@ -126,6 +446,20 @@ def calcular_descriptores_ifeature(
                       por iFeature. Si es None, se usa una lista predefinida.
         ifeatures_settings_json: Ruta opcional al archivo JSON de configuración
                                  de iFeature.
+        validar_en_memoria: Si es True (por defecto), valida el DataFrame antes de
+                            escribir el FASTA, sin volver a leer el archivo. Si es
+                            False, valida el FASTA escrito con 'inspect_fasta_file'.
+        n_workers: Número de procesos para calcular descriptores en paralelo.
+                   1 (por defecto) usa la ruta serial; None usa todos los núcleos.
+        shard_size: Si se indica junto con n_workers, divide además las secuencias
+                    en fragmentos de este tamaño (útil para entradas grandes).
+        feature_cache: 'FeatureCache' opcional. Si se indica, los descriptores ya
+                       calculados para una secuencia (con los mismos parámetros) se
+                       leen de la caché y solo se calculan las secuencias nuevas.
+        nativos: Si es True (por defecto), los descriptores de NATIVE_DESCRIPTORS
+                 (AAC, DPC, CKSAAGP, GAAC, CTriad, Moran, NMBroto, SOCNumber, QSOrder,
+                 PAAC, APAAC) se calculan con NumPy desde el DataFrame (mismos nombres
+                 y valores que iFeature), sin escribir el FASTA para ellos.
 
     Returns:
         Un nuevo DataFrame que contiene los datos del 'dataframe' original
@@ -169,33 +503,63 @@ def calcular_descriptores_ifeature(
     ruta_salida_fasta = directorio_temporal / nombre_archivo_fasta
 
     try:
-        # 4. Guardar el DataFrame como archivo FASTA
-        save_df_as_fasta(
-            dataframe=dataframe,
-            id_col=id_col,
-            seq_col=sequence_col,
-            output_file=ruta_salida_fasta
-        )
-
-        # 5. Validar el archivo FASTA creado
-        results = inspect_fasta_file(ruta_salida_fasta)
-        if not (results and results.get('is_valid')):
-            print(f"\nLa validación falló para '{ruta_salida_fasta}'. Abortando.")
-            print(f"Detalles: {results.get('errors', 'Error desconocido')}")
-            raise ValueError(f"El archivo FASTA generado '{ruta_salida_fasta}' no es válido.")
-        
-        print(f"'{ruta_salida_fasta}' es válido. Se encontraron {results['record_count']} registros.")
-
-        # 6. Calcular los descriptores usando iFeature
-        print(f"Iniciando cálculo de {len(descriptores)} descriptores...")
-        df_descriptores_ifeature = compute_peptide_features(
-            ruta_salida_fasta,
-            descriptores,
-            ifeatures_settings_json
-        )
-        print("Cálculo de descriptores finalizado.")
-
-        # 7. Unir los descriptores al DataFrame original
+        # 4. Validar las secuencias en memoria (mismo resultado que validar el FASTA escrito)
+        if validar_en_memoria or feature_cache is not None:
+            results = inspect_sequences(dataframe, id_col=id_col, seq_col=sequence_col)
+            if not results.get('is_valid'):
+                print(f"\nLa validación falló para el DataFrame de entrada. Abortando.")
+                raise ValueError("Las secuencias del DataFrame no son válidas para generar el FASTA.")
+
+        if feature_cache is not None:
+            # 5-7. Con caché: solo se escriben y calculan las secuencias que faltan
+            print(f"Iniciando cálculo de {len(descriptores)} descriptores (con caché)...")
+            df_descriptores_ifeature = compute_features_cached(
+                dataframe, sequence_col, id_col, descriptores, ifeatures_settings_json,
+                feature_cache, ruta_salida_fasta, n_workers=n_workers, shard_size=shard_size,
+                native=nativos
+            )
+            print(feature_cache.hit_rates().to_string(index=False))
+            print("Cálculo de descriptores finalizado.")
+        else:
+            datos = dataframe.loc[_filas_escritas(dataframe, sequence_col)]
+            ids = [_ifeature_id(i) for i in datos[id_col]]
+
+            # 5-6. Guardar y validar el archivo FASTA (solo si no se validó en memoria)
+            if not validar_en_memoria:
+                save_df_as_fasta(
+                    dataframe=dataframe,
+                    id_col=id_col,
+                    seq_col=sequence_col,
+                    output_file=ruta_salida_fasta
+                )
+                results = inspect_fasta_file(ruta_salida_fasta)
+                if not (results and results.get('is_valid')):
+                    print(f"\nLa validación falló para '{ruta_salida_fasta}'. Abortando.")
+                    raise ValueError(f"El archivo FASTA generado '{ruta_salida_fasta}' no es válido.")
+
+            print(f"Secuencias válidas. Se encontraron {results['record_count']} registros.")
+
+            # 7. Calcular los descriptores (el FASTA solo se escribe si alguno necesita iFeature)
+            print(f"Iniciando cálculo de {len(descriptores)} descriptores...")
+            resultados = compute_descriptor_frames(
+                ids,
+                datos[sequence_col].tolist(),
+                descriptores,
+                ifeatures_settings_json,
+                ruta_salida_fasta,
+                n_workers=n_workers,
+                shard_size=shard_size,
+                native=nativos,
+                # Sin validación en memoria, el FASTA ya se escribió y validó en el paso 5-6
+                write_fasta_file=validar_en_memoria
+            )
+            if not resultados:
+                raise Exception("No se pudieron calcular descriptores válidos.")
+            df_descriptores_ifeature = join_descriptor_frames([df for _, df in resultados])
+            df_descriptores_ifeature = df_descriptores_ifeature.rename_axis("ID").reset_index()
+            print("Cálculo de descriptores finalizado.")
+
+        # 8. Unir los descriptores al DataFrame original
         # iFeature siempre devuelve una columna 'ID' que coincide con los headers del FASTA
         # Hacemos el 'merge' usando la columna 'id_col' original y la columna 'ID' de iFeature
         df_final = pd.merge(
@@ -218,7 +582,7 @@ def calcular_descriptores_ifeature(
         return df_final
 
     finally:
-        # 8. Limpieza: Asegurarse de borrar el archivo temporal
+        # 9. Limpieza: Asegurarse de borrar el archivo temporal
         if ruta_salida_fasta.exists():
             try:
                 ruta_salida_fasta.unlink()
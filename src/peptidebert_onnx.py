@@ -0,0 +1,200 @@
+# peptidebert_onnx.py
+
+# --- Exportación de PeptideBERT a ONNX e inferencia con onnxruntime ---
+#
+# La inferencia solo necesita numpy, pandas y onnxruntime: los workers que puntúan con
+# modelos ya exportados no importan torch ni models.peptideBert.network.
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+import onnxruntime as ort
+from tqdm.auto import tqdm
+from typing import Dict, Optional
+from .peptidebert_tokens import batch_indices, encode_token_ids
+
+ONNX_FILENAME = 'model.onnx'
+ONNX_INPUTS = ('input_ids', 'attention_mask')
+DEFAULT_BATCH_SIZE = 64
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def onnx_model_path(onnx_directory, feature: str) -> str:
+    """Ruta del modelo ONNX de una feature (misma estructura que los modelos de torch)."""
+    return os.path.join(str(onnx_directory), feature, ONNX_FILENAME)
+
+
+def export_peptidebert_onnx(model_directory_path, feats=['hemo','sol','nf'],
+                            output_directory=None, opset_version: int = 17,
+                            atol: float = 1e-4) -> Dict[str, str]:
+    """
+    Exporta los modelos de PeptideBERT a ONNX con ejes dinámicos de lote y secuencia.
+
+    Cada modelo se carga con `load_bert_model`, se exporta a
+    `<output_directory>/<feature>/model.onnx` y se compara con onnxruntime sobre un lote
+    de prueba (con relleno) antes de darlo por bueno.
+
+    Args:
+        model_directory_path (str): Ruta al directorio de modelos de torch.
+        feats (list, optional): Features a exportar. Defaults to ['hemo','sol','nf'].
+        output_directory (str, optional): Directorio de salida. Por defecto, el de los modelos.
+        opset_version (int): Versión de opset de ONNX. Defaults to 17.
+        atol (float): Diferencia máxima admitida con el modelo de torch. Defaults to 1e-4.
+
+    Returns:
+        Dict[str, str]: Ruta del modelo ONNX por feature.
+    """
+    # torch solo hace falta para exportar
+    import torch
+    from .PeptideBert_predict import load_bert_model
+
+    output_directory = output_directory if output_directory is not None else model_directory_path
+    device = torch.device('cpu')
+    rng = np.random.default_rng(0)
+    input_ids, _ = encode_token_ids(["".join(rng.choice(list("ACDEFGHIKLMNPQRSTVWY"), size=n))
+                                     for n in (7, 12, 25)])
+    sample = (torch.from_numpy(input_ids), torch.from_numpy((input_ids != 0).astype(np.float32)))
+
+    paths = {}
+    for feature in feats:
+        model = load_bert_model(model_directory_path, feature, device).eval()
+        path = onnx_model_path(output_directory, feature)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.onnx.export(model, sample, path, input_names=list(ONNX_INPUTS), output_names=['prediction'],
+                          dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                                        'attention_mask': {0: 'batch', 1: 'sequence'},
+                                        'prediction': {0: 'batch'}},
+                          opset_version=opset_version, dynamo=False)
+
+        with torch.inference_mode():
+            expected = model(*sample).reshape(len(input_ids), -1)[:, 0].numpy()
+        session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+        got = _run_session(session, input_ids, sample[1].numpy())
+        diff = float(np.max(np.abs(got - expected)))
+        if diff > atol:
+            raise RuntimeError(f"El modelo ONNX de '{feature}' difiere de torch en {diff:.2e} (> {atol:.0e}).")
+        print(f"Modelo '{feature}' exportado a {path} (diferencia máxima con torch: {diff:.2e})")
+        paths[feature] = path
+    return paths
+
+
+def load_onnx_session(onnx_directory, feature: str, num_threads: Optional[int] = None) -> ort.InferenceSession:
+    """
+    Devuelve la sesión de onnxruntime de una feature, creándola solo la primera vez.
+
+    Args:
+        onnx_directory (str): Directorio con los modelos exportados.
+        feature (str): Feature del modelo.
+        num_threads (int, optional): Hilos intra-op de la sesión. Por defecto, los de onnxruntime.
+
+    Returns:
+        ort.InferenceSession: Sesión en CPU.
+    """
+    path = os.path.abspath(onnx_model_path(onnx_directory, feature))
+    key = (path, num_threads)
+    with _SESSIONS_LOCK:
+        if key not in _SESSIONS:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No existe {path}. Ejecuta export_peptidebert_onnx primero.")
+            options = ort.SessionOptions()
+            if num_threads:
+                options.intra_op_num_threads = num_threads
+            _SESSIONS[key] = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        return _SESSIONS[key]
+
+
+def release_onnx_sessions() -> int:
+    """Libera todas las sesiones de onnxruntime. Devuelve cuántas se liberaron."""
+    with _SESSIONS_LOCK:
+        n_sessions = len(_SESSIONS)
+        _SESSIONS.clear()
+    return n_sessions
+
+
+def _run_session(session: ort.InferenceSession, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    output = session.run(None, {'input_ids': input_ids, 'attention_mask': attention_mask})[0]
+    return output.reshape(len(input_ids), -1)[:, 0].astype(np.float64)
+
+
+def predict_onnx_multi(sessions: Dict[str, ort.InferenceSession], input_ids: np.ndarray,
+                       lengths: np.ndarray, batch_size: int = DEFAULT_BATCH_SIZE,
+                       bucket_by_length: bool = True, progress: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Equivalente de `predict_batched_multi` con sesiones de onnxruntime.
+
+    Args:
+        sessions (Dict[str, ort.InferenceSession]): Sesiones por nombre de feature.
+        input_ids (np.ndarray): Ids rellenados (salida de `encode_token_ids`).
+        lengths (np.ndarray): Longitud de cada secuencia.
+        batch_size (int): Secuencias por lote. Defaults to 64.
+        bucket_by_length (bool): Agrupa secuencias de longitud parecida. Defaults to True.
+        progress (bool): Muestra una barra de progreso. Defaults to True.
+
+    Returns:
+        Dict[str, np.ndarray]: Predicciones (float64) por feature, en el orden original.
+    """
+    preds = {name: np.empty(lengths.size, dtype=np.float64) for name in sessions}
+    for idx in tqdm(batch_indices(lengths, batch_size, bucket_by_length), disable=not progress):
+        width = max(1, int(lengths[idx].max()))
+        batch = np.ascontiguousarray(input_ids[idx, :width])
+        attention_mask = (batch != 0).astype(np.float32)
+        for name, session in sessions.items():
+            preds[name][idx] = _run_session(session, batch, attention_mask)
+    return preds
+
+
+def score_onnx_shard(onnx_directory, feats, sequences, batch_size: int = DEFAULT_BATCH_SIZE,
+                     num_threads: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Tarea de `predict_peptidebert_sharded` con backend='onnx': puntúa un fragmento de
+    secuencias en un worker. Está en este módulo para que los workers no importen torch;
+    las sesiones quedan en caché del worker, así que solo se crean con el primer fragmento.
+    """
+    sessions = {c: load_onnx_session(onnx_directory, c, num_threads) for c in feats}
+    input_ids, lengths = encode_token_ids(sequences)
+    return predict_onnx_multi(sessions, input_ids, lengths, batch_size=batch_size, progress=False)
+
+
+def predict_peptidebert_onnx(onnx_directory,
+                             input_dataframe: pd.DataFrame,
+                             sequence_col: str = 'sequence',
+                             feats=['hemo','sol','nf'],
+                             batch_size: int = DEFAULT_BATCH_SIZE,
+                             bucket_by_length: bool = True,
+                             num_threads: Optional[int] = None) -> pd.DataFrame:
+    """
+    Ejecuta PeptideBERT con onnxruntime sobre un DataFrame y añade las predicciones como
+    nuevas columnas. Mismo resultado que `predict_peptidebert` (dentro de la tolerancia
+    numérica de la exportación).
+
+    Args:
+        onnx_directory (str): Directorio con los modelos exportados por `export_peptidebert_onnx`.
+        input_dataframe (pd.DataFrame): DataFrame que contiene las secuencias.
+        sequence_col (str, optional): Columna con las secuencias. Defaults to 'sequence'.
+        feats (list, optional): Features a predecir. Defaults to ['hemo','sol','nf'].
+        batch_size (int, optional): Secuencias por lote. Defaults to 64.
+        bucket_by_length (bool, optional): Agrupa secuencias de longitud parecida. Defaults to True.
+        num_threads (int, optional): Hilos intra-op de cada sesión.
+
+    Returns:
+        pd.DataFrame: Una copia del DataFrame original con las columnas de predicción añadidas.
+    """
+    results = input_dataframe.copy()
+    sequences_list = input_dataframe[sequence_col].tolist()
+    if not sequences_list:
+        print("DataFrame de entrada está vacío. Devolviendo copia.")
+        for c in feats:
+            results[c] = pd.Series(dtype=float)
+        return results
+
+    sessions = {c: load_onnx_session(onnx_directory, c, num_threads) for c in feats}
+    print(f"Procesando caracteristicas con onnxruntime: {', '.join(feats)}")
+    input_ids, lengths = encode_token_ids(sequences_list)
+    preds = predict_onnx_multi(sessions, input_ids, lengths, batch_size=batch_size,
+                               bucket_by_length=bucket_by_length)
+    for c in feats:
+        results[c] = pd.Series(preds[c], index=results.index, dtype=float)
+    return results
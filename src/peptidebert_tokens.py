@@ -0,0 +1,100 @@
+# peptidebert_tokens.py
+
+# --- Tokenización de PeptideBERT con NumPy (sin torch, para workers ligeros) ---
+
+import numpy as np
+from typing import List, Sequence, Tuple
+
+# Vocabulario de PeptideBERT (ProtBert): token -> id
+PEPTIDEBERT_TOKENS = ['[PAD]','[UNK]','[CLS]','[SEP]','[MASK]','L',
+                      'A','G','V','E','S','I','K','R','D','T','P','N',
+                      'Q','F','Y','M','H','C','W']
+PEPTIDEBERT_MAPPING = dict(zip(PEPTIDEBERT_TOKENS, range(30)))
+
+
+def _token_table() -> np.ndarray:
+    # Tabla de 256 entradas: byte -> id de token ([UNK] para cualquier otro carácter)
+    table = np.full(256, PEPTIDEBERT_MAPPING['[UNK]'], dtype=np.int64)
+    for token, token_id in PEPTIDEBERT_MAPPING.items():
+        if len(token) == 1:
+            table[ord(token)] = token_id
+    return table
+
+
+_TOKEN_TABLE = _token_table()
+
+
+def token_ids_from_bytes(raw: bytes) -> np.ndarray:
+    """
+    Ids de token (int64) de cada byte de `raw`, la salida de `sequences_to_bytes`
+    ([UNK] para los caracteres fuera del vocabulario).
+    """
+    return _TOKEN_TABLE[np.frombuffer(raw, dtype=np.uint8)]
+
+
+def pad_token_ids(flat_ids: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Coloca los ids concatenados de todas las secuencias en una matriz (N x L_max)
+    rellenada con 0 ([PAD]). L_max es al menos 1.
+    """
+    n_sequences = lengths.size
+    ids = np.zeros((n_sequences, max(1, int(lengths.max()) if n_sequences else 1)), dtype=np.int64)
+    if flat_ids.size:
+        starts = np.cumsum(lengths) - lengths
+        rows = np.repeat(np.arange(n_sequences), lengths)
+        ids[rows, np.arange(flat_ids.size) - np.repeat(starts, lengths)] = flat_ids
+    return ids
+
+
+def sequences_to_bytes(sequences: Sequence[str]) -> Tuple[bytes, np.ndarray]:
+    """
+    Concatena las secuencias en bytes latin-1, un byte por carácter (los que no caben
+    pasan a '?', que se codifica como [UNK]).
+
+    Returns:
+        Tuple[bytes, np.ndarray]: Bytes concatenados y longitud de cada secuencia.
+    """
+    sequences = [str(seq) for seq in sequences]
+    lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+    return "".join(sequences).encode("latin-1", errors="replace"), lengths
+
+
+def encode_token_ids(sequences: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tokeniza todas las secuencias de una vez con la tabla de búsqueda sobre sus bytes,
+    igual que `mapping.get(c, [UNK])` carácter a carácter.
+
+    Args:
+        sequences (Sequence[str]): Secuencias de aminoácidos.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Matriz int64 (N x L_max) de ids rellenada con 0 y
+                                       longitud de cada secuencia.
+    """
+    raw, lengths = sequences_to_bytes(sequences)
+    return pad_token_ids(token_ids_from_bytes(raw), lengths), lengths
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> List[np.ndarray]:
+    """
+    Agrupa los índices de las secuencias en lotes de longitudes parecidas.
+
+    Args:
+        lengths (Sequence[int]): Longitud de cada secuencia.
+        batch_size (int): Número máximo de secuencias por lote.
+
+    Returns:
+        List[np.ndarray]: Índices (en el orden original) de cada lote, ordenados por longitud.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size debe ser un entero positivo.")
+    order = np.argsort(np.asarray(lengths), kind='stable')
+    return [order[k:k + batch_size] for k in range(0, len(order), batch_size)]
+
+
+def batch_indices(lengths: np.ndarray, batch_size: int, bucket_by_length: bool = True) -> List[np.ndarray]:
+    """Lotes de índices: agrupados por longitud o en el orden original."""
+    if bucket_by_length:
+        return length_buckets(lengths, batch_size)
+    n_sequences = len(lengths)
+    return [np.arange(k, min(k + batch_size, n_sequences)) for k in range(0, n_sequences, batch_size)]
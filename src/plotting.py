@@ -3,16 +3,40 @@ import numpy as np
 import seaborn as sns
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib.pyplot as plt
+from .identity_store import IdentityMatrixStore, downsample_matrix
 
 def identity_heatmap(identity_matrix, 
                           title,
                           cmap='viridis',
-                          figsize=(8, 8)):
+                          figsize=(8, 8),
+                          max_size=2000,
+                          cluster_order=False):
     """
     Grafica la matriz de identidad usando un mapa de calor de Seaborn.
+
+    Args:
+        identity_matrix (np.ndarray | np.memmap | IdentityMatrixStore): Matriz N x N.
+        title (str): Título del gráfico.
+        cmap (str): Mapa de colores.
+        figsize (tuple): Tamaño de la figura.
+        max_size (int): Si N es mayor, se grafica una vista promediada por bloques de
+                        max_size x max_size, leída por partes (memoria acotada).
+        cluster_order (bool): Solo para IdentityMatrixStore: reordena las secuencias por
+                              similitud antes de reducir la matriz.
     """
+    if isinstance(identity_matrix, IdentityMatrixStore):
+        if cluster_order:
+            identity_matrix, _ = identity_matrix.cluster_ordered_view(max_size=max_size)
+        else:
+            identity_matrix = identity_matrix.downsample(max_size=max_size)
+    else:
+        # Listas o DataFrames: sin copiar los np.memmap (asarray devuelve una vista)
+        identity_matrix = np.asarray(identity_matrix)
+        if max_size and identity_matrix.shape[0] > max_size:
+            identity_matrix = downsample_matrix(identity_matrix, max_size=max_size)
+
     plt.figure(figsize=figsize)
-    sns.heatmap(identity_matrix, cmap=cmap, vmin=0, vmax=1)
+    sns.heatmap(np.asarray(identity_matrix, dtype=np.float32), cmap=cmap, vmin=0, vmax=1)
     plt.title(title, fontsize=12)
     plt.xlabel("Secuencia Index")
     plt.ylabel("Secuencia Index")
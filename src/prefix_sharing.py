@@ -0,0 +1,84 @@
+# prefix_sharing.py
+
+# --- Agrupación de prompts por prefijo común para reutilizar la caché de claves/valores ---
+
+from typing import List, NamedTuple, Sequence
+
+
+class PrefixGroup(NamedTuple):
+    """Prompts que comparten sus primeros `prefix_length` tokens."""
+    prefix_length: int
+    indices: List[int]
+
+
+def _common_prefix_length(a: Sequence[int], b: Sequence[int], limit: int) -> int:
+    n = 0
+    while n < limit and a[n] == b[n]:
+        n += 1
+    return n
+
+
+def shared_prefix_groups(token_ids: Sequence[Sequence[int]], num_return_sequences: int = 1,
+                         min_prefix_tokens: int = 2) -> List[PrefixGroup]:
+    """
+    Agrupa prompts tokenizados por prefijo común.
+
+    Los prompts se recorren en orden lexicográfico de tokens, de modo que los mutantes y
+    truncamientos de una misma semilla quedan contiguos. El ahorro de un grupo es
+    prefijo x (copias - 1), donde cada prompt aporta `num_return_sequences` copias; un
+    prompt se une al grupo actual si el ahorro conjunto no es menor que el del grupo más
+    el que tendría el prompt por su cuenta. El prefijo nunca incluye el último token de un
+    prompt, que `generate` necesita procesar. Los grupos con un prefijo menor que
+    `min_prefix_tokens` se devuelven con longitud 0 (sin caché).
+
+    Args:
+        token_ids (Sequence[Sequence[int]]): Tokens de cada prompt.
+        num_return_sequences (int): Secuencias generadas por prompt. Defaults to 1.
+        min_prefix_tokens (int): Prefijo mínimo para que compense usar la caché. Defaults to 2.
+
+    Returns:
+        List[PrefixGroup]: Grupos con la longitud del prefijo y los índices de sus prompts.
+    """
+    def saving(prefix_length, n_prompts):
+        return prefix_length * (n_prompts * num_return_sequences - 1)
+
+    order = sorted(range(len(token_ids)), key=lambda i: token_ids[i])
+    groups = []
+    for i in order:
+        ids = token_ids[i]
+        own_prefix = max(len(ids) - 1, 0)
+        if groups:
+            prefix_length, indices = groups[-1]
+            shared = _common_prefix_length(token_ids[indices[0]], ids, min(prefix_length, own_prefix))
+            if saving(shared, len(indices) + 1) >= saving(prefix_length, len(indices)) + saving(own_prefix, 1):
+                groups[-1] = PrefixGroup(shared, indices + [i])
+                continue
+        groups.append(PrefixGroup(own_prefix, [i]))
+    return [group if group.prefix_length >= min_prefix_tokens else PrefixGroup(0, group.indices)
+            for group in groups]
+
+
+def prefill_tokens(token_ids: Sequence[Sequence[int]], groups: List[PrefixGroup],
+                   num_return_sequences: int = 1) -> tuple:
+    """
+    Tokens de prompt que procesa el modelo sin y con prefijos compartidos.
+
+    Sin compartir, cada copia de cada prompt se procesa entera. Compartiendo, el prefijo
+    de cada grupo se procesa una vez y de cada copia solo el resto del prompt (sin contar
+    el relleno entre el prefijo y el resto, que depende de los lotes).
+
+    Returns:
+        tuple: (tokens sin compartir, tokens compartiendo prefijos).
+    """
+    baseline = sum(len(ids) for ids in token_ids) * num_return_sequences
+    shared = 0
+    for prefix_length, indices in groups:
+        suffix = sum(len(token_ids[i]) - prefix_length for i in indices)
+        shared += prefix_length + suffix * num_return_sequences
+    return baseline, shared
+
+
+def prefix_batches(token_ids: Sequence[Sequence[int]], indices: List[int], batch_size: int) -> List[List[int]]:
+    """Lotes de como mucho `batch_size` prompts de un grupo, ordenados por longitud para reducir el relleno."""
+    by_length = sorted(indices, key=lambda i: len(token_ids[i]))
+    return [by_length[k:k + batch_size] for k in range(0, len(by_length), batch_size)]
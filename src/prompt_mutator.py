@@ -0,0 +1,123 @@
+# prompt_mutator.py
+
+# --- Mutación vectorizada de secuencias semilla para construir prompts de generación ---
+
+import numpy as np
+from functools import lru_cache
+from typing import List, Optional, Sequence, Union
+from Bio.Align.substitution_matrices import load
+
+# Lista estándar de aminoácidos
+AMINO_ACIDS_STRING = "ACDEFGHIKLMNPQRSTVWY"
+# Código de un residuo fuera de los 20 estándar
+OTHER_CODE = len(AMINO_ACIDS_STRING)
+
+_CODE_TABLE = np.full(256, OTHER_CODE, dtype=np.int64)
+_CODE_TABLE[np.frombuffer(AMINO_ACIDS_STRING.encode("ascii"), dtype=np.uint8)] = np.arange(OTHER_CODE)
+_RESIDUE_BYTES = np.frombuffer(AMINO_ACIDS_STRING.encode("ascii"), dtype=np.uint8)
+
+
+@lru_cache(maxsize=None)
+def substitution_probabilities(substitution_matrix: Optional[str] = None) -> np.ndarray:
+    """
+    Probabilidades de sustitución (21 x 20): fila = residuo original (20 = no estándar),
+    columna = residuo nuevo. Nunca se sustituye un residuo por sí mismo.
+
+    Sin matriz, la sustitución es uniforme entre los otros 19 aminoácidos. Con una matriz
+    de Biopython (p. ej. 'BLOSUM62'), cada sustitución pesa 2^(puntuación/2), la razón de
+    probabilidades que codifica la matriz en medios bits, así que se favorecen los cambios
+    conservadores. Los residuos no estándar se sustituyen de forma uniforme.
+    """
+    probabilities = np.ones((OTHER_CODE + 1, OTHER_CODE))
+    if substitution_matrix is not None:
+        matrix = load(substitution_matrix)
+        scores = np.array([[matrix[a, b] for b in AMINO_ACIDS_STRING] for a in AMINO_ACIDS_STRING])
+        probabilities[:OTHER_CODE] = np.power(2.0, scores / 2.0)
+    probabilities[np.arange(OTHER_CODE), np.arange(OTHER_CODE)] = 0.0
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    return probabilities
+
+
+def mutate_prompts(
+    seeds: Sequence[str],
+    num_variants_per_seq: int = 5,
+    n_mutations: int = 1,
+    apply_truncation: bool = False,
+    truncation_prob: float = 0.3,
+    start_cut_pos: int = 5,
+    substitution_matrix: Optional[str] = None,
+    rng: Union[np.random.Generator, int, None] = None,
+    unique: bool = True,
+) -> List[str]:
+    """
+    Genera en bloque las variantes mutadas de una lista de secuencias semilla.
+
+    Cada variante parte de su semilla, se trunca con probabilidad `truncation_prob`
+    (conservando el prefijo hasta una posición entre start_cut_pos y len - 2) y recibe
+    `n_mutations` sustituciones en posiciones distintas. Todo se hace con operaciones de
+    NumPy sobre una matriz de residuos, sin bucles por variante.
+
+    Args:
+        seeds (Sequence[str]): Secuencias semilla. Las vacías se ignoran.
+        num_variants_per_seq (int): Variantes por semilla. Defaults to 5.
+        n_mutations (int): Sitios mutados por variante (como máximo la longitud). Defaults to 1.
+        apply_truncation (bool): Permite truncar las semillas. Defaults to False.
+        truncation_prob (float): Probabilidad de truncar cada variante. Defaults to 0.3.
+        start_cut_pos (int): Posición mínima de corte. Defaults to 5.
+        substitution_matrix (str, optional): Matriz de Biopython para ponderar las
+                                             sustituciones (p. ej. 'BLOSUM62'). Por defecto, uniforme.
+        rng (np.random.Generator | int, optional): Generador o semilla, para resultados reproducibles.
+        unique (bool): Elimina prompts repetidos (conservando el primer orden). Defaults to True.
+
+    Returns:
+        List[str]: Secuencias mutadas, sin espacios.
+    """
+    rng = np.random.default_rng(rng)
+    seeds = [str(seq) for seq in seeds if seq]
+    if not seeds or num_variants_per_seq < 1:
+        return []
+
+    # Matriz de bytes (semillas x longitud máxima) y longitudes
+    lengths = np.fromiter(map(len, seeds), dtype=np.int64, count=len(seeds))
+    raw = np.frombuffer("".join(seeds).encode("latin-1", errors="replace"), dtype=np.uint8)
+    residues = np.zeros((len(seeds), int(lengths.max())), dtype=np.uint8)
+    columns = np.arange(residues.shape[1])
+    residues[columns < lengths[:, None]] = raw
+
+    # Una fila por variante
+    rows = np.repeat(np.arange(len(seeds)), num_variants_per_seq)
+    variants = residues[rows]
+    variant_lengths = lengths[rows]
+
+    # 1. Truncamiento: prefijo hasta una posición de corte en [min(start_cut_pos, L - 2), L - 2]
+    if apply_truncation:
+        truncate = (rng.random(len(rows)) < truncation_prob) & (variant_lengths > 1)
+        high = np.maximum(variant_lengths - 2, 1)
+        low = np.clip(np.minimum(start_cut_pos, variant_lengths - 2), 1, high)
+        cut = low + np.floor(rng.random(len(rows)) * (high - low + 1)).astype(np.int64)
+        variant_lengths = np.where(truncate, cut, variant_lengths)
+
+    # 2. Sitios de mutación: las n posiciones válidas con las claves aleatorias más pequeñas
+    n_sites = min(max(1, n_mutations), variants.shape[1])
+    if n_sites == 1:
+        sites = np.floor(rng.random(len(rows)) * variant_lengths).astype(np.int64)[:, None]
+    else:
+        keys = rng.random(variants.shape, dtype=np.float32)
+        keys[columns[None, :] >= variant_lengths[:, None]] = np.inf
+        sites = np.argpartition(keys, n_sites - 1, axis=1)[:, :n_sites]
+    site_rows = np.broadcast_to(np.arange(len(rows))[:, None], sites.shape)
+    valid = sites < variant_lengths[:, None]
+    site_rows, sites = site_rows[valid], sites[valid]
+
+    # 3. Sustitución muestreada de la fila del residuo original
+    cumulative = np.cumsum(substitution_probabilities(substitution_matrix), axis=1)
+    original = _CODE_TABLE[variants[site_rows, sites]]
+    draws = rng.random(len(sites))[:, None]
+    new_codes = np.minimum((draws >= cumulative[original]).sum(axis=1), OTHER_CODE - 1)
+    variants[site_rows, sites] = _RESIDUE_BYTES[new_codes]
+
+    # Se decodifican todas las variantes de una vez y se cortan por sus desplazamientos
+    text = variants[columns[None, :] < variant_lengths[:, None]].tobytes().decode("latin-1")
+    ends = np.cumsum(variant_lengths).tolist()
+    prompts = [text[start:end] for start, end in zip([0] + ends[:-1], ends)]
+    return list(dict.fromkeys(prompts)) if unique else prompts
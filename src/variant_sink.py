@@ -0,0 +1,130 @@
+# variant_sink.py
+
+# --- Deduplicación compacta y escritura incremental de variantes generadas ---
+
+import hashlib
+import os
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Iterable, Iterator, List, Union
+from .fasta_index import iter_fasta_records
+
+FASTA_SUFFIXES = ('.fasta', '.fa', '.faa', '.fas')
+
+
+def variant_hash(sequence: str) -> int:
+    """Hash de 64 bits de una variante (BLAKE2b)."""
+    return int.from_bytes(hashlib.blake2b(sequence.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class VariantDeduplicator:
+    """
+    Conjunto de variantes vistas con memoria acotada: guarda hashes de 64 bits en un
+    array ordenado de NumPy (8 bytes por variante) más un pequeño `set` de las recientes,
+    que se fusiona con el array cuando supera `buffer_size`.
+
+    Con hashes de 64 bits, la probabilidad de descartar por colisión una variante nueva
+    es del orden de n / 2^64 (despreciable para decenas de millones de variantes).
+    """
+
+    def __init__(self, buffer_size: int = 100_000):
+        self.buffer_size = buffer_size
+        self._sorted = np.empty(0, dtype=np.uint64)
+        self._recent = set()
+
+    def __len__(self) -> int:
+        return self._sorted.size + len(self._recent)
+
+    def _flush(self) -> None:
+        recent = np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent))
+        self._sorted = np.union1d(self._sorted, recent)
+        self._recent = set()
+
+    def _contains(self, key: int) -> bool:
+        if key in self._recent:
+            return True
+        pos = np.searchsorted(self._sorted, np.uint64(key))
+        return bool(pos < self._sorted.size and self._sorted[pos] == key)
+
+    def add(self, sequence: str) -> bool:
+        """Añade la variante; devuelve False si ya se había visto."""
+        key = variant_hash(sequence)
+        if self._contains(key):
+            return False
+        self._recent.add(key)
+        if len(self._recent) >= self.buffer_size:
+            self._flush()
+        return True
+
+    def update(self, sequences: Iterable[str]) -> None:
+        """Añade variantes ya aceptadas (p. ej. al reanudar desde un sink existente)."""
+        keys = np.fromiter((variant_hash(seq) for seq in sequences), dtype=np.uint64)
+        self._flush()
+        self._sorted = np.union1d(self._sorted, keys)
+
+
+class VariantSink:
+    """
+    Destino en disco de variantes aceptadas, escritas a medida que llegan.
+
+    Si `path` termina en .fasta/.fa/.faa/.fas, las variantes se añaden a un FASTA
+    (`>variant_<n>`), que se vacía a disco en cada `flush`. En otro caso `path` es un
+    directorio de archivos Parquet (columna 'sequence'), y cada `flush` escribe uno
+    nuevo de forma atómica. En ambos casos `read_existing` recupera lo ya escrito.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.is_fasta = self.path.suffix.lower() in FASTA_SUFFIXES
+        self._pending: List[str] = []
+        self.n_written = 0
+        if self.is_fasta:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def read_existing(self) -> Iterator[str]:
+        """Secuencias ya guardadas en el sink."""
+        if self.is_fasta:
+            if self.path.exists():
+                for _, _, sequence in iter_fasta_records(self.path):
+                    yield sequence
+        else:
+            for part in sorted(self.path.glob("*.parquet")):
+                yield from pd.read_parquet(part, columns=["sequence"])["sequence"]
+
+    def clear(self) -> None:
+        """Elimina lo ya escrito."""
+        if self.is_fasta:
+            if self.path.exists():
+                self.path.unlink()
+        else:
+            for part in self.path.glob("*.parquet"):
+                part.unlink()
+        self.n_written = 0
+
+    def add(self, sequence: str) -> None:
+        self._pending.append(sequence)
+
+    def flush(self) -> int:
+        """Escribe las variantes pendientes. Devuelve cuántas se escribieron."""
+        if not self._pending:
+            return 0
+        if self.is_fasta:
+            start = self.n_written
+            with open(self.path, "a") as handle:
+                handle.write("".join(f">variant_{start + k}\n{seq}\n" for k, seq in enumerate(self._pending)))
+                handle.flush()
+                os.fsync(handle.fileno())
+        else:
+            name = f"{time.time_ns()}_{uuid.uuid4().hex[:8]}.parquet"
+            tmp_file = self.path / f".{name}.tmp"
+            pd.DataFrame({"sequence": self._pending}).to_parquet(tmp_file, index=False)
+            os.replace(tmp_file, self.path / name)
+        written = len(self._pending)
+        self.n_written += written
+        self._pending = []
+        return written
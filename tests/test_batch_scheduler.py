@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from src.batch_scheduler import fixed_size_batches, padding_efficiency, token_budget_batches
+
+
+@pytest.mark.parametrize("max_batch_size", [None, 4])
+def test_token_budget_batches_respect_budget(max_batch_size):
+    lengths = np.random.default_rng(0).integers(3, 60, size=101)
+    batches = token_budget_batches(lengths, max_tokens=600, num_return_sequences=2, max_new_tokens=10,
+                                   max_batch_size=max_batch_size)
+
+    assert sorted(np.concatenate(batches).tolist()) == list(range(len(lengths)))
+    batch_lengths = [lengths[batch] for batch in batches]
+    assert np.all(np.diff(np.concatenate(batch_lengths)) >= 0)
+    for batch, batch_length in zip(batches, batch_lengths):
+        cost = len(batch) * 2 * (batch_length.max() + 10)
+        assert len(batch) == 1 or cost <= 600
+        assert max_batch_size is None or len(batch) <= max_batch_size
+    assert padding_efficiency(lengths, batches) >= padding_efficiency(lengths, fixed_size_batches(len(lengths), 8))
+
+
+def test_oversized_prompt_gets_its_own_batch():
+    batches = token_budget_batches([5, 500, 6], max_tokens=100)
+    assert [batch.tolist() for batch in batches] == [[0, 2], [1]]
+    with pytest.raises(ValueError):
+        token_budget_batches([5], max_tokens=0)
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Bio.SeqIO.FastaIO import SimpleFastaParser
+
+from src import bio_utils
+from src.bio_utils import (IUPAC_AMINO_ACID_SET, VALID_SEQUENCE_CHARS, _character_table, _validate_block,
+                           inspect_fasta_file, inspect_sequences, save_df_as_fasta, write_fasta)
+
+
+@pytest.mark.parametrize("dataframe", [
+    pd.DataFrame({"id": [], "seq": []}),
+    pd.DataFrame({"id": pd.Series([], dtype=float), "seq": pd.Series([], dtype=float)}),
+])
+def test_inspect_sequences_empty_dataframe(dataframe):
+    results = inspect_sequences(dataframe, "id", "seq", verbose=False)
+    assert results["record_count"] == 0
+    assert not results["is_valid"]
+
+
+def test_inspect_sequences_numeric_ids_match_written_file(tmp_path):
+    dataframe = pd.DataFrame({"id": [1.0, 2.5, np.nan, 4.0], "seq": ["ACD", "XZ1", "", "MK"]})
+    fasta_file = tmp_path / "records.fasta"
+    save_df_as_fasta(dataframe, "id", "seq", fasta_file, verbose=False)
+
+    in_memory = inspect_sequences(dataframe, "id", "seq", verbose=False)
+    assert in_memory == inspect_fasta_file(fasta_file, verbose=False)
+    assert in_memory["invalid_chars_found"] == {"2.5": ["1"]}
+
+
+def test_write_fasta_atomic_file_gets_default_permissions(tmp_path, monkeypatch):
+    monkeypatch.setattr(bio_utils, "_UMASK", 0o022)
+    umask = os.umask(0o022)
+    try:
+        write_fasta([("a", "ACD")], tmp_path / "atomic.fasta")
+        write_fasta([("a", "ACD")], tmp_path / "direct.fasta", atomic=False)
+    finally:
+        os.umask(umask)
+    mode = os.stat(tmp_path / "atomic.fasta").st_mode & 0o777
+    assert mode == 0o644
+    assert mode == os.stat(tmp_path / "direct.fasta").st_mode & 0o777
+
+
+def test_write_fasta_two_pairs_are_records_not_columns(tmp_path):
+    expected = ">a\nACD\n>b\nMK\n"
+    write_fasta((("a", "ACD"), ("b", "MK")), tmp_path / "pairs.fasta")
+    write_fasta((pair for pair in [("a", "ACD"), ("b", "MK")]), tmp_path / "generator.fasta")
+    write_fasta((["a", "b"], ["ACD", "MK"]), tmp_path / "columns.fasta", columns=True)
+    for name in ("pairs.fasta", "generator.fasta", "columns.fasta"):
+        assert (tmp_path / name).read_text() == expected
+
+
+def _validate_per_record(path, valid_chars):
+    # Validación registro a registro, como la implementación original con SeqIO
+    # (SimpleFastaParser, a diferencia de Seq, admite secuencias no ASCII)
+    ids, invalid_chars_found, empty_sequences = [], {}, []
+    with open(path, encoding="utf-8") as handle:
+        for title, sequence in SimpleFastaParser(handle):
+            record_id = (title.split(None, 1) or [""])[0]
+            ids.append(record_id)
+            if len(sequence) == 0:
+                empty_sequences.append(record_id)
+            rogue_chars = set(sequence.upper()).difference(valid_chars)
+            if rogue_chars:
+                invalid_chars_found[record_id] = sorted(rogue_chars)
+    return ids, invalid_chars_found, empty_sequences
+
+
+@pytest.mark.parametrize("valid_chars", [VALID_SEQUENCE_CHARS, IUPAC_AMINO_ACID_SET])
+@pytest.mark.parametrize("text", [
+    ">a desc\nACDE\nfgh1\n>b\n\n>c x>y\nAC D-*\r\nBJ\n>\nmk\n>d\nAC.9",
+    ">a\nACDÉ\n>b δ\nAC\n>c\n\n>d\nAC1ñ\n",
+])
+def test_validate_block_matches_per_record_validation(tmp_path, text, valid_chars):
+    fasta_file = tmp_path / "block.fasta"
+    fasta_file.write_bytes(text.encode("utf-8"))
+    invalid_chars_found, empty_sequences = {}, []
+    ids = _validate_block(fasta_file.read_bytes(), valid_chars, _character_table(valid_chars),
+                          invalid_chars_found, empty_sequences)
+    assert (ids, invalid_chars_found, empty_sequences) == _validate_per_record(fasta_file, valid_chars)
@@ -0,0 +1,85 @@
+import torch
+
+from src.constrained_generation import (AminoAcidLogitsProcessor, MaxResiduesStoppingCriteria, ResidueCounter,
+                                        residue_table)
+
+# 0: fin de secuencia; 1-4: tokens de aminoácidos de 1 a 3 residuos; 5-8: no aminoácidos
+VOCAB = ["<|endoftext|>", "A", "CD", "ĠKLM", "▁W", "\n", "X", "Ġ", "AB"]
+EOS = 0
+INF = float("inf")
+
+
+class StubTokenizer:
+    all_special_ids = [EOS]
+
+    def __len__(self):
+        return len(VOCAB)
+
+    def convert_ids_to_tokens(self, ids):
+        return [VOCAB[i] for i in ids]
+
+
+def _table(vocab_size=len(VOCAB) + 2):
+    return residue_table(StubTokenizer(), vocab_size)
+
+
+def test_residue_table_keeps_only_amino_acid_tokens():
+    table = _table()
+    assert table.residues == ["", "A", "CD", "KLM", "W", "", "", "", "", "", ""]
+    assert table.residues_per_token.tolist() == [0, 1, 2, 3, 1, 0, 0, 0, 0, 0, 0]
+    assert table.allowed.tolist() == [False, True, True, True, True] + [False] * 6
+
+
+def test_processor_masks_tokens_and_blocks_eos_below_min_length():
+    table = _table()
+    # Prompts de 3 tokens con 2 y 4 aminoácidos; min_length = 4
+    counter = ResidueCounter(table.residues_per_token, torch.tensor([2, 4]))
+    processor = AminoAcidLogitsProcessor(table.allowed, counter, min_length=4, eos_token_id=EOS)
+    input_ids = torch.ones((2, 3), dtype=torch.long)
+    scores = torch.arange(22, dtype=torch.float).reshape(2, 11)
+
+    masked = processor(input_ids, scores.clone())
+    assert counter.start == 3
+    for row in range(2):
+        assert masked[row, 1:5].tolist() == scores[row, 1:5].tolist()
+        assert masked[row, 5:].tolist() == [-INF] * 6
+    assert masked[0, EOS] == -INF
+    assert masked[1, EOS] == scores[1, EOS]
+
+    # Tras generar 'CD' (2 residuos) la primera fila llega a min_length y puede terminar
+    input_ids = torch.cat([input_ids, torch.tensor([[2], [6]])], dim=1)
+    masked = processor(input_ids, scores.clone())
+    assert masked[0, EOS] == scores[0, EOS]
+    assert masked[1, EOS] == scores[1, EOS]
+
+
+def test_counter_fixes_start_on_first_call():
+    table = _table()
+    counter = ResidueCounter(table.residues_per_token, torch.tensor([5]))
+    # Los tokens del prompt no se cuentan aunque sean de aminoácidos
+    assert counter(torch.tensor([[3, 3]])).tolist() == [5]
+    assert counter(torch.tensor([[3, 3, 2]])).tolist() == [7]
+    assert counter.start == 2
+
+
+def test_stopping_fires_at_max_length_residues_with_multi_residue_tokens():
+    table = _table()
+    counter = ResidueCounter(table.residues_per_token, torch.tensor([1, 1]))
+    stopping = MaxResiduesStoppingCriteria(counter, max_length=7)
+    input_ids = torch.tensor([[1], [1]])
+    counter(input_ids)
+
+    # Fila 0: +3 +2 +1 = 7 exactamente; fila 1: +3 +3 = 7 tras dos pasos
+    steps = [[3, 3], [2, 3], [1, 5]]
+    expected = [[False, False], [False, True], [True, True]]
+    for tokens, stop in zip(steps, expected):
+        input_ids = torch.cat([input_ids, torch.tensor(tokens)[:, None]], dim=1)
+        assert stopping(input_ids, None).tolist() == stop
+    assert counter(input_ids).tolist() == [7, 7]
+
+    # Un token de 3 residuos que pasa de max_length también detiene la fila
+    counter = ResidueCounter(table.residues_per_token, torch.tensor([5]))
+    stopping = MaxResiduesStoppingCriteria(counter, max_length=7)
+    counter(torch.tensor([[1]]))
+    assert stopping(torch.tensor([[1, 1]]), None).tolist() == [False]
+    assert stopping(torch.tensor([[1, 1, 3]]), None).tolist() == [True]
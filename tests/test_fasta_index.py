@@ -0,0 +1,84 @@
+import gzip
+
+import pytest
+from Bio import SeqIO
+
+from src.fasta_index import FastaIndex, iter_fasta_chunks, iter_record_blocks, read_fasta, split_record_block
+
+FASTA_TEXT = (
+    ">seq1 first record\n"
+    "ACDEFGHIKL\n"
+    "MNPQRSTVWY\n"
+    "ACD\n"
+    ">seq2\n"
+    "mkklla\n"
+    ">empty record without residues\n"
+    ">seq3 wrapped|with|pipes\n"
+    "ACDE\r\n"
+    "FGHI\r\n"
+    "\n"
+    ">seq4\n"
+    "WWWW"
+)
+
+
+def _seqio_records(path):
+    return [(record.id, record.description, str(record.seq)) for record in SeqIO.parse(path, "fasta")]
+
+
+@pytest.fixture
+def fasta_file(tmp_path):
+    path = tmp_path / "records.fasta"
+    path.write_bytes(FASTA_TEXT.encode())
+    return path
+
+
+def test_read_fasta_matches_seqio(fasta_file, tmp_path):
+    expected = _seqio_records(fasta_file)
+    df = read_fasta(fasta_file)
+    assert list(zip(df["id"], df["description"], df["sequence"])) == expected
+
+    gz_file = tmp_path / "records.fasta.gz"
+    gz_file.write_bytes(gzip.compress(fasta_file.read_bytes()))
+    chunks = list(iter_fasta_chunks(gz_file, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row for chunk in chunks for row in zip(chunk["id"], chunk["description"], chunk["sequence"])] == expected
+
+
+def test_fasta_index_matches_seqio(fasta_file):
+    expected = _seqio_records(fasta_file)
+    index = FastaIndex(fasta_file)
+    assert index.ids == [record_id for record_id, _, _ in expected]
+    assert index.index["length"].tolist() == [len(seq) for _, _, seq in expected]
+    for record_id, _, sequence in expected:
+        assert index.fetch(record_id) == sequence
+
+    reversed_ids = [record_id for record_id, _, _ in reversed(expected)]
+    df = index.get_records(reversed_ids)
+    assert list(zip(df["id"], df["description"], df["sequence"])) == expected[::-1]
+
+    chunks = list(FastaIndex(fasta_file).iter_chunks(chunk_size=3))
+    assert index.fai_file.exists()
+    assert [row for chunk in chunks for row in zip(chunk["id"], chunk["description"], chunk["sequence"])] == expected
+
+    with pytest.raises(KeyError):
+        index.fetch("missing")
+
+
+@pytest.mark.parametrize("block_size", [1, 5, 64, 1 << 20])
+def test_gzip_blocks_are_read_incrementally(fasta_file, tmp_path, block_size):
+    expected = _seqio_records(fasta_file)
+    gz_file = tmp_path / "records.fasta.gz"
+    gz_file.write_bytes(gzip.compress(b"\n \n" + fasta_file.read_bytes()))
+
+    records = []
+    for block in iter_record_blocks(gz_file, block_size=block_size):
+        assert block.startswith(b">")
+        ids, raw_sequences = split_record_block(block)
+        records.extend(zip(ids, (raw.translate(None, b" \t\r\n").decode() for raw in raw_sequences)))
+    assert records == [(record_id, sequence) for record_id, _, sequence in expected]
+
+    bad_file = tmp_path / "bad.fasta.gz"
+    bad_file.write_bytes(gzip.compress(b"text\n" + fasta_file.read_bytes()))
+    with pytest.raises(ValueError):
+        list(iter_record_blocks(bad_file, block_size=block_size))
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from src.feature_cache import FeatureCache, sequence_hashes
+
+
+def _features(sequences):
+    index = pd.Index(sequence_hashes(sequences), name="seq_hash")
+    return pd.DataFrame({"length": [len(seq) for seq in sequences]}, index=index)
+
+
+def test_store_compacts_small_parts(tmp_path):
+    cache = FeatureCache(tmp_path, max_parts=4)
+    sequences = [f"ACD{'K' * i}" for i in range(10)]
+    for seq in sequences:
+        cache.store("AAC", "p", _features([seq]))
+        assert len(cache._parts("AAC", "p")) <= 4
+
+    found = cache.lookup("AAC", "p", sequence_hashes(sequences))
+    assert len(found) == len(sequences)
+    assert found.loc[sequence_hashes(sequences), "length"].tolist() == [len(seq) for seq in sequences]
+
+
+def test_compact_skips_large_parts(tmp_path):
+    cache = FeatureCache(tmp_path, max_parts=None, compact_bytes=1)
+    for seq in ["ACD", "MKL"]:
+        cache.store("AAC", "p", _features([seq]))
+    assert cache.compact("AAC", "p") == 0
+    assert len(cache._parts("AAC", "p")) == 2
+
+    cache.compact_bytes = 1024 ** 2
+    assert cache.compact("AAC", "p") == 2
+    assert len(cache._parts("AAC", "p")) == 1
+    assert len(cache.lookup("AAC", "p", sequence_hashes(["ACD", "MKL"]))) == 2
@@ -0,0 +1,152 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.fasta_index import read_fasta
+from src.generator_service import WarmGenerator
+
+SEEDS = ["ACDEFGHIKLMNPQRSTVWY", "MKKLLPTAAAGLLLLAAQPAMA", "GAVLMIFYWKRHDESTCPNQ"]
+GENERATION = dict(num_variants_per_seq=4, num_return_sequences=3, min_length=10, max_length=30,
+                  apply_truncation=False)
+
+
+class StubPipeline:
+    """Pipeline determinista: el prompt más k residuos 'W', con k = 0..num_return_sequences - 1."""
+
+    def __init__(self):
+        self.n_prompts = 0
+        self.fail_after = None
+
+    def __call__(self, prompts, batch_size=None, num_return_sequences=1, **kwargs):
+        for prompt in prompts:
+            if self.fail_after is not None and self.n_prompts >= self.fail_after:
+                raise RuntimeError("interrumpido")
+            self.n_prompts += 1
+            yield [{"generated_text": prompt + "W" * k} for k in range(num_return_sequences)]
+
+
+class StubGenerator(WarmGenerator):
+    name = "stub"
+    n_loads = 0
+
+    def _load(self) -> None:
+        type(self).n_loads += 1
+        self.tokenizer = SimpleNamespace(pad_token_id=0)
+        self.generator = StubPipeline()
+
+    def _format_prompt(self, sequence: str) -> str:
+        return sequence
+
+    def _clean(self, generated_text: str) -> str:
+        return generated_text.strip()
+
+
+class SlowLoadGenerator(StubGenerator):
+    load_delay = 0.2
+
+    def _load(self) -> None:
+        time.sleep(self.load_delay)
+        super()._load()
+
+
+def _sink_sequences(path):
+    return read_fasta(path)["sequence"].tolist()
+
+
+def test_generate_to_sink_matches_generate(tmp_path):
+    expected = StubGenerator("stub", seed=0).generate(SEEDS, **GENERATION)
+    stats = StubGenerator("stub", seed=0).generate_to_sink(SEEDS, tmp_path / "out.fasta", flush_every=5, **GENERATION)
+    written = _sink_sequences(tmp_path / "out.fasta")
+    assert sorted(written) == sorted(expected)
+    assert stats["accepted"] == len(written)
+
+
+def test_generate_to_sink_resumes_without_duplicates(tmp_path):
+    sink_path = tmp_path / "out.fasta"
+    expected = StubGenerator("stub", seed=0).generate(SEEDS, **GENERATION)
+
+    generator = StubGenerator("stub", seed=0)
+    generator.generator.fail_after = 7
+    with pytest.raises(RuntimeError):
+        generator.generate_to_sink(SEEDS, sink_path, flush_every=3, **GENERATION)
+    progress_file = tmp_path / "out.fasta.progress.json"
+    assert json.loads(progress_file.read_text())["completed"] == 6
+    assert len(_sink_sequences(sink_path)) < len(expected)
+
+    # Progreso más antiguo que el sink (p. ej. interrupción entre flush y guardado):
+    # los prompts ya escritos se generan de nuevo, pero sus variantes no se repiten
+    progress_file.write_text(json.dumps({"completed": 3}))
+    generator.generator.fail_after = None
+    stats = generator.generate_to_sink(["ignorados al reanudar"], sink_path, flush_every=3, **GENERATION)
+    written = _sink_sequences(sink_path)
+    assert len(written) == len(set(written))
+    assert sorted(written) == sorted(expected)
+    assert stats["duplicates"] > 0
+    assert json.loads(progress_file.read_text())["completed"] == len(SEEDS) * GENERATION["num_variants_per_seq"]
+
+
+def test_constrained_acceptance_rates_in_generate_and_sink(tmp_path, monkeypatch):
+    generator = StubGenerator("stub", seed=0)
+    # Dos lotes de dos prompts; el segundo repite una variante del primero y otra queda corta
+    batches = [[(0, ["ACDEFGHIKL", "ACDEFGHIKM"]), (1, ["MKKLLPTAAA", "MKKLLPTAAA"])],
+               [(2, ["ACDEFGHIKL", None]), (3, ["GAVLMIFYWK", "GAVLMIFYWR"])]]
+    monkeypatch.setattr(generator, "_prefilter_constrained", lambda sequences, *args: ([0, 1, 2, 3], []))
+    monkeypatch.setattr(generator, "_run_constrained", lambda *args: iter(batches))
+    seeds = ["ACDEFGHIKLMN"]
+    kwargs = dict(GENERATION, num_variants_per_seq=4, constrained=True)
+
+    variants = generator.generate(seeds, **kwargs)
+    assert sorted(variants) == ["ACDEFGHIKL", "ACDEFGHIKM", "GAVLMIFYWK", "GAVLMIFYWR", "MKKLLPTAAA"]
+    assert generator.metrics()["last_acceptance_rates"] == [3 / 4, 2 / 4]
+
+    stats = generator.generate_to_sink(seeds, tmp_path / "out.fasta", resume=False, **kwargs)
+    assert generator.metrics()["last_acceptance_rates"] == [3 / 4, 2 / 4]
+    assert (stats["accepted"], stats["duplicates"], stats["too_short"]) == (5, 2, 1)
+    assert sorted(_sink_sequences(tmp_path / "out.fasta")) == sorted(variants)
+
+
+def test_load_runs_once_and_metrics_split_load_from_generation():
+    n_loads = SlowLoadGenerator.n_loads
+    generator = SlowLoadGenerator("stub", seed=0)
+    for _ in range(3):
+        assert generator.generate(SEEDS, **GENERATION)
+    assert SlowLoadGenerator.n_loads == n_loads + 1
+
+    metrics = generator.metrics()
+    assert metrics["n_requests"] == 3
+    assert metrics["load_seconds"] >= SlowLoadGenerator.load_delay
+    # La carga no cuenta como generación
+    assert 0 < metrics["generate_seconds"] < SlowLoadGenerator.load_delay
+    assert metrics["last_generate_seconds"] <= metrics["generate_seconds"]
+    assert metrics["last_n_prompts"] == len(SEEDS) * GENERATION["num_variants_per_seq"]
+
+
+def test_generate_after_close_raises(tmp_path):
+    with StubGenerator("stub", seed=0) as generator:
+        generator.generate(SEEDS, **GENERATION)
+    assert generator.generator is None
+    with pytest.raises(RuntimeError, match="cerrado"):
+        generator.generate(SEEDS, **GENERATION)
+    with pytest.raises(RuntimeError, match="cerrado"):
+        generator.generate_to_sink(SEEDS, tmp_path / "out.fasta", **GENERATION)
+
+
+@pytest.mark.parametrize("modes", [
+    dict(share_prefixes=True, token_budget=100),
+    dict(constrained=True, share_prefixes=True),
+    dict(constrained=True, token_budget=100),
+])
+def test_incompatible_modes_are_rejected(modes):
+    generator = StubGenerator("stub", seed=0)
+    with pytest.raises(ValueError):
+        generator.generate(SEEDS, **GENERATION, **modes)
+    assert generator.metrics()["n_requests"] == 0
+
+
+def test_prefix_sharing_rejected_when_unsupported():
+    generator = StubGenerator("stub", seed=0)
+    generator.supports_prefix_sharing = False
+    with pytest.raises(ValueError, match="share_prefixes"):
+        generator.generate(SEEDS, **GENERATION, share_prefixes=True)
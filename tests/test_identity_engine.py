@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from src.identity_engine import compute_identity_matrix, encode_sequences
+
+
+def _pairwise_identity(sequences):
+    # Bucle por pares original de bio_utils.calculate_identity_matrix
+    n_sequences = len(sequences)
+    identity_matrix = np.zeros((n_sequences, n_sequences))
+    for i in range(n_sequences):
+        for j in range(i, n_sequences):
+            seq1, seq2 = sequences[i], sequences[j]
+            if len(seq1) == 0:
+                continue
+            identity = sum(1 for a, b in zip(seq1, seq2) if a == b) / len(seq1)
+            identity_matrix[i, j] = identity
+            identity_matrix[j, i] = identity
+    return identity_matrix
+
+
+def test_non_latin1_characters_do_not_collide():
+    sequences = ["αβγ", "δεζ", "ACD", "ACé"]
+    identity = compute_identity_matrix(sequences)
+    assert identity[0, 1] == 0.0
+    np.testing.assert_array_equal(identity, _pairwise_identity(sequences))
+
+
+def test_more_than_255_symbols_widen_codes():
+    encoded = encode_sequences([chr(0x100 + i) for i in range(300)])
+    assert encoded.n_symbols == 300
+    assert encoded.codes.dtype == np.uint16
+    assert np.unique(encoded.codes).size == 300
+
+
+def _random_library(rng, n_sequences, min_len, max_len, alphabet="ACDEFGHIKLMNPQRSTVWY-"):
+    return ["".join(rng.choice(list(alphabet), rng.integers(min_len, max_len + 1)))
+            for _ in range(n_sequences)]
+
+
+@pytest.mark.parametrize("min_len, max_len", [(12, 12), (0, 15)])
+@pytest.mark.parametrize("block_size, n_jobs", [(1024, 1), (7, 1), (7, 3)])
+def test_matches_pairwise_loop(min_len, max_len, block_size, n_jobs):
+    sequences = _random_library(np.random.default_rng(0), 40, min_len, max_len)
+    identity = compute_identity_matrix(sequences, block_size=block_size, n_jobs=n_jobs)
+    np.testing.assert_array_equal(identity, _pairwise_identity(sequences))
+
+
+def test_condensed_is_upper_triangle():
+    sequences = _random_library(np.random.default_rng(1), 25, 5, 15)
+    full = compute_identity_matrix(sequences)
+    condensed = compute_identity_matrix(sequences, block_size=6, condensed=True)
+    np.testing.assert_array_equal(condensed, full[np.triu_indices(len(sequences), k=1)])
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+iFeatureOmega = pytest.importorskip("iFeatureOmega")
+
+from src.bio_utils import write_fasta  # noqa: E402
+from src.ifeature_native import NATIVE_DESCRIPTORS, compute_native_descriptors  # noqa: E402
+
+SEQUENCES = [
+    "ACDEFGHIKLMNPQRSTVWY",
+    "MKKLLPTAAAGLLLLAAQPAMA",
+    "GAVLMIFYWKRHDESTCPNQ",
+    "WWKKRRDDEEGGAAVVLLII",
+]
+
+
+@pytest.mark.parametrize("descriptor", NATIVE_DESCRIPTORS)
+def test_native_descriptor_matches_ifeature(tmp_path, descriptor):
+    ids = [f"seq{i}" for i in range(len(SEQUENCES))]
+    fasta_file = tmp_path / "input.fasta"
+    write_fasta((ids, SEQUENCES), fasta_file, columns=True)
+
+    protein = iFeatureOmega.iFeatureOmegaCLI.iProtein(str(fasta_file))
+    protein.get_descriptor(descriptor)
+    expected = protein.encodings
+
+    [(name, native)] = compute_native_descriptors(ids, SEQUENCES, [descriptor])
+    assert name == descriptor
+    assert list(native.columns) == list(expected.columns)
+    assert list(native.index) == [str(i) for i in expected.index]
+    np.testing.assert_allclose(native.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-9, atol=1e-12)
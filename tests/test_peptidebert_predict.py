@@ -0,0 +1,210 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+import yaml
+
+pytest.importorskip("models.peptideBert.network")
+
+from src import PeptideBert_predict as P  # noqa: E402
+from src.feature_cache import FeatureCache  # noqa: E402
+from src.PeptideBert_predict import predict_peptidebert, predict_peptidebert_sharded  # noqa: E402
+
+SEQUENCES = ["ACDEFGHIKLMNPQRSTVWY", "MKKLLPTAAAGLLLLAAQPAMA", "GAV", "WWKKRRDDEEGG", "K",
+             "ACDXZ", "GAVLMIFYWKRHDESTCPNQ", "PPGG", "MKKLLPTAAA", "QQ"]
+FEATS = ['hemo', 'sol', 'nf']
+
+
+class TinyPeptideModel(torch.nn.Module):
+    """Sustituto de PeptideBERT: media de los embeddings de los tokens reales y una capa lineal."""
+
+    def __init__(self, config):
+        super().__init__()
+        self.embedding = torch.nn.Embedding(config['vocab_size'], 8)
+        self.head = torch.nn.Linear(8, 1)
+
+    def forward(self, inputs, attention_mask):
+        mask = attention_mask.unsqueeze(-1)
+        pooled = (self.embedding(inputs) * mask).sum(1) / mask.sum(1).clamp(min=1)
+        return torch.sigmoid(self.head(pooled))
+
+
+def _write_model(model_dir, feature, seed):
+    config = {'vocab_size': 25}
+    (model_dir / feature).mkdir(parents=True, exist_ok=True)
+    (model_dir / feature / 'config.yaml').write_text(yaml.safe_dump(config))
+    torch.manual_seed(seed)
+    torch.save({'model_state_dict': TinyPeptideModel(config).state_dict()}, model_dir / feature / 'model.pt')
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(P, 'create_model', TinyPeptideModel)
+    for seed, feature in enumerate(FEATS):
+        _write_model(tmp_path / 'models', feature, seed)
+    yield tmp_path / 'models'
+    P.release_models()
+    P.clear_encoding_cache()
+
+
+class ThreadPoolStandIn(ThreadPoolExecutor):
+    """
+    Sustituye al pool de procesos: los workers lanzados con spawn no verían el monkeypatch.
+    Cada fragmento espera menos que el anterior, así que terminan en orden inverso.
+    """
+
+    def __init__(self, max_workers=None, mp_context=None, initializer=None, initargs=()):
+        super().__init__(max_workers=max_workers)
+        self.n_submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.n_submitted += 1
+        delay = 0.05 / self.n_submitted
+
+        def delayed():
+            time.sleep(delay)
+            return fn(*args, **kwargs)
+        return super().submit(delayed)
+
+
+def _dataframe(sequences=SEQUENCES):
+    return pd.DataFrame({'sequence': sequences}, index=[f"p{i}" for i in range(len(sequences))])
+
+
+@pytest.mark.parametrize("predict", [predict_peptidebert, predict_peptidebert_sharded])
+def test_onnx_backend_rejects_optimize(tmp_path, predict):
+    with pytest.raises(ValueError, match="optimize"):
+        predict(tmp_path, pd.DataFrame({"sequence": SEQUENCES}), backend="onnx", optimize="int8")
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 64])
+def test_bucketed_batches_return_scores_in_input_order(model_dir, batch_size):
+    model = P.load_bert_model(model_dir, 'hemo', torch.device('cpu')).eval()
+    device = torch.device('cpu')
+    # Referencia: una secuencia por llamada, rellenando hasta la longitud global
+    expected = P._predict_per_row(model, P.tokenize_peptides(SEQUENCES), device, progress=False)
+
+    encoded = P.encode_for_peptidebert(SEQUENCES)
+    for bucket_by_length in (True, False):
+        got = P.predict_batched(model, encoded, device, batch_size=batch_size,
+                                bucket_by_length=bucket_by_length, progress=False)
+        np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-6)
+
+    results = predict_peptidebert(model_dir, _dataframe(), feats=['hemo'], batch_size=batch_size)
+    assert results.index.tolist() == _dataframe().index.tolist()
+    np.testing.assert_allclose(results['hemo'].to_numpy(), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_registry_evicts_least_recently_used_and_releases(model_dir):
+    registry = P.PeptideBertRegistry(max_models=2)
+    device = torch.device('cpu')
+    hemo = registry.get(model_dir, 'hemo', device)
+    registry.get(model_dir, 'sol', device)
+    assert registry.get(model_dir, 'hemo', device) is hemo
+    # 'sol' es el menos reciente: se libera al cargar 'nf'
+    registry.get(model_dir, 'nf', device)
+    assert [key[1] for key in registry.loaded()] == ['hemo', 'nf']
+    assert registry.get(model_dir, 'hemo', device) is hemo
+
+    assert registry.release(model_dir, 'hemo') == 1
+    assert registry.get(model_dir, 'hemo', device) is not hemo
+    assert registry.release(model_dir.parent / 'otros') == 0
+    assert registry.release() == 2
+    assert len(registry) == 0
+
+
+def test_predict_with_small_registry_matches_and_keep_loaded(model_dir):
+    expected = predict_peptidebert(model_dir, _dataframe(), feats=FEATS,
+                                   registry=P.PeptideBertRegistry(max_models=None))
+    registry = P.PeptideBertRegistry(max_models=1)
+    results = predict_peptidebert(model_dir, _dataframe(), feats=FEATS, registry=registry)
+    pd.testing.assert_frame_equal(results, expected)
+    assert [key[1] for key in registry.loaded()] == ['nf']
+
+    predict_peptidebert(model_dir, _dataframe(), feats=FEATS, registry=registry, keep_loaded=False)
+    assert len(registry) == 0
+
+
+def _mapping_get_loop(sequences_list):
+    # Tokenización original de predict_peptidebert, carácter a carácter
+    mapping = dict(zip(
+        ['[PAD]','[UNK]','[CLS]','[SEP]','[MASK]','L',
+         'A','G','V','E','S','I','K','R','D','T','P','N',
+         'Q','F','Y','M','H','C','W'],
+        range(30)
+    ))
+    MAX_LEN = max(map(len, sequences_list))
+    tokenized_sequences = []
+    for seq in sequences_list:
+        tokenized_seq = [mapping.get(c, mapping['[UNK]']) for c in seq]
+        tokenized_seq.extend([0] * (MAX_LEN - len(tokenized_seq)))
+        tokenized_sequences.append(tokenized_seq)
+    return tokenized_sequences
+
+
+def test_encoding_matches_mapping_get_loop():
+    P.clear_encoding_cache()
+    sequences = SEQUENCES + ["", "mkkl", "BXZJUO-*", "ACDΩW", "É", "A C\tD"]
+    encoded = P.encode_for_peptidebert(sequences)
+    expected = _mapping_get_loop(sequences)
+
+    assert encoded.input_ids.tolist() == expected
+    assert encoded.attention_mask.tolist() == [[float(t != 0) for t in row] for row in expected]
+    assert encoded.lengths.tolist() == [len(seq) for seq in sequences]
+    assert P.tokenize_peptides(sequences) == [row[:len(seq)] for row, seq in zip(expected, sequences)]
+    # Las mismas secuencias reutilizan la codificación guardada
+    assert P.encode_for_peptidebert(list(sequences)) is encoded
+    assert P.encode_for_peptidebert(sequences, use_cache=False) is not encoded
+    P.clear_encoding_cache()
+
+
+@pytest.mark.parametrize("shard_size", [1, 3, 100])
+def test_sharded_predictions_are_reassembled_in_input_order(model_dir, monkeypatch, shard_size):
+    monkeypatch.setattr(P, 'ProcessPoolExecutor', ThreadPoolStandIn)
+    expected = predict_peptidebert(model_dir, _dataframe(), feats=FEATS)
+    results = predict_peptidebert_sharded(model_dir, _dataframe(), feats=FEATS, n_workers=2,
+                                          shard_size=shard_size, batch_size=2, progress=False)
+    assert results.index.tolist() == expected.index.tolist()
+    pd.testing.assert_frame_equal(results, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_prediction_cache_is_invalidated_when_weights_change(model_dir, tmp_path):
+    cache = FeatureCache(tmp_path / 'cache')
+    scored = []
+
+    def counting_predict(*args, **kwargs):
+        result = predict_peptidebert(*args, **kwargs)
+        scored.append(len(result))
+        return result
+
+    # Secuencias repetidas: solo se puntúan las únicas
+    dataframe = _dataframe(SEQUENCES + SEQUENCES[:3])
+    first = P.predict_with_cache(counting_predict, cache, model_dir, dataframe, feats=FEATS)
+    assert scored == [len(SEQUENCES)]
+    pd.testing.assert_frame_equal(first, predict_peptidebert(model_dir, dataframe, feats=FEATS))
+
+    second = P.predict_with_cache(counting_predict, cache, model_dir, dataframe, feats=FEATS)
+    assert scored == [len(SEQUENCES)]
+    pd.testing.assert_frame_equal(second, first)
+
+    old_checksum = P.model_checksum(model_dir, 'hemo')
+    assert cache._parts(P._cache_descriptor('hemo'), old_checksum)
+    _write_model(model_dir, 'hemo', seed=100)
+    # Mismo tamaño; se garantiza una fecha de modificación distinta
+    weights = model_dir / 'hemo' / 'model.pt'
+    stat = weights.stat()
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    P.release_models()
+    assert P.model_checksum(model_dir, 'hemo') != old_checksum
+
+    third = P.predict_with_cache(counting_predict, cache, model_dir, dataframe, feats=FEATS)
+    assert scored == [len(SEQUENCES), len(SEQUENCES)]
+    pd.testing.assert_frame_equal(third, predict_peptidebert(model_dir, dataframe, feats=FEATS))
+    assert not np.allclose(third['hemo'], first['hemo'])
+    pd.testing.assert_frame_equal(third[['sol', 'nf']], first[['sol', 'nf']])
+    # Las predicciones con los pesos anteriores se eliminan de la caché
+    assert cache._parts(P._cache_descriptor('hemo'), old_checksum) == []
@@ -0,0 +1,25 @@
+import numpy as np
+
+from src.peptidebert_tokens import (PEPTIDEBERT_MAPPING, encode_token_ids, sequences_to_bytes,
+                                    token_ids_from_bytes)
+
+SEQUENCES = ["ACDEFGHIKLMNPQRSTVWY", "mkkllp", "", "BXZ*-", "ÁCDé", "W"]
+
+
+def _mapping_get(sequence):
+    return [PEPTIDEBERT_MAPPING.get(c, PEPTIDEBERT_MAPPING['[UNK]']) for c in sequence]
+
+
+def test_token_ids_from_bytes_matches_mapping_get():
+    raw, lengths = sequences_to_bytes(SEQUENCES)
+    assert lengths.tolist() == [len(seq) for seq in SEQUENCES]
+    assert token_ids_from_bytes(raw).tolist() == [i for seq in SEQUENCES for i in _mapping_get(seq)]
+
+
+def test_encode_token_ids_pads_with_zero():
+    input_ids, lengths = encode_token_ids(SEQUENCES)
+    assert input_ids.shape == (len(SEQUENCES), max(lengths))
+    for row, seq in zip(input_ids, SEQUENCES):
+        assert row.tolist() == _mapping_get(seq) + [0] * (input_ids.shape[1] - len(seq))
+    assert encode_token_ids([])[0].shape == (0, 1)
+    assert np.issubdtype(input_ids.dtype, np.int64)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from src.prefix_sharing import prefill_tokens, prefix_batches, shared_prefix_groups
+
+
+def _random_prompts(rng, n_seeds=5, per_seed=6):
+    prompts = []
+    for _ in range(n_seeds):
+        seed = rng.integers(0, 20, size=rng.integers(4, 16)).tolist()
+        for _ in range(per_seed):
+            prompt = list(seed[:rng.integers(2, len(seed) + 1)])
+            prompt[rng.integers(len(prompt))] = int(rng.integers(0, 20))
+            prompts.append(prompt)
+    return prompts
+
+
+@pytest.mark.parametrize("num_return_sequences", [1, 4])
+def test_groups_cover_prompts_with_common_prefix(num_return_sequences):
+    token_ids = _random_prompts(np.random.default_rng(0))
+    groups = shared_prefix_groups(token_ids, num_return_sequences=num_return_sequences, min_prefix_tokens=2)
+
+    assert sorted(i for group in groups for i in group.indices) == list(range(len(token_ids)))
+    for prefix_length, indices in groups:
+        assert prefix_length == 0 or prefix_length >= 2
+        prefix = token_ids[indices[0]][:prefix_length]
+        for i in indices:
+            # El prefijo es común y nunca incluye el último token del prompt
+            assert token_ids[i][:prefix_length] == prefix
+            assert prefix_length < len(token_ids[i])
+
+    baseline, shared = prefill_tokens(token_ids, groups, num_return_sequences)
+    assert baseline == sum(map(len, token_ids)) * num_return_sequences
+    assert shared <= baseline
+
+
+def test_identical_prompts_share_all_but_last_token():
+    token_ids = [[1, 2, 3, 4], [1, 2, 3, 4], [9, 8]]
+    groups = shared_prefix_groups(token_ids, num_return_sequences=2)
+    assert sorted((g.prefix_length, sorted(g.indices)) for g in groups) == [(0, [2]), (3, [0, 1])]
+    assert prefill_tokens(token_ids, groups, 2) == (20, 3 + 2 * 2 + 2 * 2)
+
+
+def test_prefix_batches_sorted_by_length():
+    token_ids = [[1] * n for n in (5, 2, 4, 3, 1)]
+    assert prefix_batches(token_ids, [0, 1, 2, 3, 4], batch_size=2) == [[4, 1], [3, 2], [0]]
@@ -0,0 +1,21 @@
+import numpy as np
+
+from src.prompt_mutator import mutate_prompts
+
+SEEDS = ["ACDEFGHIKLMNPQRSTVWY", "MKKLLPTAAAGLLLLAAQPAMA", "GAVL"]
+
+
+def test_same_seed_gives_same_prompts():
+    kwargs = dict(num_variants_per_seq=8, n_mutations=2, apply_truncation=True, substitution_matrix="BLOSUM62")
+    first = mutate_prompts(SEEDS, rng=42, **kwargs)
+    assert first == mutate_prompts(SEEDS, rng=42, **kwargs)
+    assert first == mutate_prompts(SEEDS, rng=np.random.default_rng(42), **kwargs)
+    assert first != mutate_prompts(SEEDS, rng=43, **kwargs)
+
+
+def test_prompts_are_mutated_seed_prefixes():
+    prompts = mutate_prompts(SEEDS, num_variants_per_seq=20, n_mutations=1, rng=0, unique=False)
+    assert len(prompts) == 20 * len(SEEDS)
+    for seed, prompt in zip(np.repeat(SEEDS, 20), prompts):
+        assert len(prompt) == len(seed)
+        assert sum(a != b for a, b in zip(seed, prompt)) <= 1
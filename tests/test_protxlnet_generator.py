@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from src.ProtXLNet_generator import _length_sorted_batches
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 8, 100])
+def test_length_sorted_batches_groups_equal_lengths(batch_size):
+    lengths = np.random.default_rng(0).integers(5, 12, size=50).tolist()
+    batches = _length_sorted_batches(lengths, batch_size)
+
+    for batch in batches:
+        assert 1 <= len(batch) <= batch_size
+        assert len({lengths[i] for i in batch}) == 1
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    # De la longitud más corta a la más larga
+    batch_lengths = [lengths[batch[0]] for batch in batches]
+    assert batch_lengths == sorted(batch_lengths)
+
+
+def test_length_sorted_batches_empty():
+    assert _length_sorted_batches([], 4) == []
@@ -0,0 +1,51 @@
+import pytest
+
+from src.variant_sink import VariantDeduplicator, VariantSink
+
+
+@pytest.mark.parametrize("buffer_size", [1, 3, 100_000])
+def test_deduplicator_matches_set(buffer_size):
+    sequences = [f"ACD{'K' * (i % 17)}{'W' * (i % 5)}" for i in range(200)]
+    deduplicator, seen = VariantDeduplicator(buffer_size=buffer_size), set()
+    for seq in sequences:
+        assert deduplicator.add(seq) == (seq not in seen)
+        seen.add(seq)
+    assert len(deduplicator) == len(seen)
+
+
+def test_deduplicator_update_marks_variants_seen():
+    deduplicator = VariantDeduplicator(buffer_size=2)
+    assert deduplicator.add("ACD")
+    deduplicator.update(["MKL", "ACD", "WWW"])
+    assert len(deduplicator) == 3
+    assert not deduplicator.add("MKL")
+    assert not deduplicator.add("ACD")
+    assert deduplicator.add("MKLA")
+
+
+@pytest.mark.parametrize("name", ["variants.fasta", "variants"])
+def test_sink_round_trip(tmp_path, name):
+    sink = VariantSink(tmp_path / name)
+    assert list(sink.read_existing()) == []
+    sink.add("ACD")
+    sink.add("MKL")
+    # Hasta el flush no hay nada en disco
+    assert list(VariantSink(tmp_path / name).read_existing()) == []
+    assert sink.flush() == 2
+    assert sink.flush() == 0
+    sink.add("WWW")
+    sink.flush()
+
+    reopened = VariantSink(tmp_path / name)
+    assert list(reopened.read_existing()) == ["ACD", "MKL", "WWW"]
+    assert sink.n_written == 3
+    if sink.is_fasta:
+        assert (tmp_path / name).read_text() == ">variant_0\nACD\n>variant_1\nMKL\n>variant_2\nWWW\n"
+    else:
+        # Un archivo Parquet por flush, sin temporales
+        assert len(list((tmp_path / name).glob("*.parquet"))) == 2
+        assert list((tmp_path / name).glob(".*")) == []
+
+    reopened.clear()
+    assert list(VariantSink(tmp_path / name).read_existing()) == []
+    assert reopened.n_written == 0